@@ -0,0 +1,139 @@
+"""Benchmark the classification of Pleasuredome dats by name.
+
+Usage:
+    python benchmarks/classify.py
+    python benchmarks/classify.py --names names.txt --repeat 200
+
+Compares the substring chains the dats used before (get_version, get_suffix,
+PinballDat.get_system and the rules) with classify, cold (empty cache) and
+warm, over a corpus of Pleasuredome file names (or one name per line of
+--names). Exits with 1 if both disagree on any name.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from datoso_seed_pleasuredome.classify import classify
+
+VERSIONS = ('0.258', '0.259', '0.260', '0.261', '0.262', '0.263', '0.264')
+CORPUS = [
+    *(name.format(version=version) for version in VERSIONS for name in (
+        'MAME {version} ROMs (merged)/MAME {version} ROMs (merged).xml',
+        'MAME {version} ROMs (non-merged)/MAME {version} ROMs (non-merged).xml',
+        'MAME {version} ROMs (split)/MAME {version} ROMs (split).xml',
+        'MAME {version} CHDs (merged)/MAME {version} CHDs (merged).xml',
+        'MAME {version} Software List ROMs (merged)/a2600.xml',
+        'MAME {version} Software List ROMs (merged)/megadriv.xml',
+        'MAME {version} Software List ROMs (merged)/nes.xml',
+        'MAME {version} Software List CHDs (merged)/psx.xml',
+        'MAME {version} Update ROMs (v0.257 to v{version})/MAME {version} Update ROMs.xml',
+        'MAME {version} Update CHDs (v0.257 to v{version})/MAME {version} Update CHDs.xml',
+        'MAME {version} Samples (merged)/MAME {version} dir2dat Samples (merged).xml',
+        'MAME {version} EXTRAs/MAME {version} dir2dat Artwork.xml',
+        'MAME {version} Multimedia/MAME {version} dir2dat Multimedia.xml',
+    )),
+    *(name.format(version=version) for version in ('0.245.15', '0.245.16', '0.245.17') for name in (
+        'HBMAME {version} ROMs (merged)/HBMAME {version} ROMs (merged).xml',
+        'HBMAME {version} ROMs (split)/HBMAME {version} ROMs (split).xml',
+        'HBMAME {version} Software List ROMs (merged)/hbmame_nes.xml',
+    )),
+    *(name.format(date=date) for date in ('2023-10-14', '2024-03-02', '2024-09-21') for name in (
+        'Fruit Machines ({date})/Fruit Machine Roms ({date}).xml',
+        'Fruit Machines ({date})/Fruit Machine Layouts ({date}).xml',
+        'Fruit Machines ({date})/Fruit Machine MPU5 Hexfiles ({date}).dat',
+        'Fruit Machines ({date})/Fruit Machine Snapshots ({date}).dat',
+        'Fruit Machines ({date})/Fruit Machine Rollback 2009 ({date}).dat',
+        'Fruit Machines ({date})/Fruit Machine Rollback 2018 ({date}).dat',
+        'Fruit Machines ({date})/Fruit Machine Rollback ({date}).dat',
+        'Fruit Machines ({date})/FruitMachines-{date}.xml',
+        'SWP Machines ({date})/SWP Machine Roms ({date}).xml',
+        'Visual Pinball ({date})/Visual Pinball ({date}).xml',
+        'Visual Pinball ({date})/Visual Pinball Tables ({date}).xml',
+        'Future Pinball ({date})/Future Pinball ({date}).xml',
+        'PinMAME ({date})/PinMAME 3.6 ({date}).xml',
+    )),
+    'Demul 0.7a (180428)/Demul 0.7a.xml',
+    'FinalBurn Neo (v1.0.0.03)/FinalBurn Neo - Arcade Games.dat',
+    'Kawaks 1.65/Kawaks 1.65.dat',
+    'Raine 0.95.5/Raine 0.95.5.dat',
+]
+
+
+def legacy_classify(name: str) -> tuple:
+    """Classify a name with the substring chains of the dats and rules."""
+    search = re.findall(r'0\.[0-9]+(?:\.[0-9]+)?', str(name))
+    version = search[-1] if search else None
+    if 'Layouts' in name:
+        suffix = 'Layouts'
+    elif 'MPU5 Hexfiles' in name:
+        suffix = 'MPU5 Hexfiles'
+    elif 'Snapshots' in name:
+        suffix = 'Snapshots'
+    elif 'Rollback' in name:
+        suffix = 'Rollback/2009' if '2009' in name else 'Rollback/2018' if '2018' in name else 'Rollback'
+    elif 'SWP Machine Roms' in name:
+        suffix = 'SWP Machine Roms'
+    else:
+        suffix = 'Roms'
+    system = next((system for system in ('Future Pinball', 'Visual Pinball') if system in name), None)
+    dat_class = None
+    for keyword, keyword_class in (('HBMAME', 'HomeBrewMameDat'), ('MAME', 'MameDat'),
+                                   ('Fruit Machine', 'FruitMachinesXMLDat'), ('FruitMachine', 'FruitMachinesXMLDat'),
+                                   ('SWP Machine', 'FruitMachinesXMLDat')):
+        if keyword in name:
+            dat_class = keyword_class
+            break
+    return dat_class, system, suffix, version, 'Update' in name, 'dir2dat' in name
+
+
+def new_classify(name: str) -> tuple:
+    """Classify a name with classify, in the legacy_classify layout."""
+    classification = classify(name)
+    return (classification.dat_class, classification.system, classification.suffix, classification.version,
+            classification.update, classification.dir2dat)
+
+
+def measure(function: callable, names: list, repeat: int, *, cold: bool = False) -> float:
+    """Get the seconds per name of function, in the fastest of repeat passes over names."""
+    best = float('inf')
+    for _ in range(repeat):
+        if cold:
+            classify.cache_clear()
+        start = time.perf_counter()
+        for name in names:
+            function(name)
+        best = min(best, time.perf_counter() - start)
+    return best / len(names)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', help='File with one dat name (or path) per line, the built-in corpus by default')
+    parser.add_argument('--repeat', type=int, default=100, help='Times the corpus is classified')
+    args = parser.parse_args()
+    names = CORPUS
+    if args.names:
+        with open(args.names, encoding='utf-8') as fild:
+            names = [line.strip() for line in fild if line.strip()]
+    mismatches = [name for name in names if legacy_classify(name) != new_classify(name)]
+    for name in mismatches:
+        print(f'Mismatch: {name}\n  legacy:   {legacy_classify(name)}\n  classify: {new_classify(name)}')
+    results = {
+        'legacy': measure(legacy_classify, names, args.repeat),
+        'classify (cold)': measure(classify, names, args.repeat, cold=True),
+        'classify (warm)': measure(classify, names, args.repeat),
+    }
+    print(f'{len(names)} names, {args.repeat} times')
+    for label, seconds in results.items():
+        speedup = results['legacy'] / seconds
+        print(f'{label:<16} {seconds * 1e6:8.2f} us/name  {speedup:5.1f}x')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Benchmark the pleasuredome seed against a local stand-in of the Pleasuredome site.
+
+Usage:
+    python benchmarks/run.py --archives 20 --members 10 --size 200000
+    python benchmarks/run.py --option Engine=asyncio --option ExtractProcesses=4
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline other.json --tolerance 0.2
+
+Phases measured: index (get_dat_links), download (download_dat), sync
+(download_sets, the archives downloaded and extracted by the threads or asyncio
+Engine), fetch (fetch() end to end) and process (the actions.py chains run by
+datoso). The change of every phase over the baseline
+(benchmarks/baseline.json by default) is reported, and the run exits with 1 if
+a phase is slower than it by more than the tolerance. A baseline run with other
+parameters is only reported.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from server import SETS, make_site, serve
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+# Nothing from datoso can be imported before its configuration is written
+CONFIG = """[PATHS]
+DownloadPath = {work}/download
+DatPath = {work}/DatRoot
+DatosoPath = {work}/datoso
+DatabaseFile = datoso.json
+
+[COMMAND]
+Quiet = true
+
+[LOG]
+Logging = false
+
+[PROCESS]
+AutoMergeEnabled = false
+ParentMergeEnabled = false
+
+[DOWNLOAD]
+PrefferDownloadUtility = urllib
+
+[PLEASUREDOME]
+download = {sets}
+MirrorUrl = {mirror}
+{options}
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the arguments."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sets', default=','.join(SETS), help='Sets to benchmark')
+    parser.add_argument('--archives', type=int, default=10, help='Archives per set')
+    parser.add_argument('--members', type=int, default=5, help='DATs per Software List archive')
+    parser.add_argument('--size', type=int, default=100_000, help='Bytes per DAT')
+    parser.add_argument('--option', action='append', default=[], help='PLEASUREDOME option, as Key=Value')
+    parser.add_argument('--memory', action='store_true', help='Trace the peak memory of each phase (slower)')
+    parser.add_argument('--output', help='Write the results to a JSON file')
+    parser.add_argument('--baseline', default=str(BASELINE),
+                        help='Compare the results with a baseline JSON file, empty to skip (%(default)s)')
+    parser.add_argument('--save-baseline', help='Save the results as a baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown over the baseline')
+    parser.add_argument('--keep', action='store_true', help='Keep the work folder')
+    return parser.parse_args()
+
+
+class Benchmark:
+    """Phases timings, throughput and memory."""
+
+    def __init__(self, *, memory: bool = False) -> None:
+        """Initialize the benchmark."""
+        self.memory = memory
+        self.results = {}
+
+    @contextmanager
+    def phase(self, name: str) -> dict:
+        """Measure a phase, the caller fills the processed bytes and items."""
+        result = {'bytes': 0, 'items': 0}
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            result['seconds'] = round(time.perf_counter() - start, 4)
+            if self.memory:
+                result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                tracemalloc.stop()
+            result['mb_per_second'] = round(result['bytes'] / 2**20 / result['seconds'], 2) \
+                if result['seconds'] else 0
+            self.results[name] = result
+
+    def report(self) -> None:
+        """Print the results."""
+        print(f'{"phase":<10}{"seconds":>10}{"items":>8}{"MB":>10}{"MB/s":>10}{"peak MB":>10}')
+        for name, result in self.results.items():
+            print(f'{name:<10}{result["seconds"]:>10}{result["items"]:>8}{result["bytes"] / 2**20:>10.2f}'
+                  f'{result["mb_per_second"]:>10}{result.get("peak_mb", "-"):>10}')
+        print(f'max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB')
+
+    def compare(self, baseline: dict, tolerance: float) -> list:
+        """Print the change of every phase over the baseline, returns the phases slower than the tolerance."""
+        regressions = []
+        print(f'{"phase":<10}{"seconds":>10}{"baseline":>10}{"change":>10}')
+        for name, result in self.results.items():
+            expected = baseline.get('results', {}).get(name, {}).get('seconds')
+            if not expected:
+                print(f'{name:<10}{result["seconds"]:>10}{"-":>10}{"-":>10}')
+                continue
+            change = result['seconds'] / expected - 1
+            print(f'{name:<10}{result["seconds"]:>10}{expected:>10}{change:>+10.1%}')
+            if change > tolerance:
+                regressions.append(f'{name}: {result["seconds"]}s, baseline {expected}s ({change:+.1%})')
+        return regressions
+
+
+def folder_size(folder: Path) -> tuple[int, int]:
+    """Get the size and number of files of a folder."""
+    files = [file for file in folder.rglob('*') if file.is_file()]
+    return sum(file.stat().st_size for file in files), len(files)
+
+
+def run(args: argparse.Namespace, work: Path, benchmark: Benchmark) -> None:
+    """Run the phases."""
+    sets = args.sets.split(',')
+    site_sizes = make_site(work / 'site', args.archives, args.members, args.size)
+    server = serve(work / 'site')
+    options = '\n'.join(args.option).replace('=', ' = ')
+    (work / 'config' / 'datoso').mkdir(parents=True)
+    (work / 'config' / 'datoso' / 'datoso.config').write_text(CONFIG.format(
+        work=work, sets=args.sets, mirror=f'http://127.0.0.1:{server.server_port}/', options=options,
+    ), encoding='utf-8')
+    os.environ['XDG_CONFIG_HOME'] = str(work / 'config')
+
+    from datoso.commands.seed import Seed
+    from datoso.configuration.folder_helper import Folders
+
+    from datoso_seed_pleasuredome import __prefix__
+    from datoso_seed_pleasuredome.fetch import PDSET, PleasureDomeHelper, fetch
+
+    folder_helper = Folders(seed=__prefix__, extras=[x.name for x in PDSET])
+    folder_helper.clean_dats()
+    folder_helper.create_all()
+    helper = PleasureDomeHelper(folder_helper)
+    pdsets = helper.selected_sets()
+
+    with benchmark.phase('index') as result:
+        links = {pdset: helper.get_dat_links(pdset.name, pdset.url) for pdset in pdsets}
+        result['items'] = len(pdsets)
+
+    with benchmark.phase('download') as result, ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(helper.download_dat, href, pdset.name)
+                   for pdset, hrefs in links.items() for href in hrefs]
+        for future in futures:
+            future.result()
+        result['items'] = len(futures)
+        result['bytes'] = sum(site_sizes[name] for name in sets)
+
+    # Downloaded again, every archive extracted while the rest of its set downloads
+    folder_helper.clean_dats()
+    folder_helper.create_all()
+    with benchmark.phase('sync') as result:
+        helper.download_sets()
+        result['items'] = sum(len(hrefs) for hrefs in links.values())
+        result['bytes'] = sum(site_sizes[name] for name in sets)
+    helper.close()
+
+    with benchmark.phase('fetch') as result:
+        fetch()
+        result['items'] = sum(len(hrefs) for hrefs in links.values())
+        result['bytes'] = sum(site_sizes[name] for name in sets)
+
+    with benchmark.phase('process') as result:
+        Seed(name='pleasuredome').process_dats()
+        result['bytes'], result['items'] = folder_size(work / 'DatRoot')
+    server.shutdown()
+
+
+def main() -> int:
+    """Run the benchmark."""
+    args = parse_args()
+    work = Path(tempfile.mkdtemp(prefix='pleasuredome-benchmark-'))
+    benchmark = Benchmark(memory=args.memory)
+    try:
+        run(args, work, benchmark)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+    benchmark.report()
+    data = {'parameters': {key: value for key, value in vars(args).items()
+                           if key in ('sets', 'archives', 'members', 'size', 'option')},
+            'results': benchmark.results}
+    for file in (args.output, args.save_baseline):
+        if file:
+            Path(file).write_text(json.dumps(data, indent=4), encoding='utf-8')
+    if args.baseline and Path(args.baseline).is_file() and not args.save_baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        print(f'Compared with {args.baseline}:')
+        regressions = benchmark.compare(baseline, args.tolerance)
+        if baseline.get('parameters') != data['parameters']:
+            print('Warning: the baseline was run with different parameters, regressions are not checked')
+        elif regressions:
+            print('Regressions:', *regressions, sep='\n  ')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Stand-in Pleasuredome site with synthetic DAT archives."""
+import functools
+import threading
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Index pages with the same paths as the PDSET URLs
+SETS = {
+    'mame': 'mame',
+    'hbmame': 'nonmame/hbmame',
+    'fruitmachines': 'nonmame/fruitmachines',
+}
+
+
+def make_dat(name: str, size: int) -> str:
+    """Make a MAME-like XML dat of about size bytes."""
+    lines = [
+        '<?xml version="1.0"?>',
+        '<datafile>',
+        (f'\t<header>\n\t\t<name>{name}</name>\n\t\t<description>{name}</description>\n'
+         '\t\t<version>0.262</version>\n\t</header>'),
+    ]
+    total = sum(len(line) for line in lines)
+    machine = 0
+    while total < size:
+        line = (f'\t<machine name="m{machine:06d}">\n\t\t<description>Machine {machine}</description>\n'
+                f'\t\t<rom name="m{machine:06d}.bin" size="{machine * 7 % 65536}" crc="{machine * 2654435761 % 2**32:08x}" '
+                f'sha1="{machine:040x}"/>\n\t</machine>')
+        lines.append(line)
+        total += len(line)
+        machine += 1
+    lines.append('</datafile>')
+    return '\n'.join(lines)
+
+
+def make_archive(file: Path, members: dict) -> Path:
+    """Make a zip archive, and its folder."""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, content in members.items():
+            zip_ref.writestr(name, content)
+    return file
+
+
+def make_site(root: Path, archives: int, members: int, size: int) -> dict:
+    """Make the index pages and archives of every set, returns the bytes per set."""
+    sizes = {}
+    for set_name, set_path in SETS.items():
+        folder = root / set_path
+        folder.mkdir(parents=True, exist_ok=True)
+        files = []
+        for i in range(archives):
+            if set_name == 'fruitmachines':
+                file = f'FruitMachines-2024{i // 28 % 12 + 1:02d}{i % 28 + 1:02d}.zip'
+                content = {f'Fruit Machines {i} (Roms).xml': make_dat(f'Fruit Machines {i}', size)}
+            elif i == 0:
+                file = f'{set_name.upper()} 0.262 ROMs (merged).zip'
+                content = {f'{set_name.upper()} 0.262 ROMs (merged).xml': make_dat(f'{set_name.upper()} 0.262', size)}
+            else:
+                file = f'{set_name.upper()} 0.262 Software List {i} ROMs (merged).zip'
+                content = {f'list{i}_{j}.xml': make_dat(f'list{i}_{j}', size) for j in range(members)}
+            make_archive(folder / file, content)
+            files.append(file)
+        links = '\n'.join(f'<a href="{file}">{file}</a>' for file in files)
+        (folder / 'index.html').write_text(f'<html><body>{links}</body></html>', encoding='utf-8')
+        sizes[set_name] = sum((folder / file).stat().st_size for file in files)
+    return sizes
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """Keep-alive static file handler."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args: str) -> None:
+        """Do not log the requests."""
+
+
+def serve(root: Path) -> ThreadingHTTPServer:
+    """Serve a folder on a random local port, in a background thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=str(root)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
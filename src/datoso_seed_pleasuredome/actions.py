@@ -1,4 +1,15 @@
 """Actions for the pleasuredome seed."""
+from pathlib import Path
+
+from datoso.actions import processor
+from datoso.actions.processor import Copy, DeleteOld, Process
+from datoso.configuration import config, logger
+from datoso.configuration.folder_helper import Folders
+from datoso.helpers import compare_dates
+
+from datoso_seed_pleasuredome import __prefix__
+from datoso_seed_pleasuredome.archive import materialize
+from datoso_seed_pleasuredome.compression import get_compression
 from datoso_seed_pleasuredome.dats import (
     KawaksDat,
     PinballDat,
@@ -7,8 +18,205 @@ from datoso_seed_pleasuredome.dats import (
     hbmame_dat_factory,
     mame_dat_factory,
 )
+from datoso_seed_pleasuredome.diff import DiffStore
+from datoso_seed_pleasuredome.hashindex import get_hash_index, iter_dat_roms
+from datoso_seed_pleasuredome.metrics import metrics
+from datoso_seed_pleasuredome.publish import (
+    copy_path,
+    get_strategy,
+    get_workers,
+    publishing,
+    remove_path,
+)
+
+
+class ArchiveCopy(Copy):
+    """Copy files, writing the content of the virtual DATs to the destination.
+
+    The DATs are published compressed with `CompressPublished`, decompressed otherwise.
+    """
+
+    def process(self) -> str:
+        """Copy files."""
+        result = super().process()
+        if result in ('Copied', 'Created', 'Updated', 'Overwritten'):
+            codec, level = get_compression()
+            if not config.getboolean('PLEASUREDOME', 'CompressPublished', fallback=False):
+                codec = None
+            materialize(self.destination(), codec, level)
+        return result
+
+
+class MeasuredMixin:
+    """Record the time and result of an action step in the metrics."""
+
+    _step: str = None
+    _set: str = None
+
+    def process(self) -> str:
+        """Run the action step."""
+        with metrics.measure(self._step, self._set, file=Path(self.file).name) as event:
+            event['status'] = super().process()
+        return event['status']
+
+
+class PublishedDeleteOld(DeleteOld):
+    """DeleteOld removing the previous dat with the `publish` functions, the Software Lists concurrently."""
+
+    def process(self) -> str:
+        """Delete old dat file."""
+        with publishing(get_strategy(), get_workers()):
+            return self.delete_old()
+
+    def delete_old(self) -> str:
+        """Delete old dat file, as datoso's DeleteOld."""
+        try:
+            if self.database_data and self.database_data.get('date', None) and self.file_data.get('date', None) \
+                and compare_dates(self.database_dat.date, self.file_dat.date):
+                self.stop = True
+                return 'No Action Taken, Newer Found'
+        except ValueError as e:
+            logger.exception(e, self.database_dat.date, self.file_dat.date)
+            return 'Error'
+
+        if not self.database_data.get('new_file', None):
+            return 'New'
+
+        if getattr(self, 'folder', None) and self.database_data.get('date', None):
+            old_file = Path(self.database_data.get('new_file', '') or '')
+            new_file = self.destination()
+            if old_file == new_file \
+                and self.database_data.get('date', None) == self.file_data.get('date', None) \
+                and not config.getboolean('PROCESS', 'Overwrite', fallback=False) \
+                and self.database_dat.is_enabled():
+                return 'Exists'
+
+        remove_path(Path(self.database_dat.new_file), remove_empty_parent=True)
+        if not self.database_dat.is_enabled():
+            self.stop = True
+            self.database_dat.new_file = None
+            self.database_dat.save()
+            self.database_dat.flush()
+            return 'Disabled'
+        return 'Deleted'
+
+
+class PublishedCopy(Copy):
+    """Copy linking the dats with the `CopyStrategy`, the Software Lists concurrently."""
+
+    def process(self) -> str:
+        """Copy files."""
+        with publishing(get_strategy(), get_workers()):
+            return self.copy()
+
+    def copy(self) -> str:
+        """Copy files, as datoso's Copy."""
+        result = None
+        origin = self.file if self.file else None
+        destination = self.destination()
+        if not self.database_dat:
+            copy_path(origin, destination)
+            return 'Copied'
+        if not self.database_dat.is_enabled():
+            self.file_dat.new_file = None
+            return 'Ignored'
+        old_file = Path(self.database_data.get('new_file', '') or '')
+        new_file = destination
+
+        if old_file == new_file and destination.exists() \
+            and not config.getboolean('PROCESS', 'Overwrite', fallback=False):
+            self.stop = True
+            return 'Exists'
+
+        if old_file.name == '':
+            result = 'Created'
+        elif old_file != new_file:
+            result = 'Updated'
+        elif config.getboolean('PROCESS', 'Overwrite', fallback=False):
+            result = 'Overwritten'
+        elif not new_file.exists():
+            result = 'Updated'
+        else:
+            msg = 'Unknown state'
+            raise TypeError(msg)
+
+        try:
+            if self.database_data \
+                and self.database_data.get('date', None) \
+                and self.file_data.get('date', None) \
+                and compare_dates(self.database_dat.date, self.file_dat.date):
+                return 'No Action Taken, Newer Found'
+
+            self.database_dat.new_file = destination
+            copy_path(origin, destination)
+        except ValueError:
+            pass
+        return result
+
+
+class PublishedArchiveCopy(ArchiveCopy, PublishedCopy):
+    """ArchiveCopy linking the dats with the `CopyStrategy`."""
+
+
+class DiffPrevious(Process):
+    """Compare the DAT with the previous version processed, machine by machine."""
+
+    def process(self) -> str:
+        """Write the changeset (and delta DAT) of the new version."""
+        if Path(self.file).is_dir():
+            return 'Skipped'
+        file_data = self.file_data
+        store = DiffStore(Folders(seed=__prefix__).download / 'diff')
+        changeset = store.diff(
+            f'{file_data["company"]}/{file_data["name"]}', self.file, file_data['version'],
+            deltas=config.getboolean('PLEASUREDOME', 'DiffDeltas', fallback=False))
+        if changeset is None:
+            return 'Skipped'
+        return (f'Diffed (+{changeset["added_count"]} -{changeset["removed_count"]} '
+                f'~{changeset["changed_count"]})')
+
+
+class IndexRoms(Process):
+    """Store the ROMs of the DAT in the hash index."""
+
+    _set: str = None
+
+    def process(self) -> str:
+        """Replace the ROMs of the previous version of the DAT in the index."""
+        file_data = self.file_data
+        count = get_hash_index().update(
+            self._set, file_data['name'], file_data['version'], self.file, iter_dat_roms(self.file))
+        return 'Skipped' if count is None else f'Indexed ({count} ROMs)'
+
+
+# datoso finds the actions by name in its processor module
+processor.ArchiveCopy = ArchiveCopy
+processor.DiffPrevious = DiffPrevious
+processor.IndexRoms = IndexRoms
+processor.PublishedDeleteOld = PublishedDeleteOld
+processor.PublishedCopy = PublishedCopy
+processor.PublishedArchiveCopy = PublishedArchiveCopy
+
+# Chains that compare every new version of their DATs with the previous one
+DIFF_PATHS = ('{dat_origin}/MAME', '{dat_origin}/HBMAME')
+
+
+# Steps that copy or remove the published dats
+PUBLISH_ACTIONS = ('DeleteOld', 'Copy', 'ArchiveCopy')
+
+
+def get_published_action(name: str) -> str:
+    """Get the name of the version of an action that publishes with the `CopyStrategy`."""
+    return f'Published{name}'
+
+
+def get_measured_action(name: str) -> str:
+    """Get the name of the measured version of an action, registering it in the processor module."""
+    measured_name = f'Measured{name}'
+    if not hasattr(processor, measured_name):
+        setattr(processor, measured_name, type(measured_name, (MeasuredMixin, getattr(processor, name)), {}))
+    return measured_name
 
-# ruff: noqa: ERA001
 
 actions = {
     '{dat_origin}/FruitMachines': [
@@ -131,6 +339,40 @@ actions = {
     # ],
 }
 
+def get_extra_steps(path: str) -> list:
+    """Get the steps of the enabled options for a chain."""
+    steps = []
+    if config.getboolean('PLEASUREDOME', 'Diff', fallback=False) and path in DIFF_PATHS:
+        steps.append({'action': 'DiffPrevious'})
+    if get_hash_index() is not None:
+        steps.append({'action': 'IndexRoms', '_set': Path(path).name})
+    return steps
+
+
 def get_actions() -> dict:
     """Get the actions dictionary."""
-    return actions
+    # The extra steps run after DeleteOld, which stops the chain if a newer version was
+    # processed, and before Copy, which stops it if the dat was already copied
+    seed_actions = {
+        path: [step for action in steps for step in (
+            [action, *get_extra_steps(path)] if action['action'] == 'DeleteOld' else [action])]
+        for path, steps in actions.items()
+    }
+    if config.getboolean('PLEASUREDOME', 'ZeroExtraction', fallback=False) or get_compression()[0] is not None:
+        seed_actions = {
+            path: [{**action, 'action': 'ArchiveCopy'} if action['action'] == 'Copy' else action for action in steps]
+            for path, steps in seed_actions.items()
+        }
+    if get_strategy() is not None:
+        seed_actions = {
+            path: [{**action, 'action': get_published_action(action['action'])}
+                   if action['action'] in PUBLISH_ACTIONS else action for action in steps]
+            for path, steps in seed_actions.items()
+        }
+    if metrics.enabled:
+        seed_actions = {
+            path: [{**action, 'action': get_measured_action(action['action']),
+                    '_step': action['action'], '_set': Path(path).name} for action in steps]
+            for path, steps in seed_actions.items()
+        }
+    return seed_actions
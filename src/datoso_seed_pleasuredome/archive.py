@@ -0,0 +1,118 @@
+"""Virtual DAT files that point to members of the downloaded archives.
+
+A virtual DAT is a small stub with the name the member would have once extracted,
+it stores the archive and member it stands for, so the DATs are read straight
+from the archive and only written to disk when copied to their destination.
+Compressed DATs (see compression) are read the same way, decompressed.
+"""
+import os
+import shutil
+import threading
+import zipfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO
+
+from datoso_seed_pleasuredome.compression import (
+    compress_file,
+    decompress_file,
+    detect_codec,
+    is_dat,
+    open_compressed,
+    open_decompressed,
+)
+
+MARKER = b'#pleasuredome-archive\n'
+
+
+def write_stub(file: str | Path, archive: str | Path, member: str) -> None:
+    """Write a virtual DAT for an archive member."""
+    Path(file).parent.mkdir(parents=True, exist_ok=True)
+    Path(file).unlink(missing_ok=True)
+    with open(file, 'wb') as stub:
+        stub.write(MARKER)
+        stub.write(f'{archive}\n{member}\n'.encode())
+
+
+def read_stub(file: str | Path) -> tuple[str, str] | None:
+    """Read the archive and member of a virtual DAT, None if it is a regular file."""
+    if not Path(file).is_file():
+        return None
+    with open(file, 'rb') as stub:
+        if stub.read(len(MARKER)) != MARKER:
+            return None
+        archive, member = stub.read().decode().splitlines()[:2]
+    return archive, member
+
+
+@contextmanager
+def open_member(archive: str, member: str) -> Iterator[BinaryIO]:
+    """Open an archive member."""
+    with zipfile.ZipFile(archive) as zip_ref, zip_ref.open(member) as source:
+        yield source
+
+
+def feed_pipe(opener: Callable, write_fd: int) -> None:
+    """Write the content of what opener opens to a pipe."""
+    with suppress(BrokenPipeError), open(write_fd, 'wb') as pipe, opener() as source:
+        shutil.copyfileobj(source, pipe)
+
+
+@contextmanager
+def open_source(file: str | Path) -> Iterator[str | Path | int]:
+    """Get something `open` can read the content of a DAT from.
+
+    For virtual and compressed DATs it is the descriptor of a pipe fed from the
+    archive or the decompressor, the DAT classes open it as if it was the file.
+    """
+    if (stub := read_stub(file)) is not None:
+        opener = partial(open_member, *stub)
+    elif (codec := detect_codec(file)) is not None:
+        opener = partial(open_decompressed, file, codec)
+    else:
+        yield file
+        return
+    read_fd, write_fd = os.pipe()
+    pipe_inode = os.fstat(read_fd).st_ino
+    thread = threading.Thread(target=feed_pipe, args=(opener, write_fd), daemon=True)
+    thread.start()
+    try:
+        yield read_fd
+    finally:
+        # open() closes the descriptor when the reader is done with it
+        with suppress(OSError):
+            if os.fstat(read_fd).st_ino == pipe_inode:
+                os.close(read_fd)
+        thread.join()
+
+
+def materialize(path: str | Path, codec: str | None = None, level: int | None = None) -> int:
+    """Replace the virtual DATs in a file or folder with the content of their members.
+
+    The DATs are left compressed with codec, decompressed if it is None.
+    Returns the number of files written.
+    """
+    path = Path(path)
+    files = [file for file in path.rglob('*') if file.is_file()] if path.is_dir() else [path]
+    stubs = {}
+    written = 0
+    for file in files:
+        if stub := read_stub(file):
+            stubs.setdefault(stub[0], []).append((file, stub[1]))
+        elif codec is None:
+            written += decompress_file(file)
+        elif is_dat(file) and detect_codec(file) is None:
+            compress_file(file, codec, level)
+            written += 1
+    for archive, members in stubs.items():
+        with zipfile.ZipFile(archive) as zip_ref:
+            for file, member in members:
+                # Replaced, not rewritten, as the file may be a hardlink of the virtual DAT
+                tmp_file = file.with_name(f'{file.name}.tmp')
+                with zip_ref.open(member) as source, \
+                    (open_compressed(tmp_file, codec, level) if codec else open(tmp_file, 'wb')) as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(tmp_file, file)
+    return written + sum(len(members) for members in stubs.values())
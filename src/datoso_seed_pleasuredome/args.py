@@ -6,18 +6,50 @@ from datoso.configuration import config
 
 def seed_args(parser: ArgumentParser) -> ArgumentParser:
     """Add seed arguments to the parser."""
-    parser.add_argument('-do', '--download', help='Download the specified sets', nargs='+',
-                choices=['mame', 'hbmame', 'fruitmachines', 'demul', 'fbneo', 'kawaks', 'pinball', 'pinmame', 'raine'])
+    parser.add_argument('-do', '--download', nargs='+',
+                help='Download the specified sets (mame, hbmame, fruitmachines, demul, fbneo, kawaks, pinball, '
+                     'pinmame, raine, or any other folder of the nonmame index of the site)')
+    parser.add_argument('-inc', '--incremental', action='store_true',
+                help='Only download and extract the archives that changed since the last fetch')
+    parser.add_argument('-eng', '--engine', choices=['threads', 'asyncio'],
+                help='Download engine, asyncio downloads all the sets from a single queue')
+    parser.add_argument('-met', '--metrics', metavar='FILE',
+                help='Write per-phase metrics to FILE, in the Prometheus text format if it ends with .prom')
+    parser.add_argument('-prof', '--profile', metavar='FOLDER',
+                help='Profile the fetch and parse phases, writing .prof and allocation reports to FOLDER')
+    parser.add_argument('-plan', '--plan', nargs='?', const='', metavar='FILE',
+                help='With --fetch, only print what would be downloaded, skipped, extracted and backed up, '
+                     'also written as JSON to FILE if given')
+    parser.add_argument('-watch', '--watch', nargs='?', const='', metavar='SECONDS',
+                help='With --fetch, stay running and sync the sets as they change upstream, '
+                     'polling their index pages every SECONDS (900 by default)')
     return parser
 
 def post_parser(args: Namespace) -> None:
     """Post parser actions."""
     if getattr(args, 'download', None) is not None:
         config['PLEASUREDOME']['download'] = ','.join(args.download)
+    if getattr(args, 'incremental', False):
+        config['PLEASUREDOME']['Incremental'] = 'true'
+    if getattr(args, 'engine', None) is not None:
+        config['PLEASUREDOME']['Engine'] = args.engine
+    if getattr(args, 'metrics', None) is not None:
+        config['PLEASUREDOME']['Metrics'] = args.metrics
+    if getattr(args, 'profile', None) is not None:
+        config['PLEASUREDOME']['Profile'] = args.profile
+    if getattr(args, 'plan', None) is not None:
+        config['PLEASUREDOME']['Plan'] = 'true'
+        config['PLEASUREDOME']['PlanFile'] = args.plan
+    if getattr(args, 'watch', None) is not None:
+        config['PLEASUREDOME']['Watch'] = 'true'
+        if args.watch:
+            config['PLEASUREDOME']['WatchInterval'] = args.watch
 
 def init_config() -> None:
     """Initialize the configuration."""
     if not config.has_section('PLEASUREDOME'):
         config['PLEASUREDOME'] = {
             'download': 'mame,hbmame,fruitmachines',
+            'Incremental': 'false',
+            'Engine': 'threads',
         }
@@ -0,0 +1,87 @@
+"""Classification of the Pleasuredome dats by their name.
+
+The keywords the rules, the dat classes and the name heuristics look for are
+checked with plain substring tests, what they mean (class, prefix, system and
+suffix) comes from the tables below, and the result is cached by name, as the
+same names are classified by every step of a chain. A first classification of
+a name is about as fast as the substring checks it replaced, names without a
+version skip the version pattern (see benchmarks/classify.py).
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+VERSION_RE = re.compile(r'0\.[0-9]+(?:\.[0-9]+)?')
+
+# Dat class of the names with a keyword and its priority, the first one found wins
+DAT_CLASSES = (
+    ('HBMAME', 'HomeBrewMameDat', 70),
+    ('MAME', 'MameDat', 50),
+    ('Fruit Machine', 'FruitMachinesXMLDat', 50),
+    ('FruitMachine', 'FruitMachinesXMLDat', 50),
+    ('SWP Machine', 'FruitMachinesXMLDat', 50),
+)
+PREFIXES = {
+    'HomeBrewMameDat': 'Arcade',
+    'MameDat': 'Arcade',
+    'FruitMachinesXMLDat': 'Arcade',
+}
+SYSTEMS = (
+    ('Future Pinball', 'Future Pinball'),
+    ('Visual Pinball', 'Visual Pinball'),
+)
+# Suffix of the names with the keyword (and the second one if any), the first match wins
+SUFFIXES = (
+    ('Layouts', None, 'Layouts'),
+    ('MPU5 Hexfiles', None, 'MPU5 Hexfiles'),
+    ('Snapshots', None, 'Snapshots'),
+    ('Rollback', '2009', 'Rollback/2009'),
+    ('Rollback', '2018', 'Rollback/2018'),
+    ('Rollback', None, 'Rollback'),
+    ('SWP Machine Roms', None, 'SWP Machine Roms'),
+)
+DEFAULT_SUFFIX = 'Roms'
+
+
+class Classification(NamedTuple):
+    """What the name of a dat tells about it."""
+
+    dat_class: str | None
+    prefix: str | None
+    system: str | None
+    suffix: str
+    version: str | None
+    update: bool
+    dir2dat: bool
+
+
+@lru_cache(maxsize=8192)
+def classify(name: str) -> Classification:
+    """Classify a dat by its name (or path)."""
+    versions = VERSION_RE.findall(name) if '0.' in name else None
+    dat_class = None
+    for keyword, keyword_class, _ in DAT_CLASSES:
+        if keyword in name:
+            dat_class = keyword_class
+            break
+    system = None
+    for keyword, keyword_system in SYSTEMS:
+        if keyword in name:
+            system = keyword_system
+            break
+    suffix = DEFAULT_SUFFIX
+    for keyword, other, keyword_suffix in SUFFIXES:
+        if keyword in name and (other is None or other in name):
+            suffix = keyword_suffix
+            break
+    return Classification._make((dat_class, PREFIXES.get(dat_class), system, suffix,
+                                 versions[-1] if versions else None, 'Update' in name, 'dir2dat' in name))
+
+
+def get_rule_patterns() -> list:
+    """Get the dat classes, their priority and a pattern of their keywords, for the datoso rules."""
+    patterns = {}
+    for keyword, dat_class, priority in DAT_CLASSES:
+        patterns.setdefault((dat_class, priority), []).append(re.escape(keyword))
+    return [(dat_class, priority, re.compile('|'.join(keywords)))
+            for (dat_class, priority), keywords in patterns.items()]
@@ -0,0 +1,263 @@
+"""Compact in-memory model of the machines of MAME-like XML dats.
+
+xmltodict keeps every machine and ROM as dicts of strings, hundreds of
+thousands of them for a MAME dat. With `CompactLoad` every machine (without
+its ROMs) is kept marshalled in a single buffer, and the name, size, CRC32 and
+SHA1 of the ROMs in packed arrays, the rest of their attributes shared between
+equal ROMs. The games are still read as the dicts xmltodict makes, built on
+access.
+
+Loading the 19 MB dat of the benchmarks xmltodict holds 106 MB (133 MB peak),
+the compact model 16 MB (16 MB peak); a 23 MB dat with the years,
+manufacturers, device references and ROM regions of MAME, 163 MB (188 MB peak)
+and 16 MB (16 MB peak).
+"""
+import marshal
+import sys
+from array import array
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from xml.etree.ElementTree import Element
+
+from datoso_seed_pleasuredome.diff import iter_entries
+
+SHA1_SIZE = 20
+SHA1_NONE = bytes(SHA1_SIZE)
+# Bits of RomTable.packed, the value is in the arrays instead of the extras
+PACKED_SIZE = 0x1
+PACKED_CRC = 0x2
+PACKED_SHA1 = 0x4
+PACKED_NAME = 0x8
+
+
+def share(shared: dict, value: tuple | str) -> tuple | str:
+    """Get the first equal value seen, so equal values are kept once."""
+    return shared.setdefault(value, value)
+
+
+def compact_attributes(attributes: dict, shared: dict) -> tuple:
+    """Get the attributes of an element as a tuple of (key, value) pairs."""
+    return share(shared, tuple(share(shared, (sys.intern(key), value)) for key, value in attributes.items()))
+
+
+def get_text(element: Element) -> str | None:
+    """Get the text of an element, stripped as xmltodict does."""
+    return (element.text.strip() or None) if element.text else None
+
+
+def compact_node(element: Element) -> tuple:
+    """Get an element as a (tag, attributes, text, children) tuple."""
+    return (element.tag, tuple(element.attrib.items()), get_text(element),
+            tuple(compact_node(child) for child in element))
+
+
+def add_child(value: dict, tag: str, child: dict | str | None) -> None:
+    """Add a child to an xmltodict dict, repeated tags become lists."""
+    if tag not in value:
+        value[tag] = child
+    elif isinstance(value[tag], list):
+        value[tag].append(child)
+    else:
+        value[tag] = [value[tag], child]
+
+
+def node_to_dict(node: tuple) -> dict | str | None:
+    """Convert an element tuple to the xmltodict representation."""
+    _, attributes, text, children = node
+    if not attributes and not children:
+        return text
+    value = {f'@{key}': attribute for key, attribute in attributes}
+    for child in children:
+        add_child(value, child[0], node_to_dict(child))
+    if text:
+        value['#text'] = text
+    return value
+
+
+class RomTable:
+    """The ROMs of a dat, their names in one buffer and size, CRC32 and SHA1 in packed arrays.
+
+    Values that would not be written back the same (uppercase hashes, sizes
+    in hex) and the rest of the attributes are kept as extras.
+    """
+
+    __slots__ = ('crcs', 'extras', 'name_ends', 'names', 'packed', 'sha1s', 'sizes')
+
+    def __init__(self) -> None:
+        """Initialize the table."""
+        self.names = bytearray()
+        self.name_ends = array('q')
+        self.sizes = array('q')
+        self.crcs = array('q')
+        self.sha1s = bytearray()
+        self.packed = bytearray()
+        self.extras = []
+
+    def __len__(self) -> int:
+        """Get the number of ROMs."""
+        return len(self.packed)
+
+    def add(self, attributes: dict, shared: dict) -> None:
+        """Add a ROM."""
+        attributes = dict(attributes)
+        packed = 0
+        size = attributes.get('size')
+        if size is not None and size.isdigit() and str(int(size)) == size:
+            packed |= PACKED_SIZE
+            del attributes['size']
+        self.sizes.append(int(size) if packed & PACKED_SIZE else -1)
+        crc = attributes.get('crc')
+        crc_value = self.parse_hex(crc, 8)
+        if crc_value is not None:
+            packed |= PACKED_CRC
+            del attributes['crc']
+        self.crcs.append(crc_value if crc_value is not None else -1)
+        sha1 = attributes.get('sha1')
+        if self.parse_hex(sha1, SHA1_SIZE * 2) is not None:
+            packed |= PACKED_SHA1
+            del attributes['sha1']
+            self.sha1s += bytes.fromhex(sha1)
+        else:
+            self.sha1s += SHA1_NONE
+        name = attributes.pop('name', None)
+        if name is not None:
+            packed |= PACKED_NAME
+            self.names += name.encode()
+        self.name_ends.append(len(self.names))
+        self.packed.append(packed)
+        self.extras.append(compact_attributes(attributes, shared) if attributes else None)
+
+    @staticmethod
+    def parse_hex(value: str | None, length: int) -> int | None:
+        """Parse a lowercase hex value of length digits, None if it would not be written back the same."""
+        if value is None or len(value) != length:
+            return None
+        try:
+            number = int(value, 16)
+        except ValueError:
+            return None
+        return number if f'{number:0{length}x}' == value else None
+
+    def get(self, index: int) -> tuple:
+        """Get the name, size, CRC32 and SHA1 of a ROM, None for the ones it does not have."""
+        packed = self.packed[index]
+        start = self.name_ends[index - 1] if index else 0
+        return (
+            self.names[start:self.name_ends[index]].decode() if packed & PACKED_NAME else None,
+            self.sizes[index] if packed & PACKED_SIZE else None,
+            f'{self.crcs[index]:08x}' if packed & PACKED_CRC else None,
+            self.sha1s[index * SHA1_SIZE:(index + 1) * SHA1_SIZE].hex() if packed & PACKED_SHA1 else None,
+        )
+
+    def to_dict(self, index: int) -> dict:
+        """Get a ROM in the xmltodict representation."""
+        name, size, crc, sha1 = self.get(index)
+        rom = {}
+        if name is not None:
+            rom['@name'] = name
+        if size is not None:
+            rom['@size'] = str(size)
+        if crc is not None:
+            rom['@crc'] = crc
+        if sha1 is not None:
+            rom['@sha1'] = sha1
+        rom.update({f'@{key}': value for key, value in self.extras[index] or ()})
+        return rom
+
+
+class CompactGames(Sequence):
+    """The games of a dat, read as the list of dicts xmltodict makes.
+
+    The dicts are built on every access, changes to them are not kept, a new
+    list has to be assigned instead (as datoso's dedupe and merge do).
+    """
+
+    def __init__(self) -> None:
+        """Initialize the games."""
+        self.records = bytearray()
+        self.record_ends = array('q')
+        self.rom_ends = array('q')
+        self.roms = RomTable()
+
+    def add(self, element: Element, shared: dict) -> None:
+        """Add a machine, the attributes of its ROMs equal to others are taken from shared."""
+        rom_at = None
+        children = []
+        for child in element:
+            if child.tag == 'rom':
+                if rom_at is None:
+                    rom_at = len(children)
+                self.roms.add(child.attrib, shared)
+            else:
+                children.append(compact_node(child))
+        self.records += marshal.dumps((tuple(element.attrib.items()), tuple(children), rom_at))
+        self.record_ends.append(len(self.records))
+        self.rom_ends.append(len(self.roms))
+
+    def __len__(self) -> int:
+        """Get the number of games."""
+        return len(self.record_ends)
+
+    def __getitem__(self, index: int | slice) -> dict | list:
+        """Get a game, or a list of them for a slice."""
+        indexes = range(len(self))
+        if isinstance(index, slice):
+            return [self.to_dict(position) for position in indexes[index]]
+        return self.to_dict(indexes[index])
+
+    def __iter__(self) -> Iterator[dict]:
+        """Iterate the games."""
+        for index in range(len(self)):
+            yield self.to_dict(index)
+
+    def get_record(self, index: int) -> tuple:
+        """Get the attributes, children (but the ROMs) and position of the ROMs of a machine."""
+        start = self.record_ends[index - 1] if index else 0
+        return marshal.loads(self.records[start:self.record_ends[index]])
+
+    def get_rom_range(self, index: int) -> range:
+        """Get the indexes of the ROMs of a machine in the ROM table."""
+        return range(self.rom_ends[index - 1] if index else 0, self.rom_ends[index])
+
+    def to_dict(self, index: int) -> dict:
+        """Get a machine in the xmltodict representation."""
+        attributes, children, rom_at = self.get_record(index)
+        value = {f'@{key}': attribute for key, attribute in attributes}
+        rom_list = [self.roms.to_dict(rom) for rom in self.get_rom_range(index)]
+        for position, child in enumerate(children):
+            if position == rom_at:
+                value['rom'] = rom_list if len(rom_list) > 1 else rom_list[0]
+            add_child(value, child[0], node_to_dict(child))
+        if rom_at == len(children):
+            value['rom'] = rom_list if len(rom_list) > 1 else rom_list[0]
+        return value
+
+    def iter_roms(self) -> Iterator[tuple]:
+        """Iterate the machine name, ROM name, size, CRC32 and SHA1 of every ROM, without building dicts."""
+        for index in range(len(self)):
+            roms = self.get_rom_range(index)
+            if not roms:
+                continue
+            name = dict(self.get_record(index)[0]).get('name')
+            for rom in roms:
+                yield (name, *self.roms.get(rom))
+
+
+def load_compact(file: str | Path) -> dict:
+    """Load an XML dat with its games in a compact model, in the xmltodict layout."""
+    entries = iter_entries(file)
+    root = next(entries)
+    main = {f'@{key}': value for key, value in root.attrib.items()}
+    games = CompactGames()
+    game_key = None
+    # Only needed while loading, the ROMs keep the attributes they share
+    shared = {}
+    for element in entries:
+        if element.tag == 'header':
+            main['header'] = node_to_dict(compact_node(element))
+            continue
+        game_key = game_key or element.tag
+        games.add(element, shared)
+    if game_key is not None:
+        main[game_key] = games
+    return {root.tag: main}
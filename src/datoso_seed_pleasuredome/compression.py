@@ -0,0 +1,99 @@
+"""Compressed storage of the extracted and published DATs.
+
+With `Compression` the DATs are kept gzip or zstd compressed under their own
+name, they are told apart by their magic bytes and read through streaming
+decompression (see archive.open_source), so the dat classes read them as if
+they were plain files. zstd needs the zstandard package.
+"""
+import gzip
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO
+
+from datoso.configuration import config
+
+MAGICS = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+MAGIC_SIZE = max(len(magic) for magic in MAGICS.values())
+DAT_SUFFIXES = ('.dat', '.xml')
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_compression() -> tuple[str | None, int | None]:
+    """Get the `Compression` codec (None if disabled) and `CompressionLevel` options."""
+    codec = config.get('PLEASUREDOME', 'Compression', fallback='').lower() or None
+    if codec is not None and codec not in MAGICS:
+        msg = f'Unknown Compression {codec}, use one of {", ".join(MAGICS)}'
+        raise ValueError(msg)
+    if codec == 'zstd':
+        get_zstandard()
+    level = config.get('PLEASUREDOME', 'CompressionLevel', fallback='')
+    return codec, int(level) if level else None
+
+
+def get_zstandard():
+    """Import zstandard, only needed for zstd."""
+    try:
+        import zstandard
+    except ImportError:
+        msg = 'zstd compression needs the zstandard package: pip install zstandard'
+        raise ImportError(msg) from None
+    return zstandard
+
+
+def detect_codec(file: str | Path) -> str | None:
+    """Get the codec a file is compressed with, None if it is not compressed."""
+    try:
+        with open(file, 'rb') as fild:
+            head = fild.read(MAGIC_SIZE)
+    except (IsADirectoryError, FileNotFoundError):
+        return None
+    return next((codec for codec, magic in MAGICS.items() if head.startswith(magic)), None)
+
+
+def open_decompressed(file: str | Path, codec: str) -> BinaryIO:
+    """Open a compressed file, reading its decompressed content."""
+    if codec == 'gzip':
+        return gzip.open(file, 'rb')
+    return get_zstandard().ZstdDecompressor().stream_reader(open(file, 'rb'), closefd=True)
+
+
+def open_compressed(file: str | Path, codec: str, level: int | None = None) -> BinaryIO:
+    """Open a file to write it compressed."""
+    if codec == 'gzip':
+        return gzip.open(file, 'wb', compresslevel=6 if level is None else level)
+    compressor = get_zstandard().ZstdCompressor(level=3 if level is None else level)
+    return compressor.stream_writer(open(file, 'wb'), closefd=True)
+
+
+def is_dat(file: str | Path) -> bool:
+    """Check if a file is stored compressed, only the DATs are."""
+    return Path(file).suffix.lower() in DAT_SUFFIXES
+
+
+def compress_file(file: str | Path, codec: str, level: int | None = None) -> int:
+    """Compress a file in place (under the same name), returns its new size."""
+    file = Path(file)
+    tmp_file = file.with_name(f'{file.name}.tmp')
+    with open(file, 'rb') as source, open_compressed(tmp_file, codec, level) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    stat = file.stat()
+    os.replace(tmp_file, file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return file.stat().st_size
+
+
+def decompress_file(file: str | Path) -> bool:
+    """Decompress a file in place, returns if it was compressed."""
+    file = Path(file)
+    codec = detect_codec(file)
+    if codec is None:
+        return False
+    tmp_file = file.with_name(f'{file.name}.tmp')
+    with open_decompressed(file, codec) as source, open(tmp_file, 'wb') as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    os.replace(tmp_file, file)
+    return True
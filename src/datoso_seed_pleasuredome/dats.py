@@ -1,17 +1,34 @@
 """PleasureDome Dat class to parse different types of dat files."""
-import json
 import logging
 import re
 from pathlib import Path
+from typing import IO
+from xml.etree.ElementTree import Element, iterparse
 
+import xmltodict
 from datoso.configuration import config
-from datoso.repositories.dat_file import ClrMameProDatFile, DatFile, DirMultiDatFile, XMLDatFile
+from datoso.repositories.dat_file import (
+    ClrMameProDatFile,
+    DatFile,
+    DirMultiDatFile,
+    XMLDatFile,
+)
+
+from datoso_seed_pleasuredome.archive import open_source
+from datoso_seed_pleasuredome.classify import classify
+from datoso_seed_pleasuredome.compact import CompactGames, load_compact
+from datoso_seed_pleasuredome.metadata import load_metadata
+from datoso_seed_pleasuredome.preload import preloader
+from datoso_seed_pleasuredome.profiling import profiled
+
+logger = logging.getLogger(__name__)
 
 # pylint: disable=attribute-defined-outside-init,unsupported-membership-test
 
 
 def mame_dat_factory(file: str) -> DatFile | None:
     """Dat factory."""
+    preloader.prefetch(Path(file).parent, mame_dat_factory)
     ext = Path(file).suffix
     if ext in ('.dat', '.xml'):
         return MameDat
@@ -21,6 +38,7 @@ def mame_dat_factory(file: str) -> DatFile | None:
 
 def hbmame_dat_factory(file: str) -> DatFile | None:
     """Dat factory."""
+    preloader.prefetch(Path(file).parent, hbmame_dat_factory)
     ext = Path(file).suffix
     if ext in ('.dat', '.xml'):
         return HomeBrewMameDat
@@ -31,10 +49,7 @@ def hbmame_dat_factory(file: str) -> DatFile | None:
 
 def get_version(string: str) -> str | None:
     """Get the version from the dat file."""
-    search = re.findall(r'0\.[0-9]*[\.[0-9]*]?', str(string))
-    if search:
-        return search[-1]
-    return None
+    return classify(str(string)).version
 
 
 def remove_extra_spaces(string: str) -> str:
@@ -42,11 +57,61 @@ def remove_extra_spaces(string: str) -> str:
     return re.sub(' +', ' ', string)
 
 
+def element_to_dict(element: Element) -> dict | str | None:
+    """Convert an XML element to the xmltodict representation."""
+    if not element.attrib and not len(element):
+        return element.text
+    value = {f'@{key}': attribute for key, attribute in element.attrib.items()}
+    for child in element:
+        value[child.tag] = element_to_dict(child)
+    if element.text and element.text.strip():
+        value['#text'] = element.text
+    return value
+
+
+def parse_xml_header(file: IO) -> tuple[str, dict, dict, str | None]:
+    """Stream-parse an XML dat until its first game.
+
+    Returns the main key, its attributes, the header and the game key.
+    """
+    main_key, attributes, header, game_key = None, {}, {}, None
+    depth = 0
+    for event, element in iterparse(file, events=('start', 'end')):
+        if event == 'end':
+            depth -= 1
+            if depth == 1 and element.tag == 'header':
+                header = element_to_dict(element) or {}
+            continue
+        depth += 1
+        if depth == 1:
+            main_key = element.tag
+            attributes = {f'@{key}': value for key, value in element.attrib.items()}
+        elif depth == 2 and element.tag != 'header':
+            game_key = element.tag
+            break
+    return main_key, attributes, header, game_key
+
+
+class ArchiveMemberMixin:
+    """Read virtual DATs straight from their archive."""
+
+    def load(self, *args, **kwargs) -> None:
+        """Load the dat file, streaming it from the archive if it is a virtual DAT."""
+        file = self.file
+        with open_source(file) as source:
+            self.file = source
+            try:
+                super().load(*args, **kwargs)
+            finally:
+                self.file = file
+
+
 class MameDirDat(DirMultiDatFile):
     """Mame Dir Dat class."""
 
     seed: str = 'pleasuredome'
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -54,10 +119,10 @@ class MameDirDat(DirMultiDatFile):
         self.system = 'MAME'
         self.suffix = None
         self.prefix = self.system_type = 'Arcade'
-        file_name = str(self.file)
-        self.version = get_version(file_name)
+        classification = classify(str(self.file))
+        self.version = classification.version
 
-        if 'Update' in file_name:
+        if classification.update:
             self.suffix = 'Update'
         else:
             self.name = remove_extra_spaces(self.name.replace(self.version, ''))
@@ -65,21 +130,85 @@ class MameDirDat(DirMultiDatFile):
         return [self.prefix, self.company, self.system, self.suffix, self.get_date()]
 
 
-class MameDat(XMLDatFile):
-    """Mame Dat class."""
+class MameDat(ArchiveMemberMixin, XMLDatFile):
+    """Mame Dat class.
 
-    seed: str = 'pleasuredome'
+    With `LazyLoad` only the header is parsed to classify the dat, the machines
+    are loaded the first time `data` is used.
+    With `ParallelLoad` the dats are loaded ahead in a process pool (see preload).
+    With `CompactLoad` the games are kept in a compact model (see compact).
+    """
 
+    seed: str = 'pleasuredome'
+    preloadable: bool = True
+    _data: dict = None
+
+    @property
+    def data(self) -> dict:
+        """Get the parsed dat, loading it if only the header was loaded."""
+        if self._data is None and self.file:
+            self._data = self.parse_data()
+        return self._data
+
+    @data.setter
+    def data(self, value: dict) -> None:
+        self._data = value
+
+    def parse_data(self) -> dict:
+        """Parse the dat file, in the compact model with `CompactLoad`."""
+        if config.getboolean('PLEASUREDOME', 'CompactLoad', fallback=False):
+            return load_compact(self.file)
+        with open_source(self.file) as source, open(source, encoding='utf-8') as fild:
+            return xmltodict.parse(fild.read())
+
+    def load(self) -> None:
+        """Load the dat file, only its header in lazy mode."""
+        if (preloaded := preloader.get(self.file)) is not None:
+            self.__dict__.update(preloaded)
+            return
+        lazy = config.getboolean('PLEASUREDOME', 'LazyLoad', fallback=False)
+        if not lazy and not config.getboolean('PLEASUREDOME', 'CompactLoad', fallback=False):
+            super().load()
+            return
+        self.__dict__.update(self.read_header(self.file))
+        self._data = None if lazy else self.parse_data()
+
+    @staticmethod
+    def read_header(file: str | Path) -> dict:
+        """Parse only the header of a dat, returns the attributes load sets from it."""
+        with open_source(file) as source, open(source, 'rb') as fild:
+            main_key, attributes, header, game_key = parse_xml_header(fild)
+        state = {'main_key': main_key, 'header': header, 'game_key': game_key}
+        if not header:
+            state['name'] = attributes.get('@name')
+            state['full_name'] = attributes.get('@description')
+            return state
+        state['name'] = header.get('name')
+        state['full_name'] = header.get('description')
+        state['date'] = header.get('date')
+        for key in ('homepage', 'url', 'author', 'email'):
+            value = header.get(key)
+            state[key] = value if value and 'insert' not in value else None
+        return state
+
+    def mark_mias(self, mias: dict) -> None:
+        """Mark the mias in the dat file, the compact games are turned into dicts first."""
+        games = self.data[self.main_key].get(self.game_key)
+        if isinstance(games, CompactGames):
+            self.data[self.main_key][self.game_key] = list(games)
+        super().mark_mias(mias)
+
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
         self.company = 'MAME'
         self.suffix = None
         self.prefix = self.system_type = 'Arcade'
-        file_name = str(self.file)
-        self.version = self.header.get('version', get_version(file_name))
+        classification = classify(str(self.file))
+        self.version = self.header.get('version', classification.version)
 
-        if 'Update' in file_name:
+        if classification.update:
             self.suffix = 'Update'
         else:
             try:
@@ -89,7 +218,7 @@ class MameDat(XMLDatFile):
                 print(self.version)
                 print(self.__dict__['header'])
                 raise
-        if 'dir2dat' in file_name and 'dir2dat' not in self.name:
+        if classification.dir2dat and 'dir2dat' not in self.name:
             self.name = f'{self.name} (dir2dat)'
         self.system = self.name
 
@@ -99,6 +228,7 @@ class MameDat(XMLDatFile):
 class HomeBrewMameDirDat(MameDirDat):
     """HomeBrew Mame Dir Dat class."""
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -110,6 +240,7 @@ class HomeBrewMameDirDat(MameDirDat):
 class HomeBrewMameDat(MameDat):
     """HomeBrew Mame Dat class."""
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -121,24 +252,21 @@ class HomeBrewMameDat(MameDat):
 class RaineDat(MameDat):
     """HomeBrew Mame Dat class."""
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
         super().initial_parse()
         self.company = 'Raine'
 
-class PinballDat(XMLDatFile):
+class PinballDat(ArchiveMemberMixin, XMLDatFile):
     """HomeBrew Mame Dat class."""
 
-    allowed_systems = ['Future Pinball', 'Visual Pinball']
-
     def get_system(self) -> str:
         """Get the system from the dat file."""
-        for system in self.allowed_systems:
-            if system in self.name:
-                return system
-        return 'Pinball'
+        return classify(self.name).system or 'Pinball'
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -160,6 +288,7 @@ class PinballDat(XMLDatFile):
 class KawaksDat(MameDat):
     """HomeBrew Mame Dat class."""
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -169,28 +298,24 @@ class KawaksDat(MameDat):
 
 def fruit_machine_factory(file_name: str) -> DatFile | None:
     """Fruit Dat factory."""
-    dat_class = DatFile.class_from_file(file_name)
+    with open_source(file_name) as source:
+        dat_class = DatFile.class_from_file(source)
     if dat_class == XMLDatFile:
         return FruitMachinesXMLDat
     if dat_class == ClrMameProDatFile:
         return FruitMachinesClrMameDat
-    logging.error('Unknown Fruit Machine Dat file: %s', file_name)
+    logger.error('Unknown Fruit Machine Dat file: %s', file_name)
     return None
 
 
-class FruitMachinesXMLDat(XMLDatFile):
+class FruitMachinesXMLDat(ArchiveMemberMixin, XMLDatFile):
     """Fruit Machines Dat class."""
 
     def load_metadata_file(self) -> dict:
         """Load the metadata file."""
-        file  = Path(self.file)
-        metadata_file = file.parent / 'metadata.txt'
-        metadata = {}
-        if metadata_file.exists():
-            with open(metadata_file, encoding='utf-8') as file:
-                metadata = json.load(file)
-        return metadata
+        return load_metadata(Path(self.file).parent)
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -215,21 +340,16 @@ class FruitMachinesXMLDat(XMLDatFile):
         return self.date
 
 
-class FruitMachinesClrMameDat(ClrMameProDatFile):
+class FruitMachinesClrMameDat(ArchiveMemberMixin, ClrMameProDatFile):
     """Fruit Machines Dat class."""
 
     seed: str = 'pleasuredome'
 
     def load_metadata_file(self) -> dict:
         """Load the metadata file."""
-        file = Path(self.file)
-        file_name = file.parent / 'metadata.txt'
-        metadata = {}
-        if Path.exists(file_name):
-            with open(file_name, encoding='utf-8') as file:
-                metadata = json.load(file)
-        return metadata
+        return load_metadata(Path(self.file).parent)
 
+    @profiled()
     def initial_parse(self) -> list:
         # pylint: disable=R0801
         """Parse the dat file."""
@@ -256,18 +376,4 @@ class FruitMachinesClrMameDat(ClrMameProDatFile):
 
 def get_suffix(file_name: str) -> str:
     """Get the suffix from the dat file."""
-    if 'Layouts' in str(file_name):
-        return 'Layouts'
-    elif 'MPU5 Hexfiles' in str(file_name):
-        return 'MPU5 Hexfiles'
-    elif 'Snapshots' in str(file_name):
-        return 'Snapshots'
-    elif 'Rollback' in str(file_name):
-        if '2009' in str(file_name):
-            return 'Rollback/2009'
-        if '2018' in str(file_name):
-            return 'Rollback/2018'
-        return 'Rollback'
-    elif 'SWP Machine Roms' in str(file_name):
-        return 'SWP Machine Roms'
-    return 'Roms'
+    return classify(str(file_name)).suffix
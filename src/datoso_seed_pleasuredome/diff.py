@@ -0,0 +1,147 @@
+"""Game-level differences between consecutive versions of MAME-like XML DATs.
+
+Every machine is reduced to a digest of its ROMs and disks (name, size, CRC32
+and SHA1). The digests of the last version of each DAT are kept as a snapshot,
+so a new version is compared without the old file, and the changeset (added,
+removed and changed machines) is written next to it, optionally with a delta
+DAT holding only the added and changed machines.
+"""
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from xml.etree.ElementTree import Element, iterparse, tostring
+from xml.sax.saxutils import quoteattr
+
+from datoso_seed_pleasuredome.archive import open_source
+
+ROM_TAGS = ('rom', 'disk')
+ROM_ATTRIBUTES = ('name', 'size', 'crc', 'sha1')
+
+
+def iter_entries(file: str | Path) -> Iterator[Element]:
+    """Stream an XML DAT: its root element (without children), then its header and machines.
+
+    Every machine is dropped from the tree once the next one is read.
+    """
+    depth = 0
+    root = None
+    with open_source(file) as source, open(source, 'rb') as fild:
+        for event, element in iterparse(fild, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = element
+                    yield root
+                continue
+            if depth == 2:
+                yield element
+                root.remove(element)
+            depth -= 1
+
+
+def machine_digest(machine: Element) -> str:
+    """Get the digest of the ROMs and disks of a machine."""
+    roms = sorted('\t'.join(child.get(key) or '' for key in ROM_ATTRIBUTES)
+                  for child in machine if child.tag in ROM_TAGS)
+    return hashlib.sha1('\n'.join(roms).encode()).hexdigest()[:16]
+
+
+def get_digests(file: str | Path) -> dict:
+    """Get the digest of every machine of a DAT, by name."""
+    entries = iter_entries(file)
+    next(entries, None)
+    return {
+        element.get('name'): machine_digest(element)
+        for element in entries if element.tag != 'header'
+    }
+
+
+def diff_digests(old: dict, new: dict) -> dict:
+    """Compare the digests of two versions of a DAT."""
+    return {
+        'added': sorted(new.keys() - old.keys()),
+        'removed': sorted(old.keys() - new.keys()),
+        'changed': sorted(name for name in new.keys() & old.keys() if new[name] != old[name]),
+    }
+
+
+def write_delta(file: str | Path, names: set, destination: str | Path) -> int:
+    """Write a DAT with the header and the machines in names of file, returns the machines written."""
+    written = 0
+    tmp_file = Path(destination).with_name(f'{Path(destination).name}.tmp')
+    with open(tmp_file, 'wb') as delta:
+        entries = iter_entries(file)
+        root = next(entries)
+        attributes = ''.join(f' {key}={quoteattr(value)}' for key, value in root.attrib.items())
+        delta.write(f'<?xml version="1.0"?>\n<{root.tag}{attributes}>\n'.encode())
+        for element in entries:
+            if element.tag == 'header' or element.get('name') in names:
+                element.tail = '\n'
+                delta.write(tostring(element))
+                written += element.tag != 'header'
+        delta.write(f'</{root.tag}>\n'.encode())
+    os.replace(tmp_file, destination)
+    return written
+
+
+def write_json(file: Path, data: dict) -> None:
+    """Write a JSON file, atomically."""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as fild:
+        json.dump(data, fild, indent=4)
+    os.replace(tmp_file, file)
+
+
+class DiffStore:
+    """Snapshots of the last version of every DAT and the changesets between versions."""
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize the store."""
+        self.path = Path(path)
+
+    def get_folder(self, key: str) -> Path:
+        """Get the folder of a DAT, key is the same for all its versions."""
+        return self.path.joinpath(*(part.replace(os.sep, '_') for part in key.split('/')))
+
+    def load_snapshot(self, key: str) -> dict | None:
+        """Load the snapshot of the last version of a DAT."""
+        file = self.get_folder(key) / 'snapshot.json'
+        if not file.exists():
+            return None
+        with open(file, encoding='utf-8') as fild:
+            return json.load(fild)
+
+    def diff(self, key: str, file: str | Path, version: str, *, deltas: bool = False) -> dict | None:
+        """Compare a DAT with the last version seen, writing the changeset and the new snapshot.
+
+        Returns None if there is no previous version or it is the same one.
+        """
+        snapshot = self.load_snapshot(key)
+        if snapshot is not None and snapshot['version'] == version:
+            return None
+        digests = get_digests(file)
+        folder = self.get_folder(key)
+        folder.mkdir(parents=True, exist_ok=True)
+        changeset = None
+        if snapshot is not None:
+            changes = diff_digests(snapshot['machines'], digests)
+            name = f'{snapshot["version"]}-{version}'
+            changeset = {
+                'dat': key,
+                'file': str(file),
+                'old_version': snapshot['version'],
+                'new_version': version,
+                'machines': len(digests),
+                **{f'{change}_count': len(names) for change, names in changes.items()},
+                **changes,
+                'delta': None,
+            }
+            if deltas and (changes['added'] or changes['changed']):
+                changeset['delta'] = str(folder / f'{name}.xml')
+                write_delta(file, {*changes['added'], *changes['changed']}, changeset['delta'])
+            write_json(folder / f'{name}.json', changeset)
+        write_json(folder / 'snapshot.json', {'version': version, 'file': str(file), 'machines': digests})
+        return changeset
@@ -0,0 +1,279 @@
+"""Download helpers for the pleasuredome seed."""
+import http.client
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http import HTTPStatus
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import unquote, urljoin, urlsplit
+
+from datoso_seed_pleasuredome.integrity import DownloadError, StreamVerifier
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.scheduler import RateLimiter
+from datoso_seed_pleasuredome.store import ArchiveStore
+
+CHUNK_SIZE = 1024 * 1024
+PART_SUFFIX = '.part'
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (
+    HTTPStatus.MOVED_PERMANENTLY, HTTPStatus.FOUND, HTTPStatus.SEE_OTHER,
+    HTTPStatus.TEMPORARY_REDIRECT, HTTPStatus.PERMANENT_REDIRECT,
+)
+
+
+def get_filename(href: str) -> str:
+    """Get the local file name of a DAT link."""
+    return unquote(Path(href).name)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections shared between downloads, grouped by host."""
+
+    def __init__(self, timeout: int = 60, limiter: RateLimiter | None = None) -> None:
+        """Initialize the pool, the bytes downloaded through it are limited by limiter."""
+        self.timeout = timeout
+        self.limiter = limiter
+        self.idle = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def throttle(self, size: int) -> None:
+        """Wait until size bytes can be downloaded."""
+        if self.limiter is not None:
+            self.limiter.consume(size)
+
+    def get(self, scheme: str, netloc: str, *, fresh: bool = False) -> http.client.HTTPConnection:
+        """Get an idle connection to a host, or open a new one."""
+        with self.lock:
+            if self.idle[scheme, netloc] and not fresh:
+                return self.idle[scheme, netloc].pop()
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout)
+
+    def put(self, scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+        """Return a connection to the pool."""
+        with self.lock:
+            self.idle[scheme, netloc].append(connection)
+
+    def close(self) -> None:
+        """Close all the idle connections."""
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+    def send(self, method: str, scheme: str, netloc: str, path: str,
+             headers: dict) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a request, retrying once on a fresh connection if a kept-alive one was dropped.
+
+        The number of retries is kept in the `retries` attribute of the response.
+        """
+        connection = self.get(scheme, netloc)
+        try:
+            connection.request(method, path, headers=headers)
+            response = connection.getresponse()
+            response.retries = 0
+            return connection, response
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+        connection = self.get(scheme, netloc, fresh=True)
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        response.retries = 1
+        return connection, response
+
+    @contextmanager
+    def request(self, method: str, url: str, headers: dict | None = None) -> Iterator[http.client.HTTPResponse]:
+        """Make a request following redirects, the connection is reused if the body was consumed."""
+        if not url.startswith(('http:', 'https:')):
+            msg = 'URL must start with "http:" or "https:"'
+            raise ValueError(msg)
+        headers = headers or {}
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path = f'{path}?{parts.query}'
+            connection, response = self.send(method, parts.scheme, parts.netloc, path, headers)
+            if response.status in REDIRECT_STATUSES and response.getheader('Location'):
+                response.read()
+                self.release(parts.scheme, parts.netloc, connection, response)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            try:
+                if response.status >= HTTPStatus.BAD_REQUEST:
+                    raise HTTPError(url, response.status, response.reason, response.headers, None)
+                yield response
+            finally:
+                self.release(parts.scheme, parts.netloc, connection, response)
+            return
+        msg = f'Too many redirects for {url}'
+        raise HTTPError(url, HTTPStatus.LOOP_DETECTED, msg, None, None)
+
+    def release(self, scheme: str, netloc: str, connection: http.client.HTTPConnection,
+                response: http.client.HTTPResponse) -> None:
+        """Return the connection to the pool if it can be reused."""
+        if response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self.put(scheme, netloc, connection)
+
+
+def get_part_file(destination: str | Path, part_folder: str | Path | None = None) -> Path:
+    """Get the temporary file a download is written to before it is complete."""
+    destination = Path(destination)
+    return Path(part_folder or destination.parent) / f'{destination.name}{PART_SUFFIX}'
+
+
+def load_part_info(part: Path, url: str) -> dict | None:
+    """Get the info of a partial download of url, None if it can not be resumed."""
+    info_file = part.with_name(f'{part.name}.json')
+    if not part.is_file() or not info_file.is_file():
+        return None
+    with open(info_file, encoding='utf-8') as file:
+        info = json.load(file)
+    # Resuming needs a validator for If-Range, an unchanged file keeps its ETag/Last-Modified
+    if info.get('url') != url or not (info.get('etag') or info.get('last_modified')) \
+        or part.stat().st_size >= (info.get('size') or 0):
+        return None
+    return info
+
+
+def save_part_info(part: Path, info: dict) -> None:
+    """Save the info of a partial download."""
+    with open(part.with_name(f'{part.name}.json'), 'w', encoding='utf-8') as file:
+        json.dump(info, file)
+
+
+def remove_part(part: Path) -> None:
+    """Remove a partial download and its info."""
+    part.unlink(missing_ok=True)
+    part.with_name(f'{part.name}.json').unlink(missing_ok=True)
+
+
+def get_content_range(response: http.client.HTTPResponse) -> tuple[int, int | None] | None:
+    """Get the start and total size of a partial response."""
+    match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.getheader('Content-Range') or '')
+    if not match:
+        return None
+    return int(match[1]), None if match[2] == '*' else int(match[2])
+
+
+def verify_download(part: Path, size: int | None, verifier: StreamVerifier) -> None:
+    """Check the size of a download and the members of a zip.
+
+    A short file is kept to be resumed, a corrupt one is removed.
+    """
+    if size is not None and part.stat().st_size != size:
+        msg = f'{part.name}: expected {size} bytes, got {part.stat().st_size}'
+        raise DownloadError(msg)
+    try:
+        verifier.verify(part)
+    except DownloadError:
+        remove_part(part)
+        raise
+
+
+def download_file(pool: ConnectionPool, url: str, destination: str | Path,
+                  manifest: DownloadManifest | None = None, set_name: str | None = None,
+                  stats: dict | None = None, part_folder: str | Path | None = None,
+                  store: ArchiveStore | None = None, *, restore: bool = False) -> bool:
+    """Download a file, sending the validators stored in the manifest if any.
+
+    The file is written to a temporary .part file (in part_folder if given) and
+    only moved to destination once its size and members are checked (see
+    integrity), the members are checked as the bytes arrive. A .part left
+    by an interrupted download is resumed with a Range request if the server
+    still has the same file.
+    With a store, downloaded files are added to it and an unchanged file is linked
+    from it if its local copy is gone, or always with restore (when the dats folder
+    was cleaned). With restore, a file not in the store is always downloaded.
+    Returns False if the file did not change since the last download, the
+    transferred bytes and retries are added to stats.
+    """
+    stats = {} if stats is None else stats
+    destination = Path(destination)
+    part = get_part_file(destination, part_folder)
+    part.parent.mkdir(parents=True, exist_ok=True)
+    previous = (manifest.get(url) or {}) if manifest else {}
+    stored = store is not None and store.has(previous.get('sha1'))
+    part_info = load_part_info(part, url)
+    if part_info:
+        offset = part.stat().st_size
+        headers = {'Range': f'bytes={offset}-', 'If-Range': part_info.get('etag') or part_info['last_modified']}
+    elif stored:
+        headers = manifest.validators(url)
+    elif manifest and not restore:
+        headers = manifest.conditional_headers(url)
+    else:
+        # Nothing to restore an unchanged file from, it is downloaded again
+        headers = {}
+    verifier = StreamVerifier(is_zip=destination.suffix.lower() == '.zip')
+    size = resumed = 0
+    with pool.request('GET', url, headers=headers) as response:
+        stats['retries'] = stats.get('retries', 0) + response.retries
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            if stored and (restore or not Path(previous.get('path') or '').exists()):
+                store.restore(previous['sha1'], destination)
+                stats['restored'] = True
+                manifest.update(url, path=str(destination))
+                return True
+            return False
+        if response.status == HTTPStatus.PARTIAL_CONTENT:
+            if not part_info or get_content_range(response) != (offset, part_info['size']):
+                # Not the range that was asked for, start over without it
+                remove_part(part)
+                return download_file(pool, url, destination, manifest, set_name, stats, part_folder,
+                                     store, restore=restore)
+            with open(part, 'rb') as file:
+                while chunk := file.read(CHUNK_SIZE):
+                    verifier.update(chunk)
+            stats['resumed'] = size = resumed = offset
+            mode = 'ab'
+        else:
+            length = response.getheader('Content-Length')
+            part_info = {
+                'url': url,
+                'etag': response.getheader('ETag'),
+                'last_modified': response.getheader('Last-Modified'),
+                'size': int(length) if length else None,
+            }
+            save_part_info(part, part_info)
+            mode = 'wb'
+        with open(part, mode) as file:
+            while chunk := response.read(CHUNK_SIZE):
+                pool.throttle(len(chunk))
+                file.write(chunk)
+                verifier.update(chunk)
+                size += len(chunk)
+    stats['bytes'] = size - resumed
+    verify_download(part, part_info['size'], verifier)
+    os.replace(part, destination)
+    remove_part(part)
+    if store is not None:
+        store.add(destination, verifier.sha1_hex)
+    if manifest is None:
+        return True
+
+    data = {
+        'etag': part_info['etag'],
+        'last_modified': part_info['last_modified'],
+        'size': size,
+        'sha1': verifier.sha1_hex,
+        'crc32': f'{verifier.crc32:08x}',
+        'set': set_name,
+    }
+    # Servers without validators send the whole file again, compare the hash
+    previous_path = Path(previous.get('path') or '')
+    if not restore and previous.get('sha1') == data['sha1'] and previous_path.is_file() \
+        and previous_path != destination:
+        destination.unlink()
+        manifest.update(url, **data)
+        return False
+    manifest.update(url, path=str(destination), **data)
+    return True
@@ -0,0 +1,115 @@
+"""Asyncio download engine for the pleasuredome seed."""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from datoso_seed_pleasuredome.download import get_filename
+from datoso_seed_pleasuredome.metrics import metrics
+from datoso_seed_pleasuredome.profiling import get_profile_path
+
+
+class DownloadEngine:
+    """Download the archives of every selected set from a single queue.
+
+    Index pages of all the sets are fetched at once and their archives share
+    the same keep-alive connection pool, limited globally and per host, and
+    are started in the order of the helper's schedule.
+    Every archive is handed to the extract stage as soon as it is downloaded,
+    through a bounded queue, so unzipping overlaps the remaining downloads.
+    A max_per_host of 0 limits every host to max_connections.
+    The first error of the set actions is raised once the downloads finish,
+    as the threads engine does.
+    """
+
+    def __init__(self, helper: 'PleasureDomeHelper', max_connections: int = 10,  # noqa: F821
+                 max_per_host: int = 0, extract_workers: int = 2, queue_size: int = 4) -> None:
+        """Initialize the engine."""
+        self.helper = helper
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host or max_connections
+        self.extract_workers = extract_workers
+        self.queue_size = queue_size
+        self.executor = None
+        self.semaphore = None
+        self.host_semaphores = None
+        self.queue = None
+        self.error = None
+
+    def run(self, pdsets: list) -> None:
+        """Download and process the sets."""
+        asyncio.run(self.download_sets(pdsets))
+
+    async def download_sets(self, pdsets: list) -> None:
+        """Download and process the sets concurrently."""
+        self.semaphore = asyncio.Semaphore(self.max_connections)
+        self.host_semaphores = defaultdict(lambda: asyncio.Semaphore(self.max_per_host))
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.error = None
+        # Index fetches and extractions also need a thread besides the downloads
+        workers = self.max_connections + self.extract_workers + len(pdsets)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self.executor = executor
+            extractors = [asyncio.create_task(self.extract_worker()) for _ in range(self.extract_workers)]
+            try:
+                loop = asyncio.get_running_loop()
+                links = await asyncio.gather(*(
+                    loop.run_in_executor(executor, self.helper.get_dat_links, pdset.name, pdset.url)
+                    for pdset in pdsets
+                ))
+                # Sets by priority, the download tasks are started (and get their slots) in this order
+                all_links = self.helper.schedule(dict(zip(pdsets, links, strict=True)))
+                await asyncio.gather(*(self.download_set(pdset, links) for pdset, links in all_links.items()))
+                await self.queue.join()
+                if self.error is not None:
+                    raise self.error
+                for pdset in all_links:
+                    self.helper.write_metadata(pdset.name)
+            finally:
+                for extractor in extractors:
+                    extractor.cancel()
+                self.helper.pool.close()
+                if self.helper.manifest is not None:
+                    self.helper.manifest.save()
+
+    async def download_set(self, pdset: 'PDSET', links: list) -> None:  # noqa: F821
+        """Download a set, its archives are queued for extraction."""
+        name = pdset.name
+        self.helper.prune_removed(name, links)
+        with metrics.measure('set', name):
+            print(f'Downloading {name} DAT files')
+            changed = await asyncio.gather(*(self.download(href, pdset) for href in links))
+        if self.helper.manifest is not None:
+            print(f'{sum(changed)} of {len(links)} {name} DAT files changed')
+
+    async def download(self, href: str, pdset: 'PDSET') -> bool:  # noqa: F821
+        """Download an archive when there are connections available for its host."""
+        loop = asyncio.get_running_loop()
+        # Wait for the host first, so a busy host does not hold global slots
+        async with self.host_semaphores[urlsplit(href).netloc], self.semaphore:
+            changed = await loop.run_in_executor(self.executor, self.helper.download_dat, href, pdset.name)
+            if changed:
+                # Keep the connection slot while the extract stage is full
+                await self.queue.put((pdset, get_filename(href)))
+        return changed
+
+    async def extract_worker(self) -> None:
+        """Run the set actions over the downloaded archives.
+
+        While profiling they run in the event loop thread, only the main thread is profiled.
+        """
+        loop = asyncio.get_running_loop()
+        inline = get_profile_path() is not None
+        while True:
+            pdset, file = await self.queue.get()
+            try:
+                if inline:
+                    self.helper.run_actions(pdset, [file])
+                else:
+                    await loop.run_in_executor(self.executor, self.helper.run_actions, pdset, [file])
+            except Exception as e:  # noqa: BLE001
+                # Kept for download_sets, the queue goes on so the downloads waiting on it finish
+                if self.error is None:
+                    self.error = e
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,209 @@
+"""Archive extraction for the pleasuredome seed.
+
+Functions in this module run in worker processes, they only take and return picklable values.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+from datoso_seed_pleasuredome.archive import write_stub
+from datoso_seed_pleasuredome.compression import (
+    compress_file,
+    detect_codec,
+    is_dat,
+    open_decompressed,
+)
+
+CHUNK_SIZE = 1024 * 1024
+# Versions in archive names (0.262, 0.245.15), dates and part numbers are kept
+VERSION_RE = re.compile(r'[0-9]+(?:\.[0-9]+)+')
+
+
+def file_crc32(file: Path) -> int:
+    """Calculate the CRC32 of a file, of its decompressed content if it is compressed."""
+    crc = 0
+    codec = detect_codec(file)
+    with open(file, 'rb') if codec is None else open_decompressed(file, codec) as fild:
+        while chunk := fild.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def is_safe(name: str) -> bool:
+    """Check if a member name stays inside the extraction folder."""
+    path = Path(name)
+    return not path.is_absolute() and '..' not in path.parts
+
+
+def get_lineage(file: str | Path) -> str:
+    """Get the name of an archive without its version, the same for all its versions."""
+    return VERSION_RE.sub('#', Path(file).stem)
+
+
+def get_index_name(file: str | Path, set_name: str) -> str:
+    """Get the index name of an archive, by set and the archive name without its version."""
+    return f'{set_name}/{get_lineage(file)}.json'
+
+
+def load_index(index_file: str | Path | None) -> dict:
+    """Load the index of the files extracted from an archive."""
+    if index_file and Path(index_file).exists():
+        with open(index_file, encoding='utf-8') as file:
+            return json.load(file)
+    return {}
+
+
+def save_index(index_file: str | Path, index: dict) -> None:
+    """Save the index of the files extracted from an archive, atomically."""
+    Path(index_file).parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=Path(index_file).parent, suffix='.tmp')
+    try:
+        with open(fd, 'w', encoding='utf-8') as file:
+            json.dump(index, file)
+        os.replace(tmp_file, index_file)
+    except BaseException:
+        Path(tmp_file).unlink(missing_ok=True)
+        raise
+
+
+def is_unchanged(member: zipfile.ZipInfo, target: Path, indexed: dict | None) -> bool:
+    """Check if the extracted file already has the content of the member.
+
+    The CRC stored in the index is trusted while the file keeps its size and mtime,
+    otherwise the CRC of the file is calculated.
+    """
+    try:
+        stat = target.stat()
+    except FileNotFoundError:
+        return False
+    # The size of the file as stored, compressed or not
+    if stat.st_size != (indexed or {}).get('size', member.file_size):
+        return False
+    if indexed and indexed['crc'] == member.CRC and indexed['mtime'] == stat.st_mtime_ns:
+        return True
+    return file_crc32(target) == member.CRC
+
+
+def extract_archive(file: str | Path, destination: str | Path, index_file: str | Path | None = None, *,
+                    incremental: bool = False, prune: bool = False,
+                    compression: str | None = None, level: int | None = None) -> dict:
+    """Extract an archive into destination, returns a summary of the extraction.
+
+    In incremental mode only the members that are new or changed are written, comparing
+    the CRC32 and size of the central directory with the files already extracted.
+    With prune, the files extracted from a previous version of the archive that are
+    not in it anymore are removed.
+    A folder extracted from a previous version of the same archive (the same name
+    without its version) is renamed to the new destination, so only its changed
+    files are written.
+    With compression (gzip or zstd) the DATs are stored compressed.
+    """
+    start = time.perf_counter()
+    result = {
+        'file': str(file), 'destination': str(destination), 'archive_bytes': Path(file).stat().st_size,
+        'members': 0, 'bytes': 0, 'written': 0, 'skipped': 0, 'removed': 0, 'error': None, 'seconds': 0.0,
+    }
+    destination = Path(destination)
+    previous_index = load_index(index_file)
+    previous = previous_index.get('members', {})
+    previous_destination = Path(previous_index.get('destination', destination))
+    same_lineage = get_lineage(previous_index.get('archive', '')) == get_lineage(file)
+    if incremental and same_lineage and previous_destination != destination and previous_destination.is_dir() \
+        and previous_destination != Path(file).parent and not destination.exists():
+        previous_destination.rename(destination)
+    index = {}
+    try:
+        destination.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(file, 'r') as zip_ref:
+            members = [member for member in zip_ref.infolist() if not member.is_dir()]
+            for member in members:
+                target = destination / member.filename
+                if incremental and is_safe(member.filename) \
+                    and is_unchanged(member, target, previous.get(member.filename)):
+                    result['skipped'] += 1
+                else:
+                    # The published dats may be hardlinks of the extracted ones, a new file breaks the link
+                    if is_safe(member.filename):
+                        target.unlink(missing_ok=True)
+                    target = Path(zip_ref.extract(member, destination))
+                    if compression and is_dat(target):
+                        compress_file(target, compression, level)
+                    result['written'] += 1
+                stat = target.stat()
+                index[member.filename] = {'crc': member.CRC, 'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+        result['members'] = len(members)
+        result['bytes'] = sum(member.file_size for member in members)
+    except zipfile.BadZipFile as e:
+        result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+    if prune:
+        for name in previous.keys() - index.keys():
+            target = destination / name
+            if is_safe(name) and target.is_file():
+                target.unlink()
+                result['removed'] += 1
+    if index_file:
+        save_index(index_file, {'archive': Path(file).name, 'destination': str(destination), 'members': index})
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def remove_extracted(file: str | Path, index_file: str | Path, destination: str | Path | None = None) -> int:
+    """Remove the files extracted from an archive gone upstream, returns the number of files removed.
+
+    The members are listed from the archive, or from its index if the archive is gone.
+    The files of a newer version of the archive extracted to the same destination are kept.
+    """
+    file = Path(file)
+    index = load_index(index_file)
+    own = index.get('archive') == file.name
+    if destination is None and not own:
+        return 0
+    destination = Path(destination or index['destination'])
+    try:
+        with zipfile.ZipFile(file, 'r') as zip_ref:
+            names = {member.filename for member in zip_ref.infolist() if not member.is_dir()}
+    except (OSError, zipfile.BadZipFile):
+        names = set(index.get('members', {})) if own else set()
+    if own:
+        Path(index_file).unlink(missing_ok=True)
+    elif Path(index.get('destination', '')) == destination:
+        names -= index.get('members', {}).keys()
+    removed = 0
+    for name in names:
+        target = destination / name
+        if is_safe(name) and target.is_file():
+            target.unlink()
+            removed += 1
+    return removed
+
+
+def link_archive(file: str | Path, destination: str | Path, archive: str | Path) -> dict:
+    """Write virtual DATs for the members of an archive instead of extracting them.
+
+    The virtual DATs point to archive, the location the archive is moved to.
+    """
+    start = time.perf_counter()
+    result = {
+        'file': str(file), 'destination': str(destination), 'archive_bytes': Path(file).stat().st_size,
+        'members': 0, 'bytes': 0, 'written': 0, 'skipped': 0, 'removed': 0, 'error': None, 'seconds': 0.0,
+    }
+    try:
+        with zipfile.ZipFile(file, 'r') as zip_ref:
+            members = [member for member in zip_ref.infolist() if not member.is_dir() and is_safe(member.filename)]
+    except zipfile.BadZipFile as e:
+        result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+    for member in members:
+        write_stub(Path(destination) / member.filename, archive, member.filename)
+    result['members'] = result['written'] = len(members)
+    result['bytes'] = sum(member.file_size for member in members)
+    result['seconds'] = time.perf_counter() - start
+    return result
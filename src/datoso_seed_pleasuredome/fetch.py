@@ -1,47 +1,103 @@
 """Fetch and download DAT files."""
-import json
+import errno
+import http.client
 import logging
 import os
-import urllib.request
-import zipfile
-from concurrent.futures import ThreadPoolExecutor
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from enum import Enum
+from functools import partial
 from html.parser import HTMLParser
+from http import HTTPStatus
 from pathlib import Path
 from typing import ClassVar
-from urllib.parse import urljoin
+from urllib.error import HTTPError
+from urllib.parse import quote, urljoin, urlsplit
 
 import dateutil.parser
-
 from datoso.configuration import config
 from datoso.configuration.folder_helper import Folders
-from datoso.helpers.download import downloader
-from datoso.helpers.file_utils import move_path
-from datoso_seed_pleasuredome import __prefix__
 
-# ruff: noqa: ERA001
+from datoso_seed_pleasuredome import __prefix__
+from datoso_seed_pleasuredome.compression import get_compression
+from datoso_seed_pleasuredome.download import (
+    ConnectionPool,
+    download_file,
+    get_filename,
+)
+from datoso_seed_pleasuredome.engine import DownloadEngine
+from datoso_seed_pleasuredome.extract import (
+    extract_archive,
+    get_index_name,
+    link_archive,
+    remove_extracted,
+)
+from datoso_seed_pleasuredome.index import IndexCache
+from datoso_seed_pleasuredome.integrity import DownloadError
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.metadata import load_metadata, update_metadata
+from datoso_seed_pleasuredome.metrics import metrics
+from datoso_seed_pleasuredome.plan import FetchPlanner, run_plan
+from datoso_seed_pleasuredome.profiling import get_profile_path, profiled
+from datoso_seed_pleasuredome.scheduler import (
+    DownloadScheduler,
+    RateLimiter,
+    get_set_value,
+    parse_rate,
+    parse_set_values,
+)
+from datoso_seed_pleasuredome.store import ArchiveStore
+from datoso_seed_pleasuredome.watch import Watcher
 
-# TODO(laromicas): Auto add sets from the website https://pleasuredome.github.io/pleasuredome/nonmame/index.html
+logger = logging.getLogger(__name__)
 
+PLEASUREDOME_URL = 'https://pleasuredome.github.io/pleasuredome/'
+# Sets not in PDSET are discovered from this index
+NONMAME_URL = 'https://pleasuredome.github.io/pleasuredome/nonmame/index.html'
+# Characters kept as they are when quoting the links of the index pages
+URL_SAFE = ":/?#[]@!$&'()*+,;=%"
+# Seconds to wait before retrying a failed download, doubled on every retry
+RETRY_DELAY = 1
 MAME_URL = 'https://pleasuredome.github.io/pleasuredome/mame/index.html'
 
+def mirror_url(url: str) -> str:
+    """Get a URL of the site from the mirror, if one is configured."""
+    mirror = config.get('PLEASUREDOME', 'MirrorUrl', fallback=None)
+    if mirror:
+        return url.replace(PLEASUREDOME_URL, mirror.rstrip('/') + '/')
+    return url
+
+
 class MyHTMLParser(HTMLParser):
     """A custom HTML parser for parsing Pleasuredome HTML."""
 
     dats: list = None
     rootpath = None
+    suffix = '.zip'
 
     def handle_starttag(self, tag: str, attrs: list) -> None:
-        """Handle the start tag of an HTML element, capture the zip hrefs."""
+        """Handle the start tag of an HTML element, capture the hrefs ending with suffix."""
         if self.dats is None:
             self.dats = []
         if tag == 'a':
             taga = dict(attrs)
             if 'href' in taga:
                 href = taga['href']
-                if href.endswith('.zip'):
-                    self.dats.append(urljoin(self.rootpath, href).replace(' ', '%20'))
+                if href.endswith(self.suffix):
+                    self.dats.append(quote(urljoin(self.rootpath, href), safe=URL_SAFE))
+
+
+def parse_links(html: str, url: str, suffix: str = '.zip') -> list:
+    """Get the links of an index page ending with suffix."""
+    parser = MyHTMLParser()
+    parser.dats = []
+    parser.rootpath = url
+    parser.suffix = suffix
+    parser.feed(html)
+    return parser.dats
 
 
 class PDSET(Enum):
@@ -107,33 +163,166 @@ class PDSET(Enum):
         ],
     }
 
+    @property
+    def url(self) -> str:
+        """Get the index URL, from the mirror if one is configured."""
+        return mirror_url(self.value['url'])
+
+
+class DiscoveredSet:
+    """A set of the nonmame index that is not in PDSET, its archives are extracted to its folder."""
+
+    def __init__(self, url: str) -> None:
+        """Initialize the set, named after its folder in the site."""
+        self.name = Path(urlsplit(url).path).parent.name
+        self.value = {
+            'url': url,
+            'configVar': self.name.lower(),
+            'actions': [
+                'extract_fruit_dats',
+            ],
+        }
+
+    @property
+    def url(self) -> str:
+        """Get the index URL."""
+        return self.value['url']
+
 class PleasureDomeHelper:
     """Helper class for Pleasuredome."""
 
-    def __init__(self, folder_helper: Folders) -> None:
-        """Initialize PleasureDomeHelper."""
+    def __init__(self, folder_helper: Folders, manifest: DownloadManifest | None = None,
+                 pool: ConnectionPool | None = None, store: ArchiveStore | None = None,
+                 incremental: bool | None = None) -> None:
+        """Initialize PleasureDomeHelper, incremental defaults to the Incremental option."""
         self.folder_helper = folder_helper
+        self.manifest = manifest
+        if incremental is None:
+            incremental = config.getboolean('PLEASUREDOME', 'Incremental', fallback=False)
+        self.incremental = incremental
+        self.pool = pool or ConnectionPool()
+        self.store = store
+        self.process_pool = None
+        self.extract_results = []
+        self.lock = threading.Lock()
+        self.index_cache = IndexCache(folder_helper.download / 'index_cache.json')
+        self.pool.limiter = RateLimiter(parse_rate(config.get('PLEASUREDOME', 'MaxBytesPerSecond', fallback='0')))
+        self.scheduler = DownloadScheduler(
+            int(config.get('PLEASUREDOME', 'MaxConnections', fallback='10')),
+            adaptive=config.getboolean('PLEASUREDOME', 'AdaptiveConnections', fallback=False),
+        )
+        self.priorities = {}
+        self.metadata = {}
 
-    def get_dat_links(self, name: str, mame_url: str) -> list:
-        """Get DAT links from Pleasuredome."""
+    def get_dat_links(self, name: str, mame_url: str, stats: dict | None = None) -> list:
+        """Get DAT links from Pleasuredome, stats gets the counters of the index (cached if not modified)."""
         print(f'Fetching {name} DAT files')
         if not mame_url.startswith(('http', 'https')):
             msg = 'Invalid URL'
             raise ValueError(msg)
-        red = urllib.request.urlopen(mame_url) # noqa: S310
-        pleasurehtml = red.read()
+        with metrics.measure('index', name, url=mame_url) as event:
+            links = self.index_cache.get_links(self.pool, mame_url, parse_links, event)
+            event['links'] = len(links)
+        if stats is not None:
+            stats.update(event)
+        return links
+
+    def get_all_dat_links(self, pdsets: list) -> dict:
+        """Get the DAT links of every set, fetching their index pages in parallel."""
+        with ThreadPoolExecutor(max_workers=max(len(pdsets), 1)) as executor:
+            futures = {pdset: executor.submit(self.get_dat_links, pdset.name, pdset.url) for pdset in pdsets}
+            return {pdset: future.result() for pdset, future in futures.items()}
+
+    def discover_sets(self) -> list:
+        """Get the sets of the nonmame index that are not in PDSET."""
+        url = mirror_url(NONMAME_URL)
+        with metrics.measure('index', 'nonmame', url=url) as event:
+            links = self.index_cache.get_links(self.pool, url, partial(parse_links, suffix='index.html'), event)
+        known = {pdset.url for pdset in PDSET}
+        folder = url.rsplit('/', 1)[0] + '/'
+        # Only the index pages of the folders right under nonmame
+        return [
+            DiscoveredSet(link) for link in dict.fromkeys(links)
+            if link.startswith(folder) and link[len(folder):].count('/') == 1 and link not in known
+        ]
+
+    def download_dat(self, href: str, folder: str) -> bool:
+        """Download a DAT file, returns False if it did not change upstream."""
+        destination = self.folder_helper.dats / folder / get_filename(href)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # Partial downloads are kept out of the dats folder, which is cleaned before every fetch
+        part_folder = self.folder_helper.download / 'partial' / folder
+        retries = int(config.get('PLEASUREDOME', 'DownloadRetries', fallback='2'))
+        with metrics.measure('download', folder, file=destination.name, retries=0) as event:
+            for attempt in range(retries + 1):
+                try:
+                    # The slot is given back while waiting to retry, the retry keeps its priority
+                    with self.scheduler.slot(self.priorities.get(href, ())):
+                        event['changed'] = download_file(
+                            self.pool, href, destination, self.manifest, folder, event, part_folder, self.store,
+                            # Without Incremental the dats folder was cleaned, unchanged archives are needed again
+                            restore=not self.incremental)
+                    self.scheduler.report(event.get('bytes', 0))
+                    break
+                except (DownloadError, http.client.HTTPException, OSError) as e:
+                    self.scheduler.report(0, error=True)
+                    # Client errors (missing files) will not go away
+                    if attempt == retries or (isinstance(e, HTTPError) and e.code < HTTPStatus.INTERNAL_SERVER_ERROR):
+                        raise
+                    logger.warning('Error downloading %s, retrying: %s', destination.name, e)
+                    event['retries'] += 1
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+        return event['changed']
+
+    def get_sizes(self, links: list) -> dict:
+        """Get the size of the archives, from the manifest or probing them with HEAD requests."""
+        sizes = {href: (self.manifest.get(href) or {}).get('size') if self.manifest else None for href in links}
+        unknown = [href for href, size in sizes.items() if size is None]
+        if unknown:
+            planner = FetchPlanner(self)
+            with ThreadPoolExecutor(max_workers=self.scheduler.max_connections) as executor:
+                for href, head in zip(unknown, executor.map(planner.probe, unknown), strict=True):
+                    sizes[href] = head['size'] or 0
+        return sizes
+
+    def schedule(self, all_links: dict) -> dict:
+        """Order the sets by priority and their archives by the Order policy (index, largest, smallest).
 
-        parser = MyHTMLParser()
-        parser.dats = []
-        parser.rootpath = mame_url
-        parser.folder_helper = self.folder_helper
-        parser.feed(str(pleasurehtml))
-        return parser.dats
+        The download slots are given in the same order.
+        """
+        priorities = parse_set_values(config.get('PLEASUREDOME', 'Priority', fallback=''))
+        order = config.get('PLEASUREDOME', 'Order', fallback='index')
+        pdsets = sorted(all_links, key=lambda pdset: -get_set_value(priorities, pdset))
+        if order in ('largest', 'smallest'):
+            sizes = self.get_sizes([href for links in all_links.values() for href in links])
+        scheduled = {}
+        for rank, pdset in enumerate(pdsets):
+            links = all_links[pdset]
+            if order in ('largest', 'smallest'):
+                links = sorted(links, key=lambda href: sizes[href], reverse=order == 'largest')
+            scheduled[pdset] = links
+            self.priorities.update({href: (rank, position) for position, href in enumerate(links)})
+        return scheduled
 
-    def download_dat(self, href: str, folder: str) -> None:
-        """Download a DAT file."""
-        filename = Path(href).name.replace('%20', ' ')
-        downloader(url=href, destination=self.folder_helper.dats / folder / filename, reporthook=None)
+    def prune_removed(self, name: str, links: list) -> None:
+        """Forget the archives of a set gone from its index and remove the files extracted from them."""
+        if self.manifest is None or not links:
+            return
+        removed = self.manifest.prune(name, links)
+        for entry in removed:
+            file = Path(entry.get('path') or get_filename(entry['url']))
+            index_file = self.folder_helper.download / 'extract_index' / get_index_name(file, name)
+            remove_extracted(file, index_file, entry.get('destination'))
+            # Folders of their own (Software Lists) are removed once empty
+            destination = Path(entry.get('destination') or self.folder_helper.dats / name)
+            if destination != self.folder_helper.dats / name and destination.is_dir() \
+                and not any(destination.iterdir()):
+                destination.rmdir()
+            if file.is_relative_to(self.folder_helper.dats):
+                file.unlink(missing_ok=True)
+        if removed:
+            print(f'{len(removed)} {name} DAT files removed upstream')
+            self.manifest.save()
 
     def extract_date(self, filename: str) -> datetime:
         """Extract date from filename."""
@@ -141,92 +330,275 @@ class PleasureDomeHelper:
         return dateutil.parser.parse(datetext)
 
     def write_metadata_fruit(self, name: str, files: list) -> None:
-        """Write metadata for FruitMachines."""
+        """Collect the metadata of the FruitMachines archives, written once the set is downloaded."""
+        archives = {
+            file: {'date': self.extract_date(file).strftime('%Y-%m-%d')}
+            for file in files if 'FruitMachines' in file and file.endswith('.zip')
+        }
+        with self.lock:
+            self.metadata.setdefault(name, {}).update(archives)
+
+    def write_metadata(self, name: str) -> None:
+        """Write the metadata collected for a set, the newest archive names the set."""
+        with self.lock:
+            archives = self.metadata.pop(name, None)
+        if not archives:
+            return
         path = self.folder_helper.dats / name
-        for file in files:
-            if 'FruitMachines' in file and file.endswith('.zip'):
-                date = self.extract_date(file)
-            with open(path / 'metadata.txt', 'w', encoding='utf-8') as f:
-                metadata = {
-                    'name': 'FruitMachines',
-                    'date': date.strftime('%Y-%m-%d'),
-                    'zipfile': file,
-                    # 'folder': Path(file).stem,
-                    'folder': 'FruitMachines',
-                }
-                json.dump(metadata, f, indent=4)
-
-    def backup_file(self, path: str, file: str) -> None:
-        """Backup a file."""
+        archives = {**load_metadata(path).get('archives', {}), **archives}
+        file = max(archives, key=lambda file: archives[file]['date'])
+        metadata = {
+            'name': 'FruitMachines',
+            'date': archives[file]['date'],
+            'zipfile': file,
+            # 'folder': Path(file).stem,
+            'folder': 'FruitMachines',
+        }
+        update_metadata(path, metadata, archives)
+
+    def backup_file(self, path: str, file: str, **data: str) -> None:
+        """Backup a file, replacing the previous backup of the same name, data is added to its manifest entry."""
         path.mkdir(parents=True, exist_ok=True)
-        move_path(file, path)
+        backup = path / Path(file).name
+        with metrics.measure('backup', path.name, file=backup.name):
+            try:
+                os.replace(file, backup)
+            except OSError as exc:
+                if exc.errno != errno.EXDEV:
+                    raise
+                # Another filesystem, copied next to the backup and swapped in
+                tmp_file = backup.with_name(f'{backup.name}.tmp')
+                shutil.copy2(file, tmp_file)
+                os.replace(tmp_file, backup)
+                Path(file).unlink()
+        if self.manifest is not None:
+            self.manifest.relocate(file, backup, **data)
+
+    def get_process_pool(self) -> ProcessPoolExecutor | None:
+        """Get the process pool for the extractions, None to extract in this process."""
+        processes = int(config.get('PLEASUREDOME', 'ExtractProcesses', fallback='0'))
+        if processes <= 1:
+            return None
+        with self.lock:
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(max_workers=processes)
+        return self.process_pool
+
+    def extract_dats(self, name: str, jobs: list) -> list:
+        """Extract the archives of a set, jobs are (archive, destination) tuples."""
+        if config.getboolean('PLEASUREDOME', 'ZeroExtraction', fallback=False):
+            # Archives are read in place from the backup folder
+            backup = self.folder_helper.backup / name
+            jobs = [(file, destination, backup / Path(file).name) for file, destination in jobs]
+            return self.collect_results(name, [link_archive(*job) for job in jobs])
+        process_pool = self.get_process_pool()
+        compression, level = get_compression()
+        extract = partial(
+            extract_archive,
+            incremental=config.getboolean('PLEASUREDOME', 'IncrementalExtract', fallback=False),
+            prune=config.getboolean('PLEASUREDOME', 'PruneExtracted', fallback=False),
+            compression=compression,
+            level=level,
+        )
+        index_path = self.folder_helper.download / 'extract_index'
+        jobs = [(file, destination, index_path / get_index_name(file, name)) for file, destination in jobs]
+        if process_pool is None:
+            results = [extract(*job) for job in jobs]
+        else:
+            results = list(process_pool.map(extract, *zip(*jobs, strict=True))) if jobs else []
+        return self.collect_results(name, results)
+
+    def collect_results(self, name: str, results: list) -> list:
+        """Backup the extracted archives and keep their results for the summary."""
+        for result in results:
+            result['set'] = name
+            metrics.record('extract', name, result['seconds'], file=Path(result['file']).name,
+                           bytes_in=result['archive_bytes'], bytes_out=result['bytes'], members=result['members'],
+                           written=result['written'], skipped=result['skipped'], removed=result['removed'],
+                           errors=1 if result['error'] else 0)
+            if result['error']:
+                logger.error('Error extracting %s: %s', result['file'], result['error'])
+            else:
+                self.backup_file(self.folder_helper.backup / name, Path(result['file']),
+                                 destination=result['destination'])
+        with self.lock:
+            self.extract_results.extend(results)
+        return results
 
+    @profiled()
     def extract_fruit_dats(self, name: str, files: str) -> None:
         """Extract FruitMachines DATs."""
         path = self.folder_helper.dats / name
-        for file in files:
-            filepath = path / file
-            filename = str(filepath)
-            with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                zip_ref.extractall(path)
-            # filepath.unlink()
-            self.backup_file(self.folder_helper.backup /name, filepath)
+        self.extract_dats(name, [(path / file, path) for file in files])
 
+    @profiled()
     def extract_mame_dats(self, name: str, files: list) -> None:
         """Extract MAME DATs."""
         path = self.folder_helper.dats / name
+        jobs = []
         for file in files:
             filepath = path / file
             filename = str(filepath)
             if ('Software List' in filename and 'dir2dat' not in filename) \
                 or 'EXTRA' in filename:
-                new_path = path / filepath.stem
-                new_path.mkdir(parents=True, exist_ok=True)
-                try:
-                    with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                        zip_ref.extractall(new_path)
-                    # filepath.unlink()
-                    self.backup_file(self.folder_helper.backup /name, filepath)
-                except zipfile.BadZipFile:
-                    logging.exception('Error extracting %s', filename)
+                jobs.append((filepath, path / filepath.stem))
             else:
-                try:
-                    with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                        zip_ref.extractall(path)
-                    # filepath.unlink()
-                    self.backup_file(self.folder_helper.backup /name, filepath)
-                except zipfile.BadZipFile:
-                    logging.exception('Error extracting %s', filename)
+                jobs.append((filepath, path))
+        self.extract_dats(name, jobs)
+
+    def print_extract_summary(self) -> None:
+        """Print a summary of the extracted archives by set."""
+        summary = {}
+        for result in self.extract_results:
+            totals = summary.setdefault(result['set'], dict.fromkeys(
+                ('archives', 'members', 'bytes', 'written', 'skipped', 'removed', 'errors'), 0))
+            totals['archives'] += 1
+            for key in ('members', 'bytes', 'written', 'skipped', 'removed'):
+                totals[key] += result[key]
+            totals['errors'] += 1 if result['error'] else 0
+        for name, totals in summary.items():
+            print(f'Extracted {name}: {totals["archives"]} archives, {totals["members"]} files '
+                  f'({totals["written"]} written, {totals["skipped"]} unchanged, {totals["removed"]} removed), '
+                  f'{totals["bytes"]} bytes, {totals["errors"]} errors')
 
+    def selected_sets(self) -> list:
+        """Get the sets selected to download, the ones not in PDSET are discovered from the site."""
+        sets_to_download = config.get('PLEASUREDOME', 'download', fallback='mame,hbmame,fruitmachines').split(',')
+        sets_to_download = [name.strip().lower() for name in sets_to_download if name.strip()]
+        pdsets = [pdset for pdset in PDSET
+                  if pdset.name.lower() in sets_to_download or pdset.value['configVar'] in sets_to_download]
+        names = {name for pdset in pdsets for name in (pdset.name.lower(), pdset.value['configVar'])}
+        missing = set(sets_to_download) - names
+        if missing:
+            discovered = [pdset for pdset in self.discover_sets() if pdset.value['configVar'] in missing]
+            for name in missing - {pdset.value['configVar'] for pdset in discovered}:
+                logger.warning('Unknown Pleasuredome set: %s', name)
+            pdsets.extend(discovered)
+        return pdsets
+
+    def run_actions(self, pdset: PDSET, files: list) -> None:
+        """Run the actions of a set over the downloaded files."""
+        for action in pdset.value.get('actions', []):
+            func = getattr(self, action)
+            with metrics.measure(action, pdset.name, files=len(files)):
+                func(pdset.name, files)
+
+    @profiled()
     def download_dats(self) -> None:
         """Download DAT files."""
-        sets_to_download = config.get('PLEASUREDOME', 'download', fallback='mame,hbmame,fruitmachines').split(',')
-        for pdset in PDSET:
-            if pdset.name.lower() not in sets_to_download:
-                continue
-            name = pdset.name
-            url = pdset.value['url']
-            links = self.get_dat_links(name, url)
-
-            print(f'Downloading {name} DAT files')
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [
-                    executor.submit(self.download_dat, href, name) for href in links
-                ]
-                for future in futures:
-                    future.result()
-
-            path = self.folder_helper.dats / name
-            files = os.listdir(path)
-            for action in pdset.value.get('actions', []):
-                func = getattr(self, action)
-                func(name, files)
+        try:
+            self.download_sets()
+        finally:
+            self.close()
+        self.print_extract_summary()
+
+    def save(self) -> None:
+        """Save the index cache and the index of the store."""
+        self.index_cache.save()
+        if self.store is not None:
+            self.store.save()
+
+    def close(self) -> None:
+        """Close the connections and the extract processes, evict the store and save the caches."""
+        self.pool.close()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            self.process_pool = None
+        if self.store is not None:
+            self.store.evict(
+                max_age=float(config.get('PLEASUREDOME', 'StoreMaxAge', fallback='0')),
+                max_size=int(float(config.get('PLEASUREDOME', 'StoreMaxSize', fallback='0')) * 2**20),
+            )
+        self.save()
+
+    def download_sets(self) -> None:
+        """Download the selected sets and run their actions."""
+        if config.get('PLEASUREDOME', 'Engine', fallback='threads') == 'asyncio':
+            engine = DownloadEngine(
+                self,
+                max_connections=int(config.get('PLEASUREDOME', 'MaxConnections', fallback='10')),
+                max_per_host=int(config.get('PLEASUREDOME', 'MaxConnectionsPerHost', fallback='0')),
+                extract_workers=int(config.get('PLEASUREDOME', 'ExtractWorkers', fallback='2')),
+                queue_size=int(config.get('PLEASUREDOME', 'ExtractQueueSize', fallback='4')),
+            )
+            engine.run(self.selected_sets())
+            return
+        all_links = self.schedule(self.get_all_dat_links(self.selected_sets()))
+        for pdset, links in all_links.items():
+            with metrics.measure('set', pdset.name):
+                self.download_set(pdset, links)
+
+    def download_set(self, pdset: PDSET, links: list | None = None) -> list:
+        """Download a set and run its actions, returns the files downloaded.
+
+        The actions of every archive run (in ExtractWorkers threads) as soon as it
+        is downloaded, while the rest of the set downloads. While profiling they run
+        in this thread, only the main thread is profiled. The metadata of the set
+        is written once, when all its actions finished.
+        """
+        name = pdset.name
+        if links is None:
+            links = self.get_dat_links(name, pdset.url)
+        self.prune_removed(name, links)
+
+        print(f'Downloading {name} DAT files')
+        extract_workers = max(1, int(config.get('PLEASUREDOME', 'ExtractWorkers', fallback='2')))
+        inline = get_profile_path() is not None
+        with ThreadPoolExecutor(max_workers=self.scheduler.max_connections) as executor, \
+            ThreadPoolExecutor(max_workers=extract_workers) as extractor:
+            futures = {executor.submit(self.download_dat, href, name): href for href in links}
+            changed, actions = set(), []
+            for future in as_completed(futures):
+                if not future.result():
+                    continue
+                changed.add(futures[future])
+                files = [get_filename(futures[future])]
+                if inline:
+                    self.run_actions(pdset, files)
+                else:
+                    actions.append(extractor.submit(self.run_actions, pdset, files))
+            for action in actions:
+                action.result()
+        self.write_metadata(name)
+
+        files = [get_filename(href) for href in links if href in changed]
+        if self.manifest is not None:
+            print(f'{len(files)} of {len(links)} {name} DAT files changed')
+            self.manifest.save()
+        return files
 
 
+@profiled()
 def fetch() -> None:
     """Fetch and download DAT files."""
     folder_helper = Folders(seed=__prefix__, extras=[x.name for x in PDSET])
-    folder_helper.clean_dats()
+    watch = config.getboolean('PLEASUREDOME', 'Watch', fallback=False)
+    # In watch mode the dats are kept between polls, only the changed archives are downloaded again
+    incremental = watch or config.getboolean('PLEASUREDOME', 'Incremental', fallback=False)
+    manifest = store = None
+    if config.getboolean('PLEASUREDOME', 'Store', fallback=False):
+        # The manifest has the hash of the stored archive of every URL
+        store = ArchiveStore(folder_helper.download / 'store')
+        manifest = DownloadManifest(folder_helper.download / 'manifest.json')
+    if incremental:
+        # Keep the extracted dats, only changed archives are downloaded again
+        manifest = manifest or DownloadManifest(folder_helper.download / 'manifest.json')
+    if config.getboolean('PLEASUREDOME', 'Plan', fallback=False):
+        pleasure_dome = PleasureDomeHelper(folder_helper, manifest, store=store, incremental=incremental)
+        try:
+            run_plan(pleasure_dome, config.get('PLEASUREDOME', 'PlanFile', fallback=None))
+        finally:
+            pleasure_dome.pool.close()
+        return
+    if not incremental:
+        folder_helper.clean_dats()
     folder_helper.create_all()
-    pleasure_dome = PleasureDomeHelper(folder_helper)
-    pleasure_dome.download_dats()
+    pleasure_dome = PleasureDomeHelper(folder_helper, manifest, store=store, incremental=incremental)
+    if watch:
+        try:
+            Watcher(pleasure_dome, pleasure_dome.selected_sets()).run()
+        finally:
+            pleasure_dome.close()
+        return
+    with metrics.measure('fetch'):
+        pleasure_dome.download_dats()
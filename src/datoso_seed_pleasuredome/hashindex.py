@@ -0,0 +1,233 @@
+"""Persistent SQLite index of the ROMs of every processed dat.
+
+With `HashIndex` the ROMs (machine, name, size, CRC32 and SHA1) of every dat
+the seed processes are stored by set, dat name and version, a new version of
+a dat replaces the ROMs of the previous one. CRC32 and SHA1 are indexed, so a
+bulk lookup is a single indexed join.
+
+Usage: python -m datoso_seed_pleasuredome.hashindex [--index FILE] [--json] [--stats] [HASH ...|-]
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from datoso.configuration import config
+from datoso.repositories.dat_file import ClrMameProDatFile, DatFile
+
+from datoso_seed_pleasuredome.archive import open_source
+from datoso_seed_pleasuredome.diff import iter_entries
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dats (
+    id INTEGER PRIMARY KEY,
+    set_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    file TEXT,
+    roms INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (set_name, name)
+);
+CREATE TABLE IF NOT EXISTS roms (
+    dat_id INTEGER NOT NULL REFERENCES dats (id),
+    machine TEXT,
+    name TEXT,
+    size INTEGER,
+    crc INTEGER,
+    sha1 BLOB
+);
+CREATE INDEX IF NOT EXISTS roms_crc ON roms (crc);
+CREATE INDEX IF NOT EXISTS roms_sha1 ON roms (sha1);
+CREATE INDEX IF NOT EXISTS roms_dat ON roms (dat_id);
+"""
+LOOKUP_QUERY = """
+SELECT lookup.hash, dats.set_name, dats.name, dats.version, roms.machine, roms.name, roms.size, roms.crc, roms.sha1
+FROM lookup JOIN roms ON roms.{column} = lookup.value JOIN dats ON dats.id = roms.dat_id
+WHERE lookup.kind = '{column}'
+"""
+CRC_LENGTH = 8
+SHA1_LENGTH = 40
+
+
+def parse_int(value: str | None, base: int = 10) -> int | None:
+    """Parse a number, None if it is missing or invalid."""
+    try:
+        return int(value, base) if value else None
+    except ValueError:
+        return None
+
+
+def parse_sha1(value: str | None) -> bytes | None:
+    """Parse a SHA1, None if it is missing or invalid."""
+    try:
+        return bytes.fromhex(value) if value and len(value) == SHA1_LENGTH else None
+    except ValueError:
+        return None
+
+
+def parse_hash(value: str) -> tuple[str, int | bytes]:
+    """Parse a CRC32 or SHA1 to look up, by its length."""
+    value = value.strip().lower()
+    if len(value) == CRC_LENGTH and (crc := parse_int(value, 16)) is not None:
+        return 'crc', crc
+    if (sha1 := parse_sha1(value)) is not None:
+        return 'sha1', sha1
+    msg = f'Not a CRC32 or SHA1: {value}'
+    raise ValueError(msg)
+
+
+def rom_row(machine: str | None, rom: dict) -> tuple:
+    """Get the machine, name, size, CRC32 and SHA1 of a ROM, its attributes with or without @."""
+    def get(key: str) -> str | None:
+        return rom.get(key, rom.get(f'@{key}'))
+    return machine, get('name'), parse_int(get('size')), parse_int(get('crc'), 16), parse_sha1(get('sha1'))
+
+
+def iter_dat_roms(file: str | Path) -> Iterator[tuple]:
+    """Iterate the machine, name, size, CRC32 and SHA1 of the ROMs of a dat, or of a folder of dats."""
+    path = Path(file)
+    if path.is_dir():
+        for child in sorted(path.rglob('*')):
+            if child.suffix in ('.dat', '.xml') and child.is_file():
+                yield from iter_dat_roms(child)
+        return
+    with open_source(path) as source:
+        dat_class = DatFile.class_from_file(source)
+    if dat_class is not None and issubclass(dat_class, ClrMameProDatFile):
+        with open_source(path) as source:
+            dat = dat_class(file=source, name=path.name)
+            dat.load(load_games=True)
+        for game in dat.games:
+            roms = game.get('rom', [])
+            for rom in roms if isinstance(roms, list) else [roms]:
+                yield rom_row(game.get('name'), rom)
+        return
+    entries = iter_entries(path)
+    next(entries, None)
+    for element in entries:
+        if element.tag != 'header':
+            machine = element.get('name')
+            for rom in element.iter('rom'):
+                yield rom_row(machine, rom.attrib)
+
+
+class HashIndex:
+    """ROMs of the processed dats, by CRC32 and SHA1."""
+
+    def __init__(self, file: str | Path) -> None:
+        """Open (or create) the index."""
+        self.file = Path(file).expanduser()
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.file, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def update(self, set_name: str, name: str, version: str | None, file: str | Path,
+               roms: Iterable[tuple]) -> int | None:
+        """Replace the ROMs of a dat, returns how many were stored, None if that version is already indexed."""
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                'SELECT id, version, file FROM dats WHERE set_name = ? AND name = ?', (set_name, name)).fetchone()
+            if row is not None and (row[1], row[2]) == (version, str(file)):
+                return None
+            if row is None:
+                dat_id = self.connection.execute(
+                    'INSERT INTO dats (set_name, name, version, file) VALUES (?, ?, ?, ?)',
+                    (set_name, name, version, str(file))).lastrowid
+            else:
+                dat_id = row[0]
+                self.connection.execute('DELETE FROM roms WHERE dat_id = ?', (dat_id,))
+            count = self.connection.executemany(
+                'INSERT INTO roms (dat_id, machine, name, size, crc, sha1) VALUES (?, ?, ?, ?, ?, ?)',
+                ((dat_id, *rom) for rom in roms)).rowcount
+            self.connection.execute(
+                'UPDATE dats SET version = ?, file = ?, roms = ? WHERE id = ?', (version, str(file), count, dat_id))
+        return count
+
+    def lookup(self, hashes: Iterable[str]) -> dict:
+        """Find the ROMs of many CRC32s and SHA1s at once, by hash."""
+        keys = {value: parse_hash(value) for value in hashes}
+        results = {value: [] for value in keys}
+        with self.lock:
+            self.connection.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS lookup (hash TEXT, kind TEXT, value)')
+            self.connection.execute('DELETE FROM lookup')
+            self.connection.executemany(
+                'INSERT INTO lookup VALUES (?, ?, ?)', ((value, *key) for value, key in keys.items()))
+            rows = [row for column in ('crc', 'sha1')
+                    for row in self.connection.execute(LOOKUP_QUERY.format(column=column))]
+            self.connection.rollback()
+        for value, set_name, dat, version, machine, rom, size, crc, sha1 in rows:
+            results[value].append({
+                'set': set_name, 'dat': dat, 'version': version, 'machine': machine, 'rom': rom, 'size': size,
+                'crc': f'{crc:08x}' if crc is not None else None, 'sha1': sha1.hex() if sha1 is not None else None,
+            })
+        return results
+
+    def stats(self) -> dict:
+        """Get the number of dats and ROMs indexed, by set."""
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT set_name, COUNT(*), SUM(roms) FROM dats GROUP BY set_name ORDER BY set_name').fetchall()
+        return {set_name: {'dats': dats, 'roms': roms} for set_name, dats, roms in rows}
+
+    def close(self) -> None:
+        """Close the index."""
+        self.connection.close()
+
+
+indexes: dict[Path, HashIndex] = {}
+indexes_lock = threading.Lock()
+
+
+def get_hash_index() -> HashIndex | None:
+    """Get the index of the `HashIndex` file, None if it is disabled."""
+    file = config.get('PLEASUREDOME', 'HashIndex', fallback='')
+    if not file:
+        return None
+    path = Path(file).expanduser()
+    with indexes_lock:
+        if path not in indexes:
+            indexes[path] = HashIndex(path)
+        return indexes[path]
+
+
+def main(argv: list | None = None) -> None:
+    """Look up hashes in the index."""
+    parser = argparse.ArgumentParser(description='Look up CRC32s and SHA1s in the Pleasuredome ROM index.')
+    parser.add_argument('hashes', nargs='*', help='CRC32s or SHA1s, - reads them from stdin (one per line)')
+    parser.add_argument('--index', default=config.get('PLEASUREDOME', 'HashIndex', fallback=''),
+                        help='Index file, the HashIndex option by default')
+    parser.add_argument('--json', action='store_true', help='Print the matches as JSON')
+    parser.add_argument('--stats', action='store_true', help='Print the dats and ROMs indexed by set')
+    args = parser.parse_args(argv)
+    if not args.index or not Path(args.index).expanduser().exists():
+        parser.error('No index, set the HashIndex option or use --index')
+    index = HashIndex(args.index)
+    if args.stats:
+        for set_name, total in index.stats().items():
+            print(f'{set_name}: {total["dats"]} dats, {total["roms"]} ROMs')
+    hashes = [line for value in args.hashes
+              for line in (sys.stdin.read().split() if value == '-' else [value])]
+    try:
+        results = index.lookup(hashes)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        for value, matches in results.items():
+            for match in matches:
+                print(value, *(match[key] for key in ('set', 'dat', 'version', 'machine', 'rom')), sep='\t')
+            if not matches:
+                print(f'{value}\tnot found')
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Cache of the links parsed from the Pleasuredome index pages."""
+import json
+import os
+import re
+import threading
+from collections.abc import Callable
+from http import HTTPStatus
+from pathlib import Path
+
+from datoso_seed_pleasuredome.download import ConnectionPool
+
+
+def decode_page(body: bytes, content_type: str | None) -> str:
+    """Decode an HTML page with the charset of its Content-Type, utf-8 by default."""
+    match = re.search(r'charset=([\w-]+)', content_type or '')
+    try:
+        return body.decode(match[1] if match else 'utf-8')
+    except (LookupError, UnicodeDecodeError):
+        return body.decode('utf-8', errors='replace')
+
+
+class IndexCache:
+    """Links of every index page, revalidated with conditional requests.
+
+    An unchanged page (304) is not downloaded nor parsed again.
+    """
+
+    def __init__(self, file: str | Path) -> None:
+        """Initialize the cache."""
+        self.file = Path(file)
+        self.entries: dict = {}
+        self.lock = threading.Lock()
+        if self.file.exists():
+            with open(self.file, encoding='utf-8') as fild:
+                self.entries = json.load(fild)
+
+    def get_links(self, pool: ConnectionPool, url: str, parse: Callable[[str, str], list],
+                  stats: dict | None = None) -> list:
+        """Get the links of a page, parse gets its text and URL."""
+        stats = {} if stats is None else stats
+        entry = self.entries.get(url)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        with pool.request('GET', url, headers=headers) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED:
+                stats['cached'] = True
+                return entry['links']
+            body = response.read()
+        stats['bytes'] = len(body)
+        links = parse(decode_page(body, response.getheader('Content-Type')), url)
+        with self.lock:
+            self.entries[url] = {
+                'etag': response.getheader('ETag'),
+                'last_modified': response.getheader('Last-Modified'),
+                'links': links,
+            }
+        return links
+
+    def save(self) -> None:
+        """Save the cache to disk, atomically."""
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.file.with_suffix('.tmp')
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as fild:
+                json.dump(self.entries, fild, indent=4)
+            os.replace(tmp_file, self.file)
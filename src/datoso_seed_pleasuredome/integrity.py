@@ -0,0 +1,197 @@
+"""Integrity checks of the downloads, done on the fly as the bytes arrive.
+
+Every download is hashed (SHA1 and CRC32) while it is written, and the members
+of a zip are inflated and checked against the CRC32 of their local headers at
+the same time, so a corrupt archive is found without reading it again.
+Once the transfer ends the central directory is checked against the members
+seen in the stream. Zips the stream parser does not support (encrypted,
+not deflated, stored with data descriptors) are tested with zipfile instead.
+"""
+import hashlib
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+ZIP64_EXTRA = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+FLAG_ENCRYPTED = 0x1
+FLAG_DESCRIPTOR = 0x8
+# Inflate in small slices, so a highly compressed chunk does not blow the memory
+INFLATE_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    """A downloaded file failed its integrity checks."""
+
+
+class UnsupportedZipError(Exception):
+    """A zip feature the stream parser can not follow."""
+
+
+def parse_zip64_extra(extra: bytes, size: int, compress_size: int) -> tuple[int, int, bool]:
+    """Get the sizes of a local header from its zip64 extra field, and if it has one."""
+    while len(extra) >= 4:
+        tag, length = struct.unpack('<HH', extra[:4])
+        if tag == ZIP64_EXTRA:
+            values = extra[4:4 + length]
+            if size == ZIP64_LIMIT:
+                size, values = struct.unpack('<Q', values[:8])[0], values[8:]
+            if compress_size == ZIP64_LIMIT:
+                compress_size = struct.unpack('<Q', values[:8])[0]
+            return size, compress_size, True
+        extra = extra[4 + length:]
+    return size, compress_size, False
+
+
+class StreamVerifier:
+    """Hash a download and check its zip members as the bytes are written."""
+
+    def __init__(self, *, is_zip: bool = False) -> None:
+        """Initialize the verifier."""
+        self.sha1 = hashlib.sha1()
+        self.crc32 = 0
+        self.size = 0
+        self.is_zip = is_zip
+        self.streamed = is_zip
+        self.members: dict[str, tuple[int, int]] = {}
+        self.error = None
+        self.buffer = bytearray()
+        self.member = None
+        self.done = False
+
+    @property
+    def sha1_hex(self) -> str:
+        """Get the SHA1 of the bytes seen."""
+        return self.sha1.hexdigest()
+
+    def update(self, chunk: bytes) -> None:
+        """Add a chunk of the download."""
+        self.sha1.update(chunk)
+        self.crc32 = zlib.crc32(chunk, self.crc32)
+        self.size += len(chunk)
+        if not self.streamed or self.done or self.error:
+            return
+        self.buffer += chunk
+        try:
+            while self.parse():
+                pass
+        except UnsupportedZipError:
+            self.streamed = False
+            self.buffer.clear()
+        except (zlib.error, struct.error) as e:
+            self.error = str(e)
+
+    def parse(self) -> bool:
+        """Parse the buffer, returns True if it can go on."""
+        if self.member is None:
+            return self.parse_header()
+        return self.parse_data()
+
+    def parse_header(self) -> bool:
+        """Parse a local file header."""
+        if len(self.buffer) < LOCAL_HEADER.size:
+            return False
+        (signature, _, flags, method, _, _, crc, compress_size, size,
+         name_length, extra_length) = LOCAL_HEADER.unpack_from(self.buffer)
+        if signature != LOCAL_HEADER_SIGNATURE:
+            # The central directory follows the last member
+            self.done = True
+            self.buffer.clear()
+            return False
+        header_size = LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_size:
+            return False
+        name = bytes(self.buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_length])
+        extra = bytes(self.buffer[LOCAL_HEADER.size + name_length:header_size])
+        size, compress_size, zip64 = parse_zip64_extra(extra, size, compress_size)
+        if flags & FLAG_ENCRYPTED or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) \
+            or (method == zipfile.ZIP_STORED and flags & FLAG_DESCRIPTOR):
+            raise UnsupportedZipError
+        del self.buffer[:header_size]
+        self.member = {
+            'name': name.decode('utf-8' if flags & 0x800 else 'cp437'),
+            'flags': flags, 'crc': crc, 'size': size, 'zip64': zip64,
+            'remaining': None if flags & FLAG_DESCRIPTOR else compress_size,
+            'inflater': zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None,
+            'crc32': 0, 'written': 0,
+        }
+        return True
+
+    def parse_data(self) -> bool:
+        """Check the data of the current member, and its data descriptor."""
+        member = self.member
+        inflater = member['inflater']
+        if inflater is None or not inflater.eof:
+            while self.buffer and member['remaining'] != 0:
+                size = INFLATE_SIZE if member['remaining'] is None else min(INFLATE_SIZE, member['remaining'])
+                data = bytes(self.buffer[:size])
+                del self.buffer[:size]
+                if inflater is not None:
+                    output = inflater.decompress(data)
+                    if inflater.eof:
+                        # The bytes after the end of the stream belong to the next record
+                        leftover = inflater.unused_data
+                        self.buffer[:0] = leftover
+                        data = data[:len(data) - len(leftover)]
+                else:
+                    output = data
+                member['crc32'] = zlib.crc32(output, member['crc32'])
+                member['written'] += len(output)
+                if member['remaining'] is not None:
+                    member['remaining'] -= len(data)
+                if inflater is not None and inflater.eof:
+                    break
+            if member['remaining'] != 0 and (inflater is None or not inflater.eof):
+                return False
+        if member['flags'] & FLAG_DESCRIPTOR and not self.parse_descriptor():
+            return False
+        self.check_member()
+        return not self.error
+
+    def parse_descriptor(self) -> bool:
+        """Read the CRC32 and size of the current member from its data descriptor."""
+        member = self.member
+        size_format = '<IQQ' if member['zip64'] else '<III'
+        length = struct.calcsize(size_format)
+        if len(self.buffer) < length + len(DESCRIPTOR_SIGNATURE):
+            return False
+        offset = len(DESCRIPTOR_SIGNATURE) if self.buffer.startswith(DESCRIPTOR_SIGNATURE) else 0
+        member['crc'], _, member['size'] = struct.unpack_from(size_format, self.buffer, offset)
+        del self.buffer[:offset + length]
+        return True
+
+    def check_member(self) -> None:
+        """Compare the current member with its header."""
+        member = self.member
+        self.member = None
+        if member['crc32'] != member['crc'] or member['written'] != member['size']:
+            self.error = f'bad CRC32 or size for {member["name"]}'
+            return
+        self.members[member['name']] = (member['crc'], member['size'])
+
+    def verify(self, file: str | Path) -> None:
+        """Check the downloaded file, raises DownloadError if it is corrupt."""
+        if self.error:
+            msg = f'{Path(file).name}: {self.error}'
+            raise DownloadError(msg)
+        if not self.is_zip:
+            return
+        try:
+            with zipfile.ZipFile(file) as zip_ref:
+                if not self.streamed:
+                    bad_member = zip_ref.testzip()
+                    if bad_member is not None:
+                        msg = f'{Path(file).name}: bad CRC32 for {bad_member}'
+                        raise DownloadError(msg)
+                    return
+                for info in zip_ref.infolist():
+                    if self.members.get(info.filename) != (info.CRC, info.file_size):
+                        msg = f'{Path(file).name}: {info.filename} does not match the central directory'
+                        raise DownloadError(msg)
+        except (zipfile.BadZipFile, OSError, EOFError, zlib.error) as e:
+            msg = f'{Path(file).name}: {e}'
+            raise DownloadError(msg) from e
@@ -0,0 +1,81 @@
+"""Persistent manifest of the archives downloaded from Pleasuredome."""
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class DownloadManifest:
+    """Keep track of downloaded archives between runs.
+
+    Entries are keyed by URL and store the validators sent by the server
+    (ETag/Last-Modified) alongside size, hash and local path of the archive.
+    """
+
+    def __init__(self, file: str | Path) -> None:
+        """Initialize the manifest."""
+        self.file = Path(file)
+        self.entries: dict = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest from disk."""
+        if self.file.exists():
+            with open(self.file, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def save(self) -> None:
+        """Save the manifest to disk, atomically."""
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.file.with_suffix('.tmp')
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=4)
+            os.replace(tmp_file, self.file)
+
+    def get(self, url: str) -> dict | None:
+        """Get the entry of a URL."""
+        return self.entries.get(url)
+
+    def update(self, url: str, **data: str | int | None) -> dict:
+        """Update (or create) the entry of a URL."""
+        with self.lock:
+            entry = self.entries.setdefault(url, {'url': url})
+            entry.update(data)
+            return entry
+
+    def relocate(self, old_path: str | Path, new_path: str | Path, **data: str | int | None) -> None:
+        """Update the local path (and data) of the entry stored in old_path."""
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.get('path') == str(old_path):
+                    entry['path'] = str(new_path)
+                    entry.update(data)
+
+    def prune(self, set_name: str, urls: list) -> list:
+        """Remove the entries of a set whose URL is not in urls, returns the removed entries."""
+        urls = set(urls)
+        with self.lock:
+            gone = [url for url, entry in self.entries.items() if entry.get('set') == set_name and url not in urls]
+            return [self.entries.pop(url) for url in gone]
+
+    def conditional_headers(self, url: str) -> dict:
+        """Get the headers for a conditional request of a URL.
+
+        No validators are sent if the local copy is gone, forcing a new download.
+        """
+        entry = self.get(url)
+        if not entry or not entry.get('path') or not Path(entry['path']).exists():
+            return {}
+        return self.validators(url)
+
+    def validators(self, url: str) -> dict:
+        """Get the headers for a conditional request of a URL, whether the local copy exists or not."""
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
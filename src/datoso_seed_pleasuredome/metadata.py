@@ -0,0 +1,58 @@
+"""Metadata of the downloaded sets, stored in a metadata.txt file per set folder."""
+import json
+import os
+import threading
+from pathlib import Path
+
+METADATA_FILE = 'metadata.txt'
+
+
+class MetadataCache:
+    """Metadata of each folder, loaded once and reloaded only if the file changes."""
+
+    def __init__(self) -> None:
+        """Initialize the cache."""
+        self.cache: dict[Path, tuple[int, dict]] = {}
+        self.lock = threading.Lock()
+
+    def load(self, folder: str | Path) -> dict:
+        """Load the metadata of a folder."""
+        file = Path(folder) / METADATA_FILE
+        try:
+            mtime = file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        cached = self.cache.get(file)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(file, encoding='utf-8') as fild:
+            metadata = json.load(fild)
+        self.cache[file] = (mtime, metadata)
+        return metadata
+
+    def update(self, folder: str | Path, data: dict | None = None, archives: dict | None = None) -> dict:
+        """Merge data into the metadata of a folder, archives has the metadata of each archive."""
+        file = Path(folder) / METADATA_FILE
+        with self.lock:
+            metadata = {**self.load(folder), **(data or {})}
+            if archives:
+                metadata['archives'] = {**metadata.get('archives', {}), **archives}
+            tmp_file = file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as fild:
+                json.dump(metadata, fild, indent=4)
+            os.replace(tmp_file, file)
+            self.cache.pop(file, None)
+        return metadata
+
+
+metadata_cache = MetadataCache()
+
+
+def load_metadata(folder: str | Path) -> dict:
+    """Load the metadata of a folder."""
+    return metadata_cache.load(folder)
+
+
+def update_metadata(folder: str | Path, data: dict | None = None, archives: dict | None = None) -> dict:
+    """Merge data into the metadata of a folder, archives has the metadata of each archive."""
+    return metadata_cache.update(folder, data, archives)
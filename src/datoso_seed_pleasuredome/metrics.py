@@ -0,0 +1,117 @@
+"""Per-set and per-phase metrics of the fetch and the action pipelines.
+
+Enabled with the `Metrics` option (or `--metrics`), the metrics are written
+to that file when the process exits: as a Prometheus textfile if it ends with
+`.prom`, as JSON otherwise.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+from datoso.configuration import config
+
+PROMETHEUS_PREFIX = 'pleasuredome'
+
+
+def get_metrics_file() -> Path | None:
+    """Get the file the metrics are written to, None if they are disabled."""
+    file = config.get('PLEASUREDOME', 'Metrics', fallback='')
+    return Path(file).expanduser() if file else None
+
+
+def escape_label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Timed events, each one with its phase, set and counters (bytes, members, retries...)."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.events = []
+        self.started = datetime.now(UTC).isoformat()
+        self.lock = threading.Lock()
+        self.registered = False
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the metrics are enabled."""
+        return get_metrics_file() is not None
+
+    def record(self, phase: str, set_name: str | None = None, seconds: float = 0.0, **fields) -> None:
+        """Record an event."""
+        if not self.enabled:
+            return
+        event = {'phase': phase, 'set': set_name, 'seconds': round(seconds, 6), **fields}
+        with self.lock:
+            self.events.append(event)
+            if not self.registered:
+                atexit.register(self.save)
+                self.registered = True
+
+    @contextmanager
+    def measure(self, phase: str, set_name: str | None = None, **fields) -> Iterator[dict]:
+        """Time a block, the counters set in the yielded dict are recorded with it."""
+        event = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            self.record(phase, set_name, time.perf_counter() - start, **event)
+
+    def summary(self) -> list:
+        """Get the totals by phase and set, numeric counters are added up."""
+        totals = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            total = totals.setdefault((event['phase'], event['set'] or ''), {'count': 0})
+            total['count'] += 1
+            for key, value in event.items():
+                if isinstance(value, int | float) and key != 'set':
+                    total[key] = total.get(key, 0) + value
+        return [
+            {'phase': phase, 'set': set_name, **{key: round(value, 6) for key, value in total.items()}}
+            for (phase, set_name), total in totals.items()
+        ]
+
+    def to_json(self) -> str:
+        """Export the metrics as JSON."""
+        with self.lock:
+            events = list(self.events)
+        return json.dumps({'started': self.started, 'summary': self.summary(), 'events': events}, indent=4)
+
+    def to_prometheus(self) -> str:
+        """Export the totals in the Prometheus text format."""
+        samples = {}
+        for total in self.summary():
+            labels = f'phase="{escape_label(total["phase"])}",set="{escape_label(total["set"])}"'
+            for key, value in total.items():
+                if key not in ('phase', 'set'):
+                    samples.setdefault(key, []).append(f'{PROMETHEUS_PREFIX}_{key}{{{labels}}} {float(value)}')
+        lines = []
+        for key, metric_samples in samples.items():
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{key} gauge')
+            lines.extend(metric_samples)
+        return '\n'.join(lines) + '\n'
+
+    def save(self, file: str | Path | None = None) -> None:
+        """Write the metrics, atomically so a textfile collector never reads a partial file."""
+        file = Path(file) if file else get_metrics_file()
+        if file is None or not self.events:
+            return
+        content = self.to_prometheus() if file.suffix == '.prom' else self.to_json()
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(f'{file.name}.tmp')
+        tmp_file.write_text(content, encoding='utf-8')
+        os.replace(tmp_file, file)
+
+
+metrics = Metrics()
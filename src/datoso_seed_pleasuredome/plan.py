@@ -0,0 +1,162 @@
+"""Dry run of a fetch: what would be downloaded, skipped, extracted and backed up.
+
+Every archive of the selected sets is probed with a HEAD request (sending the
+validators of the manifest) and compared with the local state, nothing is
+downloaded nor written besides the plan file. An archive that can not be
+probed (a 4xx or a network error) fails its set, the others are still planned.
+"""
+import http.client
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.error import HTTPError
+
+from datoso.configuration import config
+
+from datoso_seed_pleasuredome.download import (
+    get_filename,
+    get_part_file,
+    load_part_info,
+)
+
+ACTION_LABELS = {
+    'download': 'to download',
+    'resume': 'to resume',
+    'restore': 'from the store',
+    'skip': 'unchanged',
+    'failed': 'failed',
+}
+
+
+def format_size(size: float) -> str:
+    """Format a size in bytes."""
+    if size < 1024:
+        return f'{size} B'
+    for unit in ('KB', 'MB'):
+        size /= 1024
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+    size /= 1024
+    return f'{size:.1f} GB'
+
+
+class FetchPlanner:
+    """Plan the fetch of the selected sets."""
+
+    def __init__(self, helper: 'PleasureDomeHelper') -> None:  # noqa: F821
+        """Initialize the planner."""
+        self.helper = helper
+        self.incremental = helper.incremental
+
+    def probe(self, href: str) -> dict:
+        """Get the status, size and validators of an archive with a HEAD request, and the error if it failed."""
+        manifest = self.helper.manifest
+        headers = manifest.validators(href) if manifest else {}
+        try:
+            with self.helper.pool.request('HEAD', href, headers=headers) as response:
+                response.read()
+                length = response.getheader('Content-Length')
+                return {
+                    'status': response.status,
+                    'size': int(length) if length and response.status == HTTPStatus.OK else None,
+                    'etag': response.getheader('ETag'),
+                    'last_modified': response.getheader('Last-Modified'),
+                    'error': None,
+                }
+        except (HTTPError, http.client.HTTPException, OSError) as e:
+            return {
+                'status': e.code if isinstance(e, HTTPError) else None,
+                'size': None,
+                'etag': None,
+                'last_modified': None,
+                'error': str(e),
+            }
+
+    def plan_archive(self, pdset: 'PDSET', href: str, head: dict) -> dict:  # noqa: F821
+        """Decide what the fetch would do with an archive."""
+        folder_helper = self.helper.folder_helper
+        file = get_filename(href)
+        entry = (self.helper.manifest.get(href) if self.helper.manifest else None) or {}
+        unchanged = bool(entry) and (head['status'] == HTTPStatus.NOT_MODIFIED
+                                     or (head['etag'] is not None and head['etag'] == entry.get('etag')))
+        size = head['size'] if head['size'] is not None else entry.get('size')
+        part = get_part_file(folder_helper.dats / pdset.name / file, folder_helper.download / 'partial' / pdset.name)
+        part_info = load_part_info(part, href)
+        stored = self.helper.store is not None and self.helper.store.has(entry.get('sha1'))
+        if head['error'] is not None:
+            action, transfer = 'failed', 0
+        elif part_info and (head['etag'], head['last_modified']) == (part_info['etag'], part_info['last_modified']):
+            action, transfer = 'resume', part_info['size'] - part.stat().st_size
+        elif unchanged and self.incremental and Path(entry.get('path') or '').exists():
+            action, transfer = 'skip', 0
+        elif unchanged and stored:
+            action, transfer = 'restore', 0
+        else:
+            action, transfer = 'download', size or 0
+        extract = action not in ('skip', 'failed') and any(step.startswith('extract_') for step in pdset.value.get('actions', []))
+        return {
+            'set': pdset.name,
+            'file': file,
+            'url': href,
+            'action': action,
+            'size': size,
+            'bytes': transfer,
+            'extract': extract,
+            'backup': str(folder_helper.backup / pdset.name / file) if extract else None,
+            'error': head['error'],
+        }
+
+    def plan(self) -> dict:
+        """Plan the fetch of the selected sets, probing their archives in parallel.
+
+        The sets with an archive that could not be probed are listed as failed.
+        """
+        all_links = self.helper.get_all_dat_links(self.helper.selected_sets())
+        jobs = [(pdset, href) for pdset, links in all_links.items() for href in links]
+        max_connections = int(config.get('PLEASUREDOME', 'MaxConnections', fallback='10'))
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            heads = list(executor.map(lambda job: self.probe(job[1]), jobs))
+        archives = [self.plan_archive(pdset, href, head) for (pdset, href), head in zip(jobs, heads, strict=True)]
+        totals = {}
+        for archive in archives:
+            total = totals.setdefault(archive['set'], {
+                **dict.fromkeys(ACTION_LABELS, 0), 'bytes': 0, 'extract': 0, 'backup': 0,
+            })
+            total[archive['action']] += 1
+            total['bytes'] += archive['bytes']
+            total['extract'] += archive['extract']
+            total['backup'] += archive['backup'] is not None
+        return {
+            'sets': totals,
+            'archives': archives,
+            'bytes': sum(total['bytes'] for total in totals.values()),
+            'failed': [name for name, total in totals.items() if total['failed']],
+        }
+
+
+def print_plan(plan: dict) -> None:
+    """Print a plan."""
+    for archive in plan['archives']:
+        if archive['action'] == 'failed':
+            print(f'  failed   {archive["set"]}/{archive["file"]}: {archive["error"]}')
+        elif archive['action'] != 'skip':
+            steps = ', then extracted and backed up' if archive['extract'] else ''
+            print(f'  {archive["action"]:<8} {archive["set"]}/{archive["file"]} '
+                  f'({format_size(archive["bytes"])}){steps}')
+    for name, total in plan['sets'].items():
+        counts = ', '.join(f'{total[action]} {label}' for action, label in ACTION_LABELS.items())
+        print(f'{name}: {counts}, {format_size(total["bytes"])} to transfer, '
+              f'{total["extract"]} to extract, {total["backup"]} to back up')
+    print(f'Total: {format_size(plan["bytes"])} to transfer')
+    if plan['failed']:
+        print(f'Failed: {", ".join(plan["failed"])}')
+
+
+def run_plan(helper: 'PleasureDomeHelper', file: str | None = None) -> dict:  # noqa: F821
+    """Plan the fetch, print it and write it as JSON to file if given."""
+    plan = FetchPlanner(helper).plan()
+    print_plan(plan)
+    if file:
+        Path(file).write_text(json.dumps(plan, indent=4), encoding='utf-8')
+    return plan
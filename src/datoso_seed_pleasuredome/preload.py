@@ -0,0 +1,85 @@
+"""Load the dats of a folder in a process pool ahead of datoso's processing loop.
+
+datoso processes the dats of a seed one at a time, the first time a factory is
+asked for a dat of a folder, all the dats of the folder are submitted to the pool.
+The workers parse the dats (with LazyLoad only their headers, with CompactLoad
+into the compact model) and run their initial_parse, the dats then take their
+loaded state from the pool, which is much cheaper to unpickle than to parse,
+while the actions with side effects (DeleteOld, Copy, SaveToDatabase) keep
+running in order in datoso.
+"""
+import atexit
+import logging
+import re
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from datoso.configuration import config
+
+logger = logging.getLogger(__name__)
+
+
+def preload_dat(dat_class: type, file: str) -> dict:
+    """Load and classify a dat, returns its state."""
+    dat = dat_class(file=file, seed='pleasuredome')
+    dat.initial_parse()
+    return {key: value for key, value in dat.__dict__.items() if key != 'file'}
+
+
+def init_worker() -> None:
+    """Initialize a worker, the dats it loads are not taken from the pool."""
+    preloader.futures = {}
+    preloader.folders = set()
+
+
+class DatPreloader:
+    """Dats loaded in a process pool, by file."""
+
+    def __init__(self) -> None:
+        """Initialize the preloader."""
+        self.executor = None
+        self.futures: dict[str, Future] = {}
+        self.folders = set()
+        self.lock = threading.Lock()
+
+    def should_preload(self, file: Path) -> bool:
+        """Check if datoso will process the file."""
+        ignore_regex = config.get('PROCESS', 'DatIgnoreRegEx', fallback=None)
+        if ignore_regex and re.match(ignore_regex, str(file)):
+            return False
+        return file.suffix in ('.dat', '.xml')
+
+    def prefetch(self, folder: str | Path, factory: Callable) -> None:
+        """Submit the dats of a folder to the pool."""
+        processes = int(config.get('PLEASUREDOME', 'ParallelLoad', fallback='0'))
+        folder = Path(folder)
+        with self.lock:
+            if processes <= 1 or folder in self.folders or not folder.is_dir():
+                return
+            self.folders.add(folder)
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=processes, initializer=init_worker)
+                atexit.register(self.executor.shutdown, cancel_futures=True)
+        for file in folder.iterdir():
+            if not self.should_preload(file):
+                continue
+            dat_class = factory(file)
+            if getattr(dat_class, 'preloadable', False):
+                self.futures[str(file)] = self.executor.submit(preload_dat, dat_class, str(file))
+
+    def get(self, file: str | Path) -> dict | None:
+        """Get the preloaded state of a dat, None if it has to be loaded."""
+        future = self.futures.get(str(file))
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            # Loading it again in datoso reports the error
+            logger.debug('Error preloading %s', file, exc_info=True)
+            return None
+
+
+preloader = DatPreloader()
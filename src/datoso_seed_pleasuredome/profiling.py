@@ -0,0 +1,162 @@
+"""Opt-in CPU and allocation profiling of the fetch and parse phases.
+
+Enabled with the `Profile` option (or `--profile`), every phase decorated with
+`profiled` is run under cProfile and, with `ProfileMemory`, tracemalloc. When
+the process exits, each phase writes to that folder:
+
+- `<phase>.prof`: its cProfile stats, including its nested phases, added up
+  over all its calls (open with `python -m pstats` or snakeviz).
+- `<phase>.alloc.txt`: the source lines that allocated the most memory during
+  its calls and still held it when they returned.
+
+Only the phases run in the main thread are profiled: while profiling, the set
+actions (the extract_* phases) run in the main thread instead of the
+ExtractWorkers threads of both engines. Phases run in other threads or in
+process pools (ExtractProcesses, ParallelLoad) run unprofiled, and so does a
+phase started while another profiler is active. Profiling never changes what a
+phase does.
+"""
+import atexit
+import cProfile
+import functools
+import pstats
+import threading
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from datoso.configuration import config
+
+TOP_ALLOCATIONS = 25
+# The allocations of the profilers themselves are left out of the reports
+IGNORED_ALLOCATIONS = [
+    tracemalloc.Filter(inclusive=False, filename_pattern=module.__file__)
+    for module in (cProfile, pstats, tracemalloc)
+] + [tracemalloc.Filter(inclusive=False, filename_pattern=__file__)]
+
+
+def get_profile_path() -> Path | None:
+    """Get the folder the profiles are written to, None if profiling is disabled."""
+    path = config.get('PLEASUREDOME', 'Profile', fallback='')
+    return Path(path).expanduser() if path else None
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Take a snapshot of the allocations, without the ones of the profilers."""
+    return tracemalloc.take_snapshot().filter_traces(IGNORED_ALLOCATIONS)
+
+
+class PhaseProfile:
+    """A running phase, its profiler is paused while a nested phase runs."""
+
+    def __init__(self, name: str) -> None:
+        """Initialize the phase."""
+        self.name = name
+        self.profiler = cProfile.Profile()
+        self.children = []
+        self.snapshot = take_snapshot() if tracemalloc.is_tracing() else None
+
+
+class Profiler:
+    """cProfile stats and allocations by phase."""
+
+    def __init__(self) -> None:
+        """Initialize the profiler."""
+        self.local = threading.local()
+        self.stats: dict[str, pstats.Stats] = {}
+        self.allocations: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.registered = False
+
+    @property
+    def stack(self) -> list:
+        """Get the running phases of this thread."""
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def start(self, name: str) -> PhaseProfile | None:
+        """Start profiling a phase, None if it can not be profiled in this thread."""
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        with self.lock:
+            if not self.registered:
+                atexit.register(self.save)
+                self.registered = True
+        if config.getboolean('PLEASUREDOME', 'ProfileMemory', fallback=True) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.stack:
+            self.stack[-1].profiler.disable()
+        phase = PhaseProfile(name)
+        try:
+            phase.profiler.enable()
+        except ValueError:
+            # Another profiling tool is active (Python 3.12+)
+            if self.stack:
+                self.stack[-1].profiler.enable()
+            return None
+        self.stack.append(phase)
+        return phase
+
+    def stop(self, phase: PhaseProfile) -> None:
+        """Stop profiling a phase, its stats are added to the phase totals and to its parent."""
+        phase.profiler.disable()
+        self.stack.pop()
+        profiles = [phase.profiler, *phase.children]
+        if self.stack:
+            self.stack[-1].children.extend(profiles)
+        allocations = []
+        if phase.snapshot is not None and tracemalloc.is_tracing():
+            allocations = take_snapshot().compare_to(phase.snapshot, 'lineno')
+        with self.lock:
+            if phase.name in self.stats:
+                self.stats[phase.name].add(*profiles)
+            else:
+                self.stats[phase.name] = pstats.Stats(*profiles)
+            # Without ProfileMemory the allocations are not traced, nor reported
+            totals = self.allocations.setdefault(phase.name, {}) if phase.snapshot is not None else {}
+            for stat in allocations:
+                if stat.size_diff > 0:
+                    line = str(stat.traceback[0])
+                    size, count = totals.get(line, (0, 0))
+                    totals[line] = (size + stat.size_diff, count + stat.count_diff)
+        if self.stack:
+            self.stack[-1].profiler.enable()
+
+    def save(self) -> None:
+        """Write the stats and allocation reports of every phase."""
+        path = get_profile_path()
+        if path is None:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            for name, stats in self.stats.items():
+                stats.dump_stats(path / f'{name}.prof')
+            for name, totals in self.allocations.items():
+                top = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:TOP_ALLOCATIONS]
+                lines = [f'Top {len(top)} allocations of {name} still held when it returned']
+                lines.extend(f'{size / 1024:12.1f} KiB {count:10d} blocks  {line}' for line, (size, count) in top)
+                (path / f'{name}.alloc.txt').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+profiler = Profiler()
+
+
+def profiled(name: str | None = None) -> Callable:
+    """Profile the calls of a function as a phase, named after the function by default."""
+    def decorator(func: Callable) -> Callable:
+        phase_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_profile_path() is None:
+                return func(*args, **kwargs)
+            phase = profiler.start(phase_name)
+            if phase is None:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.stop(phase)
+        return wrapper
+    return decorator
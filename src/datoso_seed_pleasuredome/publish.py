@@ -0,0 +1,110 @@
+"""Publishing of the dats to their destination by hardlink or reflink.
+
+The Published* Copy and DeleteOld steps of the seed copy and remove the dats
+with the versions below of datoso's `copy_path` and `remove_path`. While a
+step runs in `publishing`, they link the files with the `CopyStrategy`
+methods instead of copying them, and the files of the folder dats (the
+Software Lists) are linked and removed by a thread pool. The steps of other
+seeds keep datoso's own functions.
+"""
+import os
+import shutil
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+from datoso.configuration import config
+from datoso.helpers import file_utils
+
+from datoso_seed_pleasuredome.store import link_file
+
+# Methods tried for each strategy, in order, copy is always the last resort
+STRATEGIES = {
+    'copy': ('copy',),
+    'hardlink': ('hardlink', 'reflink', 'copy'),
+    'reflink': ('reflink', 'copy'),
+}
+
+state = threading.local()
+
+
+def get_strategy() -> str | None:
+    """Get the `CopyStrategy` option, None if datoso copies the dats."""
+    strategy = config.get('PLEASUREDOME', 'CopyStrategy', fallback='').lower()
+    if strategy and strategy not in STRATEGIES:
+        msg = f'Unknown CopyStrategy {strategy}, use one of {", ".join(STRATEGIES)}'
+        raise ValueError(msg)
+    return strategy or None
+
+
+def get_workers() -> int:
+    """Get the `PublishWorkers` option."""
+    return int(config.get('PLEASUREDOME', 'PublishWorkers', fallback='8'))
+
+
+@contextmanager
+def publishing(strategy: str, workers: int) -> Iterator[None]:
+    """Copy and remove the files of the steps run in this thread with strategy."""
+    state.methods, state.workers = STRATEGIES[strategy], max(1, workers)
+    try:
+        yield
+    finally:
+        state.methods = state.workers = None
+
+
+def iter_files(path: Path) -> Iterator[Path]:
+    """Iterate the files under a folder."""
+    for root, _, files in os.walk(path):
+        yield from (Path(root) / name for name in files)
+
+
+def remove_files(path: Path, workers: int) -> None:
+    """Remove the files of a folder concurrently, the empty folders are left."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(Path.unlink, file, missing_ok=True) for file in iter_files(path)]:
+            future.result()
+
+
+def link_tree(origin: Path, destination: Path, methods: tuple, workers: int) -> None:
+    """Link the files of a folder to destination concurrently."""
+    jobs = []
+    for root, _, files in os.walk(origin):
+        target = destination / Path(root).relative_to(origin)
+        target.mkdir(parents=True, exist_ok=True)
+        jobs.extend((Path(root) / name, target / name) for name in files)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(link_file, source, target, methods) for source, target in jobs]:
+            future.result()
+
+
+def copy_path(origin: str | Path, destination: str | Path) -> None:
+    """Copy a file or folder to destination, linking its files with the strategy of the step."""
+    methods = getattr(state, 'methods', None)
+    if not methods or (methods == STRATEGIES['copy'] and not Path(origin).is_dir()):
+        file_utils.copy_path(origin, destination)
+        return
+    origin, destination = Path(origin), Path(destination)
+    if not origin.exists():
+        msg = f'File {origin} not found.'
+        raise FileNotFoundError(msg)
+    with suppress(FileNotFoundError):
+        if origin.samefile(destination):
+            return
+    if not origin.is_dir():
+        link_file(origin, destination, methods)
+        return
+    if destination.is_dir():
+        remove_files(destination, state.workers)
+        shutil.rmtree(destination)
+    link_tree(origin, destination, methods, state.workers)
+
+
+def remove_path(pathstring: str | Path, *, remove_empty_parent: bool = False) -> None:
+    """Remove a file or folder, the files of a folder concurrently in a step run in `publishing`."""
+    workers = getattr(state, 'workers', None)
+    path = pathstring if isinstance(pathstring, Path) else file_utils.parse_path(pathstring)
+    if workers and path.is_dir() and not path.is_symlink():
+        remove_files(path, workers)
+    file_utils.remove_path(path, remove_empty_parent=remove_empty_parent)
@@ -1,72 +1,28 @@
 """Rules for the PleasureDome seed."""
-from datoso_seed_pleasuredome.dats import FruitMachinesXMLDat, HomeBrewMameDat, MameDat
+from datoso_seed_pleasuredome import dats
+from datoso_seed_pleasuredome.classify import get_rule_patterns
 
+# One rule per class, its keywords in a single precompiled pattern (see classify)
 rules = [
     {
         'name': 'PleasureDome DATs',
-        '_class': HomeBrewMameDat,
+        '_class': getattr(dats, dat_class),
         'seed': 'pleasuredome',
-        'priority': 70,
+        'priority': priority,
         'rules': [
             {
                 'key': 'name',
-                'operator': 'contains',
-                'value': 'HBMAME',
+                'operator': 'exists',
+                'value': None,
             },
-        ],
-    },
-    {
-        'name': 'PleasureDome DATs',
-        '_class': MameDat,
-        'seed': 'pleasuredome',
-        'priority': 50,
-        'rules': [
-            {
-                'key': 'name',
-                'operator': 'contains',
-                'value': 'MAME',
-            },
-        ],
-    },
-    {
-        'name': 'PleasureDome DATs',
-        '_class': FruitMachinesXMLDat,
-        'seed': 'pleasuredome',
-        'priority': 50,
-        'rules': [
-            {
-                'key': 'name',
-                'operator': 'contains',
-                'value': 'Fruit Machine',
-            },
-        ],
-    },
-    {
-        'name': 'PleasureDome DATs',
-        '_class': FruitMachinesXMLDat,
-        'seed': 'pleasuredome',
-        'priority': 50,
-        'rules': [
-            {
-                'key': 'name',
-                'operator': 'contains',
-                'value': 'FruitMachine',
-            },
-        ],
-    },
-    {
-        'name': 'PleasureDome DATs',
-        '_class': FruitMachinesXMLDat,
-        'seed': 'pleasuredome',
-        'priority': 50,
-        'rules': [
             {
                 'key': 'name',
-                'operator': 'contains',
-                'value': 'SWP Machine',
+                'operator': 'regex',
+                'value': pattern,
             },
         ],
-    },
+    }
+    for dat_class, priority, pattern in get_rule_patterns()
 ]
 
 def get_rules() -> list:
@@ -0,0 +1,122 @@
+"""Download scheduling: bandwidth cap, priorities and adaptive concurrency."""
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+SIZE_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30}
+# Downloads between two adjustments of the concurrency
+WINDOW = 4
+
+
+def parse_rate(value: str | None) -> int:
+    """Parse a rate in bytes per second, with an optional K/M/G suffix (10M), 0 is unlimited."""
+    match = re.fullmatch(r'\s*([0-9.]+)\s*([KMG]?)I?B?\s*', (value or '0').upper())
+    if not match:
+        msg = f'Invalid rate: {value}'
+        raise ValueError(msg)
+    return int(float(match[1]) * SIZE_UNITS[match[2]])
+
+
+def parse_set_values(value: str | None) -> dict:
+    """Parse per-set numbers, as name:number pairs (mame:10,pinball:-10)."""
+    values = {}
+    for item in (value or '').split(','):
+        if ':' in item:
+            name, number = item.split(':', 1)
+            values[name.strip().lower()] = int(number)
+    return values
+
+
+def get_set_value(values: dict, pdset: 'PDSET', default: int = 0) -> int:  # noqa: F821
+    """Get the number of a set, by config name or by name."""
+    return values.get(pdset.value['configVar'], values.get(pdset.name.lower(), default))
+
+
+class RateLimiter:
+    """Token bucket shared by all the downloads, in bytes per second."""
+
+    def __init__(self, rate: int) -> None:
+        """Initialize the limiter, a rate of 0 does not limit."""
+        self.rate = rate
+        self.allowance = float(rate)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        """Wait until size bytes can be transferred."""
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.allowance + (now - self.last) * self.rate, self.rate)
+            self.last = now
+            self.allowance -= size
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    """Download slots given by priority, their number adapted to the throughput.
+
+    With adaptive concurrency the limit starts low and grows by one while the
+    throughput of the last downloads improves, shrinks by one when it drops
+    and is halved on errors.
+    """
+
+    def __init__(self, max_connections: int = 10, *, adaptive: bool = False) -> None:
+        """Initialize the scheduler."""
+        self.max_connections = max_connections
+        self.adaptive = adaptive
+        self.limit = min(2, max_connections) if adaptive else max_connections
+        self.active = 0
+        self.waiting = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.window = []
+        self.window_start = time.monotonic()
+        self.best = 0.0
+
+    @contextmanager
+    def slot(self, key: tuple = ()) -> Iterator[None]:
+        """Wait for a download slot, the lowest key goes first."""
+        entry = (key, next(self.counter))
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            self.condition.wait_for(lambda: self.active < self.limit and self.waiting[0] == entry)
+            heapq.heappop(self.waiting)
+            self.active += 1
+            self.condition.notify_all()
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    def report(self, size: int, *, error: bool = False) -> None:
+        """Report a finished download, adapting the concurrency."""
+        if not self.adaptive:
+            return
+        with self.condition:
+            if error:
+                self.limit = max(1, self.limit // 2)
+                self.window, self.window_start = [], time.monotonic()
+                return
+            self.window.append(size)
+            if len(self.window) < max(WINDOW, self.limit):
+                return
+            elapsed = time.monotonic() - self.window_start
+            throughput = sum(self.window) / elapsed if elapsed else 0
+            if throughput >= self.best * 1.05:
+                self.best = throughput
+                self.limit = min(self.limit + 1, self.max_connections)
+            elif throughput < self.best * 0.9:
+                self.best = throughput
+                self.limit = max(self.limit - 1, 1)
+            self.window, self.window_start = [], time.monotonic()
+            self.condition.notify_all()
@@ -0,0 +1,123 @@
+"""Content-addressed store of the downloaded archives.
+
+Every archive is kept once in the store, under its SHA1, and the dats and
+backup folders reference it by hardlink (or reflink, or a copy as a last
+resort), so the same bytes are neither downloaded nor stored twice across runs.
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+# ioctl to clone a file on copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+DAY = 24 * 60 * 60
+
+
+def reflink(source: str | Path, destination: str | Path) -> None:
+    """Clone a file sharing its blocks, raises OSError if the filesystem can not."""
+    if not sys.platform.startswith('linux'):
+        raise OSError('reflink is only supported on Linux')
+    import fcntl
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            Path(destination).unlink(missing_ok=True)
+            raise
+
+
+LINK_METHODS = {'hardlink': os.link, 'reflink': reflink, 'copy': shutil.copyfile}
+
+
+def link_file(source: str | Path, destination: str | Path,
+              methods: tuple = ('hardlink', 'reflink', 'copy')) -> str:
+    """Make destination a hardlink of source, or a reflink, or a copy, the first of methods that works.
+
+    Returns the method used.
+    """
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = destination.with_name(f'{destination.name}.link')
+    tmp_file.unlink(missing_ok=True)
+    for method in methods:
+        try:
+            LINK_METHODS[method](source, tmp_file)
+        except OSError:
+            if method == methods[-1]:
+                raise
+            continue
+        os.replace(tmp_file, destination)
+        return method
+    return None
+
+
+class ArchiveStore:
+    """Archives by SHA1, with the time they were last used for eviction."""
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize the store."""
+        self.path = Path(path)
+        self.index_file = self.path / 'store.json'
+        self.lock = threading.Lock()
+        self.entries: dict = {}
+        if self.index_file.exists():
+            with open(self.index_file, encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def get_path(self, sha1: str) -> Path:
+        """Get the path of an archive in the store."""
+        return self.path / 'objects' / sha1[:2] / sha1
+
+    def has(self, sha1: str | None) -> bool:
+        """Check if an archive is in the store."""
+        return bool(sha1) and sha1 in self.entries and self.get_path(sha1).is_file()
+
+    def add(self, file: str | Path, sha1: str) -> None:
+        """Add a file to the store, the file becomes a link to the stored archive."""
+        path = self.get_path(sha1)
+        with self.lock:
+            if path.is_file():
+                link_file(path, file)
+            else:
+                link_file(file, path)
+            self.entries[sha1] = {'size': path.stat().st_size, 'name': Path(file).name, 'used': time.time()}
+
+    def restore(self, sha1: str, destination: str | Path) -> None:
+        """Link an archive of the store to destination."""
+        link_file(self.get_path(sha1), destination)
+        with self.lock:
+            self.entries[sha1]['used'] = time.time()
+
+    def save(self) -> None:
+        """Save the index of the store, atomically."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix('.tmp')
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=4)
+            os.replace(tmp_file, self.index_file)
+
+    def evict(self, max_age: float = 0, max_size: int = 0) -> list:
+        """Remove the archives not used in max_age days, then the least recently used over max_size bytes.
+
+        Links in the dats and backup folders keep their content, only the store entry is removed.
+        """
+        evicted = []
+        with self.lock:
+            by_use = sorted(self.entries.items(), key=lambda item: item[1]['used'])
+            total = sum(entry['size'] for _, entry in by_use)
+            for sha1, entry in by_use:
+                expired = max_age and entry['used'] < time.time() - max_age * DAY
+                if not expired and (not max_size or total <= max_size):
+                    continue
+                self.get_path(sha1).unlink(missing_ok=True)
+                del self.entries[sha1]
+                total -= entry['size']
+                evicted.append(sha1)
+        return evicted
@@ -0,0 +1,102 @@
+"""Watch mode: stay resident and sync the sets as they change upstream.
+
+Every set polls its index page on its own interval with a conditional request,
+only the sets whose index changed are downloaded, extracted and processed.
+The connection pool, the extract processes, the index cache and the manifest
+stay loaded between polls.
+"""
+import http.client
+import logging
+import os
+import signal
+import threading
+import time
+
+from datoso.commands.seed import Seed
+from datoso.configuration import config
+
+from datoso_seed_pleasuredome import __prefix__
+from datoso_seed_pleasuredome.metrics import metrics
+from datoso_seed_pleasuredome.scheduler import get_set_value, parse_set_values
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Poll the index of every set on its interval and sync the sets that changed."""
+
+    def __init__(self, helper: 'PleasureDomeHelper', pdsets: list) -> None:  # noqa: F821
+        """Initialize the watcher, every set is synced on its first poll."""
+        self.helper = helper
+        self.pdsets = pdsets
+        interval = int(config.get('PLEASUREDOME', 'WatchInterval', fallback='900'))
+        intervals = parse_set_values(config.get('PLEASUREDOME', 'WatchIntervals', fallback=''))
+        self.intervals = {pdset: get_set_value(intervals, pdset, interval) for pdset in pdsets}
+        self.next_poll = dict.fromkeys(pdsets, 0.0)
+        self.synced = set()
+        self.process = config.getboolean('PLEASUREDOME', 'WatchProcess', fallback=True)
+        self.seed = Seed(name=__prefix__)
+        self.stop = threading.Event()
+
+    def poll(self, pdset: 'PDSET') -> list | None:  # noqa: F821
+        """Get the links of a set, None if its index did not change since it was synced."""
+        stats = {}
+        links = self.helper.get_dat_links(pdset.name, pdset.url, stats)
+        if stats.get('cached') and pdset in self.synced:
+            return None
+        return links
+
+    def sync(self, pdset: 'PDSET', links: list) -> None:  # noqa: F821
+        """Download a set, run its actions and process its DATs if any archive changed."""
+        try:
+            with metrics.measure('set', pdset.name):
+                files = self.helper.download_set(pdset, links)
+            if files and self.process:
+                # Only the DATs in the folder of the set
+                self.seed.process_dats(fltr=f'{os.sep}{pdset.name}{os.sep}')
+        except Exception:
+            # Synced again on the next poll, even if its index is not modified by then
+            self.synced.discard(pdset)
+            logger.exception('Error syncing %s', pdset.name)
+        else:
+            self.synced.add(pdset)
+
+    def cycle(self) -> None:
+        """Poll the sets that are due and sync the ones that changed."""
+        now = time.monotonic()
+        changed = {}
+        for pdset in self.pdsets:
+            if self.next_poll[pdset] > now:
+                continue
+            self.next_poll[pdset] = now + self.intervals[pdset]
+            try:
+                links = self.poll(pdset)
+            except (http.client.HTTPException, OSError) as e:
+                logger.warning('Error polling %s: %s', pdset.name, e)
+                continue
+            if links is not None:
+                changed[pdset] = links
+        if not changed:
+            return
+        for pdset, links in self.helper.schedule(changed).items():
+            self.sync(pdset, links)
+        self.helper.save()
+        self.helper.print_extract_summary()
+        self.helper.extract_results.clear()
+        metrics.save()
+
+    def run(self) -> None:
+        """Poll the sets until stopped, with SIGTERM or Ctrl+C."""
+        if not self.pdsets:
+            logger.warning('No Pleasuredome sets to watch')
+            return
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+        print(f'Watching {", ".join(pdset.name for pdset in self.pdsets)}')
+        try:
+            while not self.stop.is_set():
+                self.cycle()
+                self.stop.wait(max(min(self.next_poll.values()) - time.monotonic(), 0))
+        except KeyboardInterrupt:
+            pass
+        print('Stopped watching')
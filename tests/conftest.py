@@ -0,0 +1,74 @@
+"""Test configuration, datoso reads its configuration from a temporary folder."""
+import os
+import sys
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import quote
+
+import pytest
+
+# Nothing from datoso can be imported before its configuration folder is set
+CONFIG_HOME = Path(tempfile.mkdtemp(prefix='pleasuredome-tests-'))
+os.environ['XDG_CONFIG_HOME'] = str(CONFIG_HOME)
+(CONFIG_HOME / 'datoso').mkdir(parents=True, exist_ok=True)
+(CONFIG_HOME / 'datoso' / 'datoso.config').write_text('[PLEASUREDOME]\n', encoding='utf-8')
+# The stand-in Pleasuredome site of the benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from datoso.configuration import config
+from server import serve
+
+
+@pytest.fixture
+def set_options() -> Iterator[Callable]:
+    """Set PLEASUREDOME options for a test, they are restored after it."""
+    if not config.has_section('PLEASUREDOME'):
+        config.add_section('PLEASUREDOME')
+    saved = dict(config['PLEASUREDOME'])
+
+    def setter(**values: str) -> None:
+        for key, value in values.items():
+            config['PLEASUREDOME'][key] = value
+    yield setter
+    config.remove_section('PLEASUREDOME')
+    config['PLEASUREDOME'] = saved
+
+
+class Site:
+    """A folder served over HTTP by the stand-in Pleasuredome server of the benchmarks."""
+
+    def __init__(self, root: Path) -> None:
+        """Serve root."""
+        self.root = root
+        self.server = serve(root)
+
+    def url(self, path: str) -> str:
+        """Get the URL of a file of the site."""
+        return f'http://127.0.0.1:{self.server.server_address[1]}/{quote(path)}'
+
+    def close(self) -> None:
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def http_site(tmp_path: Path) -> Iterator[Site]:
+    """Serve an empty folder, the test writes the files of the site."""
+    root = tmp_path / 'site'
+    root.mkdir()
+    site = Site(root)
+    yield site
+    site.close()
+
+
+@pytest.fixture
+def folders(tmp_path: Path) -> SimpleNamespace:
+    """Download, dats and backup folders of the seed, as datoso's Folders has them."""
+    folders = SimpleNamespace(download=tmp_path / 'download', dats=tmp_path / 'download' / 'dats',
+                              backup=tmp_path / 'download' / 'backup')
+    for folder in vars(folders).values():
+        folder.mkdir(parents=True, exist_ok=True)
+    return folders
@@ -0,0 +1,36 @@
+"""Tests of the seed actions."""
+from collections.abc import Callable
+from pathlib import Path
+
+from datoso.actions import processor
+from datoso.helpers import file_utils
+
+from datoso_seed_pleasuredome.actions import get_actions
+from datoso_seed_pleasuredome.publish import copy_path, publishing
+
+
+def test_datoso_copies_are_not_replaced() -> None:
+    """The steps of datoso and other seeds keep copying and removing with datoso's functions."""
+    assert processor.copy_path is file_utils.copy_path
+    assert processor.remove_path is file_utils.remove_path
+
+
+def test_published_actions(set_options: Callable) -> None:
+    """With a CopyStrategy the Copy and DeleteOld steps are the seed's Published versions."""
+    set_options(CopyStrategy='hardlink', ZeroExtraction='true', Diff='false', HashIndex='', Metrics='')
+    steps = [step['action'] for step in get_actions()['{dat_origin}/MAME']]
+    assert steps == ['LoadDatFile', 'PublishedDeleteOld', 'PublishedArchiveCopy', 'SaveToDatabase']
+    assert issubclass(processor.PublishedArchiveCopy, processor.Copy)
+    assert issubclass(processor.PublishedDeleteOld, processor.DeleteOld)
+
+
+def test_copy_path_links_while_publishing(tmp_path: Path) -> None:
+    """The seed's copy_path hardlinks the files of a folder while publishing, and copies outside it."""
+    origin = tmp_path / 'origin'
+    origin.mkdir()
+    (origin / 'list.xml').write_text('<datafile/>')
+    with publishing('hardlink', 2):
+        copy_path(origin, tmp_path / 'linked')
+    assert (tmp_path / 'linked' / 'list.xml').samefile(origin / 'list.xml')
+    copy_path(origin / 'list.xml', tmp_path / 'copied.xml')
+    assert not (tmp_path / 'copied.xml').samefile(origin / 'list.xml')
@@ -0,0 +1,31 @@
+"""Tests of the classification of the dats by name."""
+import pytest
+from classify import CORPUS, legacy_classify, new_classify
+
+from datoso_seed_pleasuredome.classify import classify
+
+
+@pytest.mark.parametrize('name', CORPUS)
+def test_classify_agrees_with_the_substring_checks(name: str) -> None:
+    """classify gives the results of the substring checks it replaced."""
+    assert new_classify(name) == legacy_classify(name)
+
+
+def test_flags() -> None:
+    """Update and dir2dat dats are told apart by their name."""
+    update = classify('MAME 0.262 Update ROMs (v0.257 to v0.262)/MAME 0.262 Update ROMs.xml')
+    assert (update.update, update.dir2dat, update.version) == (True, False, '0.262')
+    samples = classify('MAME 0.262 Samples (merged)/MAME 0.262 dir2dat Samples (merged).xml')
+    assert (samples.update, samples.dir2dat) == (False, True)
+
+
+@pytest.mark.parametrize(('name', 'version'), [
+    ('MAME 0.262 [Bugfix] ROMs.xml', '0.262'),
+    ('MAME 0.262] ROMs.xml', '0.262'),
+    ('HBMAME [0.245.15]/HBMAME 0.245.15[1].xml', '0.245.15'),
+    ('MAME 0.[262] ROMs.xml', None),
+    ('Fruit Machines [2024-03-02]/Fruit Machine Roms.xml', None),
+])
+def test_version_stops_at_brackets(name: str, version: str | None) -> None:
+    """The version is only the digits and dots, brackets around or after it are not taken."""
+    assert classify(name).version == version
@@ -0,0 +1,95 @@
+"""Tests of the compact model, it must read as the dicts xmltodict makes."""
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+import xmltodict
+from server import make_dat
+
+from datoso_seed_pleasuredome.compact import CompactGames, load_compact
+from datoso_seed_pleasuredome.dats import MameDat
+
+SHA1 = 'da39a3ee5e6b4b0d3255bfef95601890afd80709'
+DAT = f'''<?xml version="1.0"?>
+<mame build="0.262" debug="no">
+\t<machine name="pacman" sourcefile="pacman/pacman.cpp">
+\t\t<description>Pac-Man (Midway)</description>
+\t\t<year>1980</year>
+\t\t<manufacturer>Namco (Midway license)</manufacturer>
+\t\t<rom name="pacman.6e" size="4096" crc="c1e6ab10" sha1="{SHA1}" region="maincpu" offset="0"/>
+\t\t<rom name="pacman.6f" size="4096" crc="1a6fb2d4" sha1="{SHA1}" region="maincpu" offset="1000"/>
+\t\t<device_ref name="z80"/>
+\t\t<driver status="good" emulation="good"/>
+\t</machine>
+\t<machine name="puckman" cloneof="pacman" romof="pacman">
+\t\t<description>PuckMan (Japan set 1)</description>
+\t\t<rom name="pm1.6e" merge="pacman.6e" size="0x1000" crc="C1E6AB10" region="maincpu"/>
+\t</machine>
+\t<machine name="z80" isdevice="yes" runnable="no">
+\t\t<description>Zilog Z80 é</description>
+\t\t<sample name="bang"/>
+\t</machine>
+\t<machine name="mixed">
+\t\t<description>Mixed</description>
+\t\t<rom name="a.bin" size="1" crc="00000001" status="nodump"/>
+\t\t<disk name="mixed" sha1="{SHA1}"/>
+\t\t<rom size="2" crc="00000002"/>
+\t\t<feature type="protection" status="imperfect">Dongle</feature>
+\t</machine>
+</mame>
+'''
+
+
+@pytest.fixture
+def dat_file(tmp_path: Path) -> Path:
+    """A MAME dat with the elements and attributes of a real one."""
+    file = tmp_path / 'MAME' / 'MAME 0.262 ROMs (merged).xml'
+    file.parent.mkdir()
+    file.write_text(DAT, encoding='utf-8')
+    return file
+
+
+@pytest.mark.parametrize('content', [DAT, make_dat('MAME 0.262', 20000)])
+def test_compact_reads_as_xmltodict(tmp_path: Path, content: str) -> None:
+    """Iterating, listing, indexing and slicing the games gives the dicts of xmltodict."""
+    file = tmp_path / 'dat.xml'
+    file.write_text(content, encoding='utf-8')
+    expected = xmltodict.parse(content)
+    data = load_compact(file)
+    main_key = next(iter(expected))
+    expected_games = expected[main_key]['machine']
+    games = data[main_key]['machine']
+    assert isinstance(games, CompactGames)
+    assert len(games) == len(expected_games)
+    assert list(games) == expected_games
+    assert [games[index] for index in range(len(games))] == expected_games
+    assert games[-1] == expected_games[-1]
+    assert games[1:3] == expected_games[1:3]
+    assert {**data[main_key], 'machine': list(games)} == expected[main_key]
+
+
+def test_iter_roms(dat_file: Path) -> None:
+    """The ROMs are iterated with the name of their machine, None for the values they do not have."""
+    games = load_compact(dat_file)['mame']['machine']
+    assert list(games.iter_roms()) == [
+        ('pacman', 'pacman.6e', 4096, 'c1e6ab10', SHA1),
+        ('pacman', 'pacman.6f', 4096, '1a6fb2d4', SHA1),
+        ('puckman', 'pm1.6e', None, None, None),
+        ('mixed', 'a.bin', 1, '00000001', None),
+        ('mixed', None, 2, '00000002', None),
+    ]
+
+
+def test_mark_mias(dat_file: Path, set_options: Callable) -> None:
+    """The mias are marked in the compact games as in the games of xmltodict."""
+    mias = {SHA1}
+    expected = MameDat(file=str(dat_file), seed='pleasuredome')
+    expected.load()
+    expected.mark_mias(mias)
+    set_options(CompactLoad='true')
+    dat = MameDat(file=str(dat_file), seed='pleasuredome')
+    dat.load()
+    assert isinstance(dat.data['mame']['machine'], CompactGames)
+    dat.mark_mias(mias)
+    assert dat.data == expected.data
+    assert dat.data['mame']['machine'][0]['rom'][0]['@mia'] == 'yes'
@@ -0,0 +1,82 @@
+"""Tests of the compressed storage of the dats."""
+import importlib.util
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from server import make_archive, make_dat
+
+from datoso_seed_pleasuredome.archive import open_source
+from datoso_seed_pleasuredome.compression import (
+    compress_file,
+    decompress_file,
+    detect_codec,
+    get_compression,
+)
+from datoso_seed_pleasuredome.extract import extract_archive
+
+CODECS = [
+    'gzip',
+    pytest.param('zstd', marks=pytest.mark.skipif(importlib.util.find_spec('zstandard') is None,
+                                                   reason='zstd needs the zstandard package')),
+]
+
+
+@pytest.fixture
+def dat_file(tmp_path: Path) -> Path:
+    """A plain dat."""
+    file = tmp_path / 'MAME 0.262 ROMs (merged).xml'
+    file.write_text(make_dat('MAME 0.262', 50000), encoding='utf-8')
+    return file
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_round_trip(dat_file: Path, codec: str) -> None:
+    """A compressed dat keeps its name and mtime, and reads as the plain one through open_source."""
+    content = dat_file.read_bytes()
+    mtime = dat_file.stat().st_mtime_ns
+    assert compress_file(dat_file, codec) < len(content)
+    assert detect_codec(dat_file) == codec
+    assert dat_file.stat().st_mtime_ns == mtime
+    with open_source(dat_file) as source, open(source, 'rb') as fild:
+        assert fild.read() == content
+    assert decompress_file(dat_file)
+    assert dat_file.read_bytes() == content
+    assert not decompress_file(dat_file)
+
+
+def test_plain_dat_is_read_as_it_is(dat_file: Path) -> None:
+    """open_source gives a plain dat as it is."""
+    assert detect_codec(dat_file) is None
+    with open_source(dat_file) as source:
+        assert source == dat_file
+
+
+def test_extract_compressed(tmp_path: Path) -> None:
+    """Only the dats of an archive are stored compressed."""
+    archive = tmp_path / 'MAME 0.262 EXTRAs.zip'
+    make_archive(archive, {'artwork.xml': make_dat('Artwork', 2000), 'readme.txt': 'readme'})
+    result = extract_archive(archive, tmp_path / 'extras', compression='gzip', level=1)
+    assert result['written'] == 2
+    assert detect_codec(tmp_path / 'extras' / 'artwork.xml') == 'gzip'
+    assert (tmp_path / 'extras' / 'readme.txt').read_text() == 'readme'
+
+
+def test_get_compression(set_options: Callable) -> None:
+    """The options are checked, an unknown codec is an error."""
+    set_options(Compression='GZIP', CompressionLevel='9')
+    assert get_compression() == ('gzip', 9)
+    set_options(Compression='', CompressionLevel='')
+    assert get_compression() == (None, None)
+    set_options(Compression='lzma')
+    with pytest.raises(ValueError, match='Unknown Compression lzma'):
+        get_compression()
+
+
+@pytest.mark.skipif(importlib.util.find_spec('zstandard') is not None, reason='zstandard is installed')
+def test_zstd_needs_zstandard(set_options: Callable) -> None:
+    """zstd tells how to install the package it needs."""
+    set_options(Compression='zstd')
+    with pytest.raises(ImportError, match='pip install zstandard'):
+        get_compression()
+
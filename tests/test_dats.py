@@ -0,0 +1,69 @@
+"""Tests of the dat classes."""
+import pickle
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+import xmltodict
+from server import make_dat
+
+from datoso_seed_pleasuredome.dats import MameDat, mame_dat_factory
+from datoso_seed_pleasuredome.preload import preload_dat, preloader
+
+
+@pytest.fixture
+def dat_file(tmp_path: Path) -> Path:
+    """A MAME dat."""
+    file = tmp_path / 'MAME' / 'MAME 0.262 ROMs (merged).xml'
+    file.parent.mkdir()
+    file.write_text(make_dat('MAME 0.262', 20000), encoding='utf-8')
+    return file
+
+
+@pytest.fixture
+def clean_preloader() -> Iterator[None]:
+    """Forget the dats preloaded by a test."""
+    yield
+    preloader.futures.clear()
+    preloader.folders.clear()
+
+
+def load(file: Path) -> MameDat:
+    """Load a dat as datoso does."""
+    dat = MameDat(file=str(file), seed='pleasuredome')
+    dat.load()
+    return dat
+
+
+def test_preloaded_state_is_the_loaded_dat(dat_file: Path) -> None:
+    """The state a worker sends back is the parsed and classified dat, and survives pickling."""
+    state = pickle.loads(pickle.dumps(preload_dat(MameDat, str(dat_file))))
+    assert state['_data'] == xmltodict.parse(dat_file.read_text(encoding='utf-8'))
+    assert state['company'] == 'MAME'
+    assert state['version'] == '0.262'
+    assert 'file' not in state
+
+
+@pytest.mark.usefixtures('clean_preloader')
+def test_parallel_load(dat_file: Path, set_options: Callable) -> None:
+    """With ParallelLoad the dats of a folder are loaded by the pool, as datoso would load them."""
+    expected = load(dat_file)
+    set_options(ParallelLoad='2')
+    assert mame_dat_factory(dat_file) is MameDat
+    assert str(dat_file) in preloader.futures
+    assert preloader.get(dat_file) is not None
+    dat = load(dat_file)
+    assert dat.file == str(dat_file)
+    assert dat.data == expected.data
+    assert dat.dict() == expected.dict()
+
+
+def test_lazy_load(dat_file: Path, set_options: Callable) -> None:
+    """With LazyLoad only the header is parsed to classify the dat, the machines on first use."""
+    expected = load(dat_file)
+    set_options(LazyLoad='true')
+    dat = load(dat_file)
+    assert dat._data is None
+    assert dat.dict() == expected.dict()
+    assert dat._data is None
+    assert dat.data == expected.data
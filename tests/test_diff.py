@@ -0,0 +1,58 @@
+"""Tests of the differences between versions of a dat."""
+import json
+from pathlib import Path
+
+import xmltodict
+
+from datoso_seed_pleasuredome.diff import DiffStore
+
+KEY = 'MAME/MAME ROMs (merged)'
+
+
+def write_dat(folder: Path, version: str, machines: dict) -> Path:
+    """Write a dat, machines has the CRC32 of the single ROM of every machine."""
+    file = folder / f'MAME {version} ROMs (merged).xml'
+    lines = ['<?xml version="1.0"?>', '<mame build="test">', f'\t<header><version>{version}</version></header>']
+    lines.extend(f'\t<machine name="{name}"><description>{name}</description>'
+                 f'<rom name="{name}.bin" size="4" crc="{crc}"/></machine>' for name, crc in machines.items())
+    lines.append('</mame>')
+    file.write_text('\n'.join(lines), encoding='utf-8')
+    return file
+
+
+def test_first_version_is_a_snapshot(tmp_path: Path) -> None:
+    """The first version seen of a dat is kept as its snapshot, it has nothing to compare with."""
+    store = DiffStore(tmp_path / 'diff')
+    file = write_dat(tmp_path, '0.261', {'pacman': '00000001'})
+    assert store.diff(KEY, file, '0.261') is None
+    snapshot = store.load_snapshot(KEY)
+    assert snapshot['version'] == '0.261'
+    assert list(snapshot['machines']) == ['pacman']
+    assert store.diff(KEY, file, '0.261') is None
+
+
+def test_changeset(tmp_path: Path) -> None:
+    """A new version is compared with the snapshot, without the old file, and becomes the snapshot."""
+    store = DiffStore(tmp_path / 'diff')
+    old = write_dat(tmp_path, '0.261', {'pacman': '00000001', 'galaga': '00000002', 'dkong': '00000003'})
+    store.diff(KEY, old, '0.261')
+    old.unlink()
+    new = write_dat(tmp_path, '0.262', {'pacman': '00000001', 'galaga': '000000ff', 'mspacman': '00000004'})
+    changeset = store.diff(KEY, new, '0.262')
+    assert (changeset['added'], changeset['removed'], changeset['changed']) == (['mspacman'], ['dkong'], ['galaga'])
+    assert (changeset['added_count'], changeset['machines'], changeset['delta']) == (1, 3, None)
+    folder = tmp_path / 'diff' / 'MAME' / 'MAME ROMs (merged)'
+    assert json.loads((folder / '0.261-0.262.json').read_text(encoding='utf-8')) == changeset
+    assert store.load_snapshot(KEY)['version'] == '0.262'
+
+
+def test_delta_dat(tmp_path: Path) -> None:
+    """The delta dat has the header and the added and changed machines."""
+    store = DiffStore(tmp_path / 'diff')
+    store.diff(KEY, write_dat(tmp_path, '0.261', {'pacman': '00000001', 'galaga': '00000002'}), '0.261')
+    new = write_dat(tmp_path, '0.262', {'pacman': '00000001', 'galaga': '000000ff', 'mspacman': '00000004'})
+    changeset = store.diff(KEY, new, '0.262', deltas=True)
+    delta = xmltodict.parse(Path(changeset['delta']).read_text(encoding='utf-8'))['mame']
+    assert delta['@build'] == 'test'
+    assert delta['header']['version'] == '0.262'
+    assert [machine['@name'] for machine in delta['machine']] == ['galaga', 'mspacman']
@@ -0,0 +1,119 @@
+"""Tests of the archive downloads, from the stand-in Pleasuredome site of the benchmarks."""
+import hashlib
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from urllib.parse import quote
+
+import pytest
+from server import make_archive, make_dat, serve
+
+from datoso_seed_pleasuredome.download import (
+    ConnectionPool,
+    download_file,
+    get_part_file,
+)
+from datoso_seed_pleasuredome.integrity import DownloadError
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.store import ArchiveStore
+
+ARCHIVE = 'MAME 0.262 ROMs (merged).zip'
+
+
+@pytest.fixture
+def site(tmp_path: Path) -> Iterator[str]:
+    """Serve a folder with one archive, yields the URL of the archive."""
+    root = tmp_path / 'site'
+    root.mkdir()
+    make_archive(root / ARCHIVE, {'MAME 0.262 ROMs (merged).xml': make_dat('MAME 0.262', 20000)})
+    server = serve(root)
+    yield f'http://127.0.0.1:{server.server_address[1]}/{quote(ARCHIVE)}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool() -> Iterator[ConnectionPool]:
+    """Connection pool closed after the test."""
+    pool = ConnectionPool(timeout=10)
+    yield pool
+    pool.close()
+
+
+def test_download_file(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """A download is moved to its destination and recorded in the manifest."""
+    manifest = DownloadManifest(tmp_path / 'manifest.json')
+    destination = tmp_path / 'dats' / ARCHIVE
+    destination.parent.mkdir()
+    stats = {}
+    assert download_file(pool, site, destination, manifest, 'MAME', stats, tmp_path / 'partial')
+    content = (tmp_path / 'site' / ARCHIVE).read_bytes()
+    assert destination.read_bytes() == content
+    assert stats['bytes'] == len(content)
+    entry = manifest.get(site)
+    assert entry['sha1'] == hashlib.sha1(content).hexdigest()
+    assert entry['path'] == str(destination)
+    assert entry['set'] == 'MAME'
+    assert not list((tmp_path / 'partial').iterdir())
+
+
+def test_unchanged_file_is_not_downloaded(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """The validators of the manifest are sent, an unchanged file is not downloaded again."""
+    manifest = DownloadManifest(tmp_path / 'manifest.json')
+    destination = tmp_path / 'dats' / ARCHIVE
+    assert download_file(pool, site, destination, manifest, 'MAME')
+    stats = {}
+    assert not download_file(pool, site, destination, manifest, 'MAME', stats)
+    assert 'bytes' not in stats
+    assert destination.is_file()
+
+
+def test_stale_part_is_downloaded_again(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """A partial download the server does not resume is started over."""
+    destination = tmp_path / 'dats' / ARCHIVE
+    destination.parent.mkdir()
+    part = get_part_file(destination)
+    part.write_bytes(b'stale')
+    part.with_name(f'{part.name}.json').write_text(json.dumps(
+        {'url': site, 'etag': None, 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT', 'size': 1 << 20}))
+    assert download_file(pool, site, destination)
+    assert destination.read_bytes() == (tmp_path / 'site' / ARCHIVE).read_bytes()
+    assert not part.exists()
+
+
+def test_corrupt_archive_is_not_kept(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """A download that is not a valid zip raises and leaves nothing behind."""
+    (tmp_path / 'site' / ARCHIVE).write_bytes(b'PK\x03\x04' + b'not a zip' * 100)
+    destination = tmp_path / 'dats' / ARCHIVE
+    with pytest.raises(DownloadError):
+        download_file(pool, site, destination)
+    assert not destination.exists()
+    assert not get_part_file(destination).exists()
+
+
+def test_restore_without_store_downloads_again(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """With restore, an archive not in the store is downloaded even if its backup exists."""
+    manifest = DownloadManifest(tmp_path / 'manifest.json')
+    destination = tmp_path / 'dats' / ARCHIVE
+    assert download_file(pool, site, destination, manifest, 'MAME')
+    backup = tmp_path / 'backup' / ARCHIVE
+    backup.parent.mkdir()
+    destination.rename(backup)
+    manifest.relocate(destination, backup)
+    stats = {}
+    assert download_file(pool, site, destination, manifest, 'MAME', stats, restore=True)
+    assert destination.is_file()
+    assert stats['bytes'] == destination.stat().st_size
+
+
+def test_restore_from_store(tmp_path: Path, site: str, pool: ConnectionPool) -> None:
+    """With restore, an unchanged archive in the store is linked from it, not downloaded."""
+    manifest = DownloadManifest(tmp_path / 'manifest.json')
+    store = ArchiveStore(tmp_path / 'store')
+    destination = tmp_path / 'dats' / ARCHIVE
+    assert download_file(pool, site, destination, manifest, 'MAME', store=store)
+    destination.unlink()
+    stats = {}
+    assert download_file(pool, site, destination, manifest, 'MAME', stats, store=store, restore=True)
+    assert stats.get('restored')
+    assert destination.samefile(store.get_path(manifest.get(site)['sha1']))
@@ -0,0 +1,47 @@
+"""Tests of the asyncio download engine, from the stand-in Pleasuredome site of the benchmarks."""
+from collections.abc import Callable
+from types import SimpleNamespace
+
+import pytest
+from conftest import Site
+from server import make_site
+
+from datoso_seed_pleasuredome.engine import DownloadEngine
+from datoso_seed_pleasuredome.fetch import PDSET, DiscoveredSet, PleasureDomeHelper
+
+
+@pytest.fixture
+def site(http_site: Site, set_options: Callable) -> Site:
+    """Serve the sets of the benchmarks as the mirror of the site."""
+    make_site(http_site.root, archives=2, members=2, size=2000)
+    set_options(MirrorUrl=http_site.url(''), ExtractProcesses='0', ZeroExtraction='false', Compression='',
+                IncrementalExtract='false')
+    return http_site
+
+
+def test_engine_downloads_and_extracts(site: Site, folders: SimpleNamespace) -> None:
+    """Every archive is downloaded, extracted and backed up, the hosts are limited by MaxConnections."""
+    engine = DownloadEngine(PleasureDomeHelper(folders), max_connections=3)
+    assert engine.max_per_host == 3
+    engine.run([PDSET.MAME, PDSET.HBMAME])
+    for name in ('MAME', 'HBMAME'):
+        assert (folders.dats / name / f'{name} 0.262 ROMs (merged).xml').is_file()
+        assert sorted(file.name for file in (folders.dats / name / f'{name} 0.262 Software List 1 ROMs (merged)')
+                      .iterdir()) == ['list1_0.xml', 'list1_1.xml']
+        assert len(list((folders.backup / name).iterdir())) == 2
+
+
+def test_engine_raises_action_errors(site: Site, folders: SimpleNamespace, monkeypatch: pytest.MonkeyPatch) -> None:
+    """An error of a set action is raised once the downloads finish, the other archives are processed."""
+    helper = PleasureDomeHelper(folders)
+    processed = []
+
+    def extract(name: str, files: list) -> None:
+        processed.extend(files)
+        msg = f'Cannot extract {files[0]}'
+        raise RuntimeError(msg)
+    monkeypatch.setattr(helper, 'extract_fruit_dats', extract)
+    with pytest.raises(RuntimeError, match='Cannot extract'):
+        DownloadEngine(helper, max_connections=2, extract_workers=1, queue_size=1).run(
+            [DiscoveredSet(site.url('nonmame/fruitmachines/index.html'))])
+    assert sorted(processed) == ['FruitMachines-20240101.zip', 'FruitMachines-20240102.zip']
@@ -0,0 +1,84 @@
+"""Tests of the archive extraction."""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from server import make_archive
+
+from datoso_seed_pleasuredome.extract import extract_archive, get_index_name, load_index
+
+SOFTWARE_LISTS = [f'MAME 0.262 Software List {part} ROMs (merged).zip' for part in (1, 2, 3)]
+
+
+def test_index_name_keeps_parts_and_dates() -> None:
+    """Every part of a multi-part Software List and every dated archive has its own index."""
+    names = [get_index_name(file, 'MAME') for file in SOFTWARE_LISTS]
+    assert len(set(names)) == len(names)
+    fruit = [get_index_name(f'FruitMachines-202401{day:02d}.zip', 'FruitMachines') for day in (1, 2, 3)]
+    assert len(set(fruit)) == len(fruit)
+
+
+def test_index_name_is_the_same_for_all_versions() -> None:
+    """A new version of an archive uses the index of the previous one."""
+    assert get_index_name('MAME 0.262 Software List 1 ROMs (merged).zip', 'MAME') \
+        == get_index_name('MAME 0.263 Software List 1 ROMs (merged).zip', 'MAME')
+    assert get_index_name('HBMAME 0.245.15 ROMs (merged).zip', 'HBMAME') \
+        == get_index_name('HBMAME 0.245.16 ROMs (merged).zip', 'HBMAME')
+    assert get_index_name('MAME 0.262 ROMs (merged).zip', 'MAME') \
+        != get_index_name('MAME 0.262 ROMs (merged).zip', 'HBMAME')
+
+
+def extract_software_lists(tmp_path: Path, version: str) -> list:
+    """Extract the three Software List parts of a version as fetch does, returns the results."""
+    results = []
+    for part in (1, 2, 3):
+        file = make_archive(tmp_path / 'dats' / f'MAME {version} Software List {part} ROMs (merged).zip',
+                            {f'list{part}_{member}.xml': f'{version} {part} {member}' for member in range(2)})
+        results.append(extract_archive(file, file.with_suffix(''), tmp_path / 'index' / get_index_name(file, 'MAME'),
+                                       incremental=True, prune=True))
+    return results
+
+
+def test_incremental_prune_keeps_the_other_parts(tmp_path: Path) -> None:
+    """Extracting the parts of a Software List does not move or prune the files of the other parts."""
+    extract_software_lists(tmp_path, '0.262')
+    for part in (1, 2, 3):
+        folder = tmp_path / 'dats' / f'MAME 0.262 Software List {part} ROMs (merged)'
+        assert sorted(file.name for file in folder.iterdir()) == [f'list{part}_0.xml', f'list{part}_1.xml']
+
+
+def test_new_version_reuses_the_folder_of_the_same_part(tmp_path: Path) -> None:
+    """A new version renames the folder of the same part and only writes the changed files."""
+    extract_software_lists(tmp_path, '0.262')
+    results = extract_software_lists(tmp_path, '0.263')
+    assert [result['written'] for result in results] == [2, 2, 2]
+    for part in (1, 2, 3):
+        assert not (tmp_path / 'dats' / f'MAME 0.262 Software List {part} ROMs (merged)').exists()
+        folder = tmp_path / 'dats' / f'MAME 0.263 Software List {part} ROMs (merged)'
+        assert (folder / f'list{part}_0.xml').read_text() == f'0.263 {part} 0'
+        index = load_index(tmp_path / 'index' / get_index_name(f'{folder.name}.zip', 'MAME'))
+        assert index['archive'] == f'{folder.name}.zip'
+
+
+def test_previous_index_of_another_archive_is_not_renamed(tmp_path: Path) -> None:
+    """The folder of an index written for another archive is left where it is."""
+    index_file = tmp_path / 'index.json'
+    first = make_archive(tmp_path / 'MAME 0.262 Software List 1 ROMs (merged).zip', {'a.xml': 'a'})
+    extract_archive(first, first.with_suffix(''), index_file, incremental=True, prune=True)
+    second = make_archive(tmp_path / 'MAME 0.262 Software List 2 ROMs (merged).zip', {'b.xml': 'b'})
+    extract_archive(second, second.with_suffix(''), index_file, incremental=True, prune=True)
+    assert (first.with_suffix('') / 'a.xml').read_text() == 'a'
+    assert (second.with_suffix('') / 'b.xml').read_text() == 'b'
+
+
+def test_extract_in_processes(tmp_path: Path) -> None:
+    """Archives extracted concurrently in a process pool write their indexes without clashing."""
+    files = [make_archive(tmp_path / 'dats' / name, {f'{index}.xml': str(index)})
+             for index, name in enumerate(SOFTWARE_LISTS * 2)
+             if not (tmp_path / 'dats' / name).exists()]
+    extract = partial(extract_archive, incremental=True, prune=True)
+    jobs = [(file, file.with_suffix(''), tmp_path / 'index' / get_index_name(file, 'MAME')) for file in files] * 4
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(extract, *zip(*jobs, strict=True)))
+    assert not [result for result in results if result['error']]
+    assert not list((tmp_path / 'index').rglob('*.tmp'))
@@ -0,0 +1,147 @@
+"""Tests of the fetch helper."""
+import logging
+from collections.abc import Callable
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from conftest import Site
+from datoso.configuration import config
+from server import make_archive
+
+from datoso_seed_pleasuredome import fetch
+from datoso_seed_pleasuredome.fetch import PDSET, PleasureDomeHelper
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.metadata import load_metadata
+
+
+def test_backup_file_replaces_the_previous_backup(tmp_path: Path) -> None:
+    """A new download replaces the backup of the same name and the manifest points at it."""
+    helper = PleasureDomeHelper(SimpleNamespace(download=tmp_path), DownloadManifest(tmp_path / 'manifest.json'))
+    backup = tmp_path / 'backup' / 'MAME'
+    backup.mkdir(parents=True)
+    (backup / 'MAME 0.262 ROMs (merged).zip').write_bytes(b'old')
+    file = tmp_path / 'dats' / 'MAME 0.262 ROMs (merged).zip'
+    file.parent.mkdir()
+    file.write_bytes(b'new')
+    helper.manifest.update('http://site/mame.zip', path=str(file))
+    helper.backup_file(backup, str(file))
+    assert (backup / file.name).read_bytes() == b'new'
+    assert not file.exists()
+    assert helper.manifest.get('http://site/mame.zip')['path'] == str(backup / file.name)
+
+
+def test_prune_removed_archives(tmp_path: Path, set_options: Callable) -> None:
+    """The archives gone from the index are forgotten and the files extracted from them removed."""
+    set_options(IncrementalExtract='true', ZeroExtraction='false', ExtractProcesses='0', Compression='')
+    folders = SimpleNamespace(download=tmp_path, dats=tmp_path / 'dats', backup=tmp_path / 'backup')
+    helper = PleasureDomeHelper(folders, DownloadManifest(tmp_path / 'manifest.json'))
+    files = {
+        'http://site/mame.zip': ('MAME 0.262 ROMs (merged).zip', {'MAME 0.262 ROMs (merged).xml': 'mame'}),
+        'http://site/sl1.zip': ('MAME 0.262 Software List 1 ROMs (merged).zip', {'a2600.xml': 'sl1'}),
+        'http://site/sl2.zip': ('MAME 0.262 Software List 2 ROMs (merged).zip', {'nes.xml': 'sl2'}),
+    }
+    (folders.dats / 'MAME').mkdir(parents=True)
+    for url, (file, members) in files.items():
+        make_archive(folders.dats / 'MAME' / file, members)
+        helper.manifest.update(url, path=str(folders.dats / 'MAME' / file), set='MAME')
+    helper.extract_mame_dats('MAME', [file for file, _ in files.values()])
+    helper.manifest.update('http://site/hbmame.zip', path=str(folders.backup / 'HBMAME' / 'x.zip'), set='HBMAME')
+
+    helper.prune_removed('MAME', ['http://site/sl1.zip'])
+    assert set(helper.manifest.entries) == {'http://site/sl1.zip', 'http://site/hbmame.zip'}
+    assert sorted(path.name for path in (folders.dats / 'MAME').iterdir()) \
+        == ['MAME 0.262 Software List 1 ROMs (merged)']
+    assert (folders.dats / 'MAME' / 'MAME 0.262 Software List 1 ROMs (merged)' / 'a2600.xml').read_text() == 'sl1'
+    assert not list((tmp_path / 'extract_index' / 'MAME').glob('*Software List 2*'))
+
+
+def test_prune_removed_keeps_everything_without_links(tmp_path: Path) -> None:
+    """An empty index (a failed or truncated page) does not remove anything."""
+    helper = PleasureDomeHelper(SimpleNamespace(download=tmp_path), DownloadManifest(tmp_path / 'manifest.json'))
+    helper.manifest.update('http://site/mame.zip', path=str(tmp_path / 'mame.zip'), set='MAME')
+    helper.prune_removed('MAME', [])
+    assert helper.manifest.get('http://site/mame.zip')
+
+
+def test_extract_in_process_pool(folders: SimpleNamespace, set_options: Callable,
+                                 caplog: pytest.LogCaptureFixture) -> None:
+    """With ExtractProcesses the archives are extracted by the process pool, the failed ones are logged and kept."""
+    set_options(ExtractProcesses='2', ZeroExtraction='false', IncrementalExtract='false', Compression='')
+    helper = PleasureDomeHelper(folders)
+    path = folders.dats / 'MAME'
+    path.mkdir()
+    good = path / 'MAME 0.262 ROMs (merged).zip'
+    make_archive(good, {'MAME 0.262 ROMs (merged).xml': 'mame'})
+    bad = path / 'MAME 0.262 EXTRAs (merged).zip'
+    bad.write_bytes(b'not a zip')
+    try:
+        with caplog.at_level(logging.ERROR):
+            helper.extract_mame_dats('MAME', [good.name, bad.name])
+        assert helper.process_pool is not None
+    finally:
+        helper.close()
+    assert (path / 'MAME 0.262 ROMs (merged).xml').read_text() == 'mame'
+    assert (folders.backup / 'MAME' / good.name).is_file()
+    assert bad.is_file()
+    assert not (folders.backup / 'MAME' / bad.name).exists()
+    assert [result['file'] for result in helper.extract_results if result['error']] == [str(bad)]
+    assert any(str(bad) in record.getMessage() for record in caplog.records)
+
+
+def test_extract_in_process_pool_raises(folders: SimpleNamespace, set_options: Callable) -> None:
+    """An exception raised in an extract process is raised by extract_dats."""
+    set_options(ExtractProcesses='2', ZeroExtraction='false', IncrementalExtract='false', Compression='')
+    helper = PleasureDomeHelper(folders)
+    try:
+        with pytest.raises(FileNotFoundError):
+            helper.extract_mame_dats('MAME', ['MAME 0.262 ROMs (merged).zip'])
+    finally:
+        helper.close()
+    assert not helper.extract_results
+
+
+def test_fruit_metadata_is_written_once_per_set(folders: SimpleNamespace, set_options: Callable, http_site: Site,
+                                                monkeypatch: pytest.MonkeyPatch) -> None:
+    """The metadata of every FruitMachines archive is written in one go, named after the newest archive."""
+    set_options(ExtractProcesses='0', ZeroExtraction='false', IncrementalExtract='false', Compression='')
+    files = [f'FruitMachines-202401{day:02d}.zip' for day in (3, 1, 2)]
+    for file in files:
+        make_archive(http_site.root / file, {f'{file}.xml': '<datafile/>'})
+    writes = []
+    update_metadata = fetch.update_metadata
+
+    def counted(*args: dict) -> dict:
+        writes.append(args)
+        return update_metadata(*args)
+    monkeypatch.setattr(fetch, 'update_metadata', counted)
+    helper = PleasureDomeHelper(folders)
+    assert sorted(helper.download_set(PDSET.FruitMachines, [http_site.url(file) for file in files])) == sorted(files)
+    assert len(writes) == 1
+    metadata = load_metadata(folders.dats / 'FruitMachines')
+    assert metadata['zipfile'] == 'FruitMachines-20240103.zip'
+    assert metadata['date'] == '2024-01-03'
+    assert sorted(metadata['archives']) == sorted(files)
+
+
+def test_watch_keeps_the_dats_without_changing_the_options(tmp_path: Path, set_options: Callable,
+                                                          monkeypatch: pytest.MonkeyPatch) -> None:
+    """Watch mode fetches incrementally without setting the Incremental option for the rest of datoso."""
+    set_options(Watch='true', Incremental='false', Store='false', Plan='false', download='mame')
+    monkeypatch.setitem(config['PATHS'], 'DownloadPath', str(tmp_path))
+    kept = tmp_path / 'pleasuredome' / 'dats' / 'MAME' / 'MAME 0.262 ROMs (merged).xml'
+    kept.parent.mkdir(parents=True)
+    kept.write_text('<datafile/>')
+    watched = []
+
+    class Watcher:
+        def __init__(self, helper: PleasureDomeHelper, pdsets: list) -> None:
+            watched.append((helper.incremental, helper.manifest is not None, pdsets))
+
+        def run(self) -> None:
+            pass
+    monkeypatch.setattr(fetch, 'Watcher', Watcher)
+    fetch.fetch()
+    assert watched == [(True, True, [PDSET.MAME])]
+    assert kept.is_file()
+    assert not config.getboolean('PLEASUREDOME', 'Incremental')
@@ -0,0 +1,81 @@
+"""Tests of the index of the ROMs by hash."""
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from datoso_seed_pleasuredome.hashindex import HashIndex, iter_dat_roms, main
+
+SHA1 = 'da39a3ee5e6b4b0d3255bfef95601890afd80709'
+DAT = f'''<?xml version="1.0"?>
+<mame build="0.262">
+\t<header><version>0.262</version></header>
+\t<machine name="pacman">
+\t\t<description>Pac-Man</description>
+\t\t<rom name="pacman.6e" size="4096" crc="c1e6ab10" sha1="{SHA1}"/>
+\t\t<rom name="pacman.6f" size="4096" crc="1a6fb2d4"/>
+\t</machine>
+\t<machine name="puckman">
+\t\t<description>PuckMan</description>
+\t\t<rom name="pm1.6e" size="0" crc="C1E6AB10"/>
+\t</machine>
+</mame>
+'''
+
+
+@pytest.fixture
+def dat_file(tmp_path: Path) -> Path:
+    """A MAME dat."""
+    file = tmp_path / 'MAME 0.262 ROMs (merged).xml'
+    file.write_text(DAT, encoding='utf-8')
+    return file
+
+
+@pytest.fixture
+def index(tmp_path: Path, dat_file: Path) -> Iterator[HashIndex]:
+    """An index with the ROMs of the dat."""
+    index = HashIndex(tmp_path / 'index' / 'roms.sqlite')
+    index.update('MAME', 'MAME ROMs (merged)', '0.262', dat_file, iter_dat_roms(dat_file))
+    yield index
+    index.close()
+
+
+def test_iter_dat_roms(dat_file: Path) -> None:
+    """The ROMs of a dat are read with their machine, the hashes parsed."""
+    assert list(iter_dat_roms(dat_file)) == [
+        ('pacman', 'pacman.6e', 4096, 0xc1e6ab10, bytes.fromhex(SHA1)),
+        ('pacman', 'pacman.6f', 4096, 0x1a6fb2d4, None),
+        ('puckman', 'pm1.6e', 0, 0xc1e6ab10, None),
+    ]
+
+
+def test_update(index: HashIndex, dat_file: Path) -> None:
+    """A version already indexed is skipped, a new one replaces the ROMs of the dat."""
+    assert index.update('MAME', 'MAME ROMs (merged)', '0.262', dat_file, []) is None
+    assert index.stats() == {'MAME': {'dats': 1, 'roms': 3}}
+    rom = ('pacman', 'pacman.6e', 4096, 0x12345678, None)
+    assert index.update('MAME', 'MAME ROMs (merged)', '0.263', dat_file, [rom]) == 1
+    index.update('HBMAME', 'HBMAME ROMs (merged)', '0.245', dat_file, [rom, rom])
+    assert index.stats() == {'HBMAME': {'dats': 1, 'roms': 2}, 'MAME': {'dats': 1, 'roms': 1}}
+    assert index.lookup(['c1e6ab10']) == {'c1e6ab10': []}
+
+
+def test_lookup(index: HashIndex) -> None:
+    """CRC32s and SHA1s are looked up at once, in any case, the ones not found have no matches."""
+    results = index.lookup(['C1E6AB10', SHA1, 'ffffffff'])
+    assert sorted(match['machine'] for match in results['C1E6AB10']) == ['pacman', 'puckman']
+    assert results[SHA1] == [{
+        'set': 'MAME', 'dat': 'MAME ROMs (merged)', 'version': '0.262', 'machine': 'pacman',
+        'rom': 'pacman.6e', 'size': 4096, 'crc': 'c1e6ab10', 'sha1': SHA1,
+    }]
+    assert results['ffffffff'] == []
+    with pytest.raises(ValueError, match='Not a CRC32 or SHA1: xyz'):
+        index.lookup(['xyz'])
+
+
+def test_main_json(index: HashIndex, capsys: pytest.CaptureFixture) -> None:
+    """The command line prints the matches as JSON."""
+    main(['--index', str(index.file), '--json', '1a6fb2d4'])
+    results = json.loads(capsys.readouterr().out)
+    assert [match['rom'] for match in results['1a6fb2d4']] == ['pacman.6f']
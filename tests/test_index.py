@@ -0,0 +1,76 @@
+"""Tests of the cache of the index pages and of the discovery of new sets."""
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from conftest import Site
+
+from datoso_seed_pleasuredome.download import ConnectionPool
+from datoso_seed_pleasuredome.fetch import PleasureDomeHelper, parse_links
+from datoso_seed_pleasuredome.index import IndexCache, decode_page
+
+
+@pytest.fixture
+def pool() -> Iterator[ConnectionPool]:
+    """Connection pool closed after the test."""
+    pool = ConnectionPool(timeout=10)
+    yield pool
+    pool.close()
+
+
+def write_page(site: Site, path: str, links: list, mtime: int = 1_700_000_000) -> str:
+    """Write an index page with links, returns its URL."""
+    page = site.root / path
+    page.parent.mkdir(parents=True, exist_ok=True)
+    page.write_text('<html><body>' + ''.join(f'<a href="{link}">{link}</a>' for link in links) + '</body></html>',
+                    encoding='utf-8')
+    os.utime(page, (mtime, mtime))
+    return site.url(path)
+
+
+def test_decode_page() -> None:
+    """The charset of the Content-Type is used, utf-8 by default or when it is unknown."""
+    assert decode_page('é'.encode('latin-1'), 'text/html; charset=ISO-8859-1') == 'é'
+    assert decode_page('é'.encode(), 'text/html') == 'é'
+    assert decode_page('é'.encode(), 'text/html; charset=unknown') == 'é'
+
+
+def test_unchanged_page_is_not_parsed_again(tmp_path: Path, http_site: Site, pool: ConnectionPool) -> None:
+    """A page is revalidated with the saved validators, it is parsed again only once it changed."""
+    url = write_page(http_site, 'mame/index.html', ['a.zip', 'b.zip'])
+    parsed = []
+
+    def parse(html: str, page_url: str) -> list:
+        parsed.append(page_url)
+        return parse_links(html, page_url)
+
+    cache = IndexCache(tmp_path / 'index_cache.json')
+    stats = {}
+    links = cache.get_links(pool, url, parse, stats)
+    assert [link.rsplit('/', 1)[1] for link in links] == ['a.zip', 'b.zip']
+    assert stats['bytes'] > 0
+    cache.save()
+    cache = IndexCache(tmp_path / 'index_cache.json')
+    stats = {}
+    assert cache.get_links(pool, url, parse, stats) == links
+    assert stats == {'cached': True}
+    assert parsed == [url]
+    write_page(http_site, 'mame/index.html', ['a.zip', 'c.zip'], mtime=1_800_000_000)
+    assert [link.rsplit('/', 1)[1] for link in cache.get_links(pool, url, parse)] == ['a.zip', 'c.zip']
+    assert parsed == [url, url]
+
+
+def test_discover_sets(http_site: Site, folders: SimpleNamespace, set_options: Callable) -> None:
+    """Only the folders right under nonmame that are not in PDSET are discovered."""
+    set_options(MirrorUrl=http_site.url(''))
+    write_page(http_site, 'nonmame/index.html', [
+        'hbmame/index.html', 'newset/index.html', 'newset/index.html', 'deeper/folder/index.html',
+        'other.zip', '../mame/index.html',
+    ])
+    helper = PleasureDomeHelper(folders)
+    discovered = helper.discover_sets()
+    assert [pdset.name for pdset in discovered] == ['newset']
+    assert discovered[0].url == http_site.url('nonmame/newset/index.html')
+    assert discovered[0].value['actions'] == ['extract_fruit_dats']
@@ -0,0 +1,101 @@
+"""Tests of the integrity checks done while downloading."""
+import hashlib
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from datoso_seed_pleasuredome.integrity import DownloadError, StreamVerifier
+
+MEMBERS = {'a.xml': b'<datafile>' + b'a' * 5000 + b'</datafile>', 'b.xml': bytes(range(256)) * 40}
+
+
+class Unseekable(io.RawIOBase):
+    """A stream zipfile can not seek back into, so it writes data descriptors."""
+
+    def __init__(self) -> None:
+        """Initialize the stream."""
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        """The stream is writable."""
+        return True
+
+    def write(self, data: bytes) -> int:
+        """Add data."""
+        self.data += data
+        return len(data)
+
+
+def make_zip(compression: int = zipfile.ZIP_DEFLATED, *, seekable: bool = True) -> bytes:
+    """Make a zip of MEMBERS."""
+    stream = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(stream, 'w', compression) as zip_ref:
+        for name, content in MEMBERS.items():
+            zip_ref.writestr(name, content)
+    return bytes(stream.getvalue() if seekable else stream.data)
+
+
+def stream(content: bytes, chunk_size: int) -> StreamVerifier:
+    """Feed content to a verifier in chunks."""
+    verifier = StreamVerifier(is_zip=True)
+    for start in range(0, len(content), chunk_size):
+        verifier.update(content[start:start + chunk_size])
+    return verifier
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+@pytest.mark.parametrize(('compression', 'seekable'), [
+    (zipfile.ZIP_DEFLATED, True), (zipfile.ZIP_STORED, True), (zipfile.ZIP_DEFLATED, False)])
+def test_valid_zip(tmp_path: Path, chunk_size: int, compression: int, *, seekable: bool) -> None:
+    """Every member is checked while streaming, whatever the chunks, and matches the central directory."""
+    content = make_zip(compression, seekable=seekable)
+    verifier = stream(content, chunk_size)
+    assert verifier.streamed
+    assert not verifier.error
+    assert set(verifier.members) == set(MEMBERS)
+    assert verifier.sha1_hex == hashlib.sha1(content).hexdigest()
+    file = tmp_path / 'dats.zip'
+    file.write_bytes(content)
+    verifier.verify(file)
+
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_corrupt_member(tmp_path: Path, compression: int) -> None:
+    """A member whose data does not match its CRC32 is found while streaming."""
+    content = bytearray(make_zip(compression))
+    with zipfile.ZipFile(io.BytesIO(bytes(content))) as zip_ref:
+        info = zip_ref.getinfo('b.xml')
+    # A byte in the middle of the data of the member, after its local header
+    content[info.header_offset + 30 + len(info.filename) + info.compress_size // 2] ^= 0xFF
+    verifier = stream(bytes(content), 4096)
+    assert verifier.error
+    assert 'a.xml' in verifier.members
+    file = tmp_path / 'dats.zip'
+    file.write_bytes(content)
+    with pytest.raises(DownloadError, match='dats.zip'):
+        verifier.verify(file)
+
+
+def test_unsupported_zip_is_tested_after(tmp_path: Path) -> None:
+    """Stored members with data descriptors are not streamed, the zip is tested once written."""
+    content = make_zip(zipfile.ZIP_STORED, seekable=False)
+    verifier = stream(content, 4096)
+    assert not verifier.streamed
+    file = tmp_path / 'dats.zip'
+    file.write_bytes(content)
+    verifier.verify(file)
+    file.write_bytes(content.replace(MEMBERS['b.xml'][:256], bytes(256), 1))
+    with pytest.raises(DownloadError, match='bad CRC32 for b.xml'):
+        stream(file.read_bytes(), 4096).verify(file)
+
+
+def test_central_directory_must_match(tmp_path: Path) -> None:
+    """A member of the central directory not seen in the stream fails the check."""
+    verifier = stream(make_zip(), 4096)
+    file = tmp_path / 'dats.zip'
+    with zipfile.ZipFile(file, 'w') as zip_ref:
+        zip_ref.writestr('c.xml', b'c')
+    with pytest.raises(DownloadError, match='c.xml does not match the central directory'):
+        verifier.verify(file)
@@ -0,0 +1,59 @@
+"""Tests of the metrics."""
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from datoso_seed_pleasuredome.metrics import Metrics
+
+
+@pytest.fixture
+def events(tmp_path: Path, set_options: Callable) -> Metrics:
+    """Metrics with the events of two downloads and an extraction."""
+    set_options(Metrics=str(tmp_path / 'metrics.json'))
+    metrics = Metrics()
+    # Saved by the tests, not when pytest exits
+    metrics.registered = True
+    with metrics.measure('download', 'MAME', file='a.zip') as event:
+        event['bytes'] = 100
+    metrics.record('download', 'MAME', 0.5, file='b.zip', bytes=50, retries=1)
+    metrics.record('extract', 'HBMAME', 0.25, members=3)
+    return metrics
+
+
+def test_disabled(set_options: Callable) -> None:
+    """Nothing is recorded without the Metrics option."""
+    set_options(Metrics='')
+    metrics = Metrics()
+    with metrics.measure('download', 'MAME') as event:
+        event['bytes'] = 100
+    assert not metrics.events
+
+
+def test_summary(events: Metrics) -> None:
+    """The counters are added up by phase and set."""
+    summary = {(total['phase'], total['set']): total for total in events.summary()}
+    assert summary.keys() == {('download', 'MAME'), ('extract', 'HBMAME')}
+    download = summary['download', 'MAME']
+    assert (download['count'], download['bytes'], download['retries']) == (2, 150, 1)
+    assert download['seconds'] >= 0.5
+    assert summary['extract', 'HBMAME']['members'] == 3
+
+
+def test_save_json(tmp_path: Path, events: Metrics) -> None:
+    """The events and their summary are written as JSON to the Metrics file."""
+    events.save()
+    saved = json.loads((tmp_path / 'metrics.json').read_text(encoding='utf-8'))
+    assert [event['file'] for event in saved['events'] if event['phase'] == 'download'] == ['a.zip', 'b.zip']
+    assert len(saved['summary']) == 2
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_save_prometheus(tmp_path: Path, events: Metrics) -> None:
+    """A .prom file gets the totals as Prometheus gauges."""
+    events.save(tmp_path / 'metrics.prom')
+    lines = (tmp_path / 'metrics.prom').read_text(encoding='utf-8').splitlines()
+    assert '# TYPE pleasuredome_bytes gauge' in lines
+    assert 'pleasuredome_bytes{phase="download",set="MAME"} 150.0' in lines
+    assert 'pleasuredome_members{phase="extract",set="HBMAME"} 3.0' in lines
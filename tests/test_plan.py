@@ -0,0 +1,45 @@
+"""Tests of the dry run of a fetch."""
+import json
+from collections.abc import Callable
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from conftest import Site
+from server import make_archive, make_dat
+
+from datoso_seed_pleasuredome.fetch import PleasureDomeHelper
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.plan import run_plan
+
+
+def write_set(site: Site, path: str, archives: list, missing: list = ()) -> None:
+    """Write the index page of a set with its archives, the missing ones are only linked."""
+    folder = site.root / path
+    folder.mkdir(parents=True)
+    for archive in archives:
+        make_archive(folder / archive, {archive.replace('.zip', '.xml'): make_dat(archive, 2000)})
+    links = ''.join(f'<a href="{archive}">{archive}</a>' for archive in [*archives, *missing])
+    (folder / 'index.html').write_text(f'<html><body>{links}</body></html>', encoding='utf-8')
+
+
+def test_missing_archive_fails_its_set(tmp_path: Path, http_site: Site, folders: SimpleNamespace,
+                                       set_options: Callable, capsys: pytest.CaptureFixture) -> None:
+    """An archive whose HEAD is a 404 fails its set, the other archives and sets are still planned."""
+    set_options(MirrorUrl=http_site.url(''), download='mame,hbmame')
+    write_set(http_site, 'mame', ['MAME 0.262 ROMs (merged).zip'], missing=['MAME 0.262 CHDs (merged).zip'])
+    write_set(http_site, 'nonmame/hbmame', ['HBMAME 0.245 ROMs (merged).zip'])
+    helper = PleasureDomeHelper(folders, DownloadManifest(tmp_path / 'manifest.json'))
+    plan = run_plan(helper, str(tmp_path / 'plan.json'))
+    actions = {archive['file']: (archive['action'], archive['extract']) for archive in plan['archives']}
+    assert actions == {
+        'MAME 0.262 ROMs (merged).zip': ('download', True),
+        'MAME 0.262 CHDs (merged).zip': ('failed', False),
+        'HBMAME 0.245 ROMs (merged).zip': ('download', True),
+    }
+    assert plan['failed'] == ['MAME']
+    assert (plan['sets']['MAME']['failed'], plan['sets']['HBMAME']['failed']) == (1, 0)
+    failed = next(archive for archive in plan['archives'] if archive['action'] == 'failed')
+    assert '404' in failed['error']
+    assert json.loads((tmp_path / 'plan.json').read_text(encoding='utf-8')) == plan
+    assert 'Failed: MAME' in capsys.readouterr().out
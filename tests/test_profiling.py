@@ -0,0 +1,54 @@
+"""Tests of the phase profiler."""
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from types import SimpleNamespace
+
+from conftest import Site
+from server import make_archive
+
+from datoso_seed_pleasuredome.fetch import PleasureDomeHelper
+from datoso_seed_pleasuredome.profiling import profiled, profiler
+
+
+@profiled('test_worker')
+def worker(results: list, value: int) -> None:
+    """A phase run in a worker thread."""
+    results.append(value)
+
+
+@profiled('test_main')
+def main_phase() -> list:
+    """A phase starting worker threads while it is profiled."""
+    results = []
+    threads = [threading.Thread(target=worker, args=(results, value)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_worker_threads_run_unprofiled(tmp_path: Path, set_options: Callable) -> None:
+    """Phases of worker threads run, unprofiled, while the main thread is profiled."""
+    set_options(Profile=str(tmp_path), ProfileMemory='false')
+    assert sorted(main_phase()) == [0, 1, 2, 3]
+    assert 'test_main' in profiler.stats
+    assert 'test_worker' not in profiler.stats
+    assert not profiler.stack
+
+
+def test_set_actions_are_profiled(tmp_path: Path, set_options: Callable, http_site: Site,
+                                  folders: SimpleNamespace) -> None:
+    """The extract actions that download_set runs while profiling are profiled, without memory reports."""
+    set_options(Profile=str(tmp_path / 'profile'), ProfileMemory='false', ExtractWorkers='2')
+    make_archive(http_site.root / 'MAME 0.262 ROMs (merged).zip', {'MAME 0.262 ROMs (merged).xml': '<datafile/>'})
+    pdset = SimpleNamespace(name='MAME', value={'actions': ['extract_mame_dats']})
+    helper = PleasureDomeHelper(folders)
+    assert helper.download_set(pdset, [http_site.url('MAME 0.262 ROMs (merged).zip')]) \
+        == ['MAME 0.262 ROMs (merged).zip']
+    assert (folders.dats / 'MAME' / 'MAME 0.262 ROMs (merged).xml').is_file()
+    assert 'PleasureDomeHelper.extract_mame_dats' in profiler.stats
+    profiler.save()
+    assert (tmp_path / 'profile' / 'PleasureDomeHelper.extract_mame_dats.prof').is_file()
+    assert not list((tmp_path / 'profile').glob('*.alloc.txt'))
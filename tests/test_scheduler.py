@@ -0,0 +1,119 @@
+"""Tests of the download scheduling: retries, priorities, concurrency and bandwidth."""
+import threading
+import time
+from collections.abc import Callable
+from types import SimpleNamespace
+from urllib.error import HTTPError
+
+import pytest
+
+from datoso_seed_pleasuredome import fetch
+from datoso_seed_pleasuredome.fetch import PleasureDomeHelper
+from datoso_seed_pleasuredome.integrity import DownloadError
+from datoso_seed_pleasuredome.scheduler import (
+    DownloadScheduler,
+    RateLimiter,
+    parse_rate,
+    parse_set_values,
+)
+
+HREF = 'http://site/MAME%200.262%20ROMs%20(merged).zip'
+
+
+def test_parse() -> None:
+    """Rates take a K/M/G suffix, per-set values are name:number pairs."""
+    assert parse_rate('10M') == 10 * 2**20
+    assert parse_rate('1.5KiB') == 1536
+    assert parse_rate('') == 0
+    with pytest.raises(ValueError, match='Invalid rate: fast'):
+        parse_rate('fast')
+    assert parse_set_values('MAME:10, pinball:-10,bad') == {'mame': 10, 'pinball': -10}
+
+
+def test_rate_limiter() -> None:
+    """A second of bytes goes at once, the bytes over it wait for the rate."""
+    limiter = RateLimiter(100_000)
+    start = time.monotonic()
+    limiter.consume(100_000)
+    assert time.monotonic() - start < 0.1
+    limiter.consume(30_000)
+    assert time.monotonic() - start >= 0.25
+
+
+def test_slots_are_given_by_priority() -> None:
+    """The waiting downloads get the slots lowest key first, whatever their arrival."""
+    scheduler = DownloadScheduler(1)
+    order = []
+
+    def download(key: tuple) -> None:
+        with scheduler.slot(key):
+            order.append(key)
+    with scheduler.slot((0, 0)):
+        threads = [threading.Thread(target=download, args=(key,)) for key in [(1, 2), (0, 1), (1, 0)]]
+        for thread in threads:
+            thread.start()
+        while len(scheduler.waiting) < len(threads):
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert order == [(0, 1), (1, 0), (1, 2)]
+    assert scheduler.active == 0
+
+
+def test_adaptive_concurrency() -> None:
+    """The limit starts low, grows while the throughput holds and is halved on errors."""
+    scheduler = DownloadScheduler(10, adaptive=True)
+    assert scheduler.limit == 2
+    for _ in range(4):
+        scheduler.report(1000)
+    assert scheduler.limit == 3
+    scheduler.report(0, error=True)
+    assert scheduler.limit == 1
+
+
+@pytest.fixture
+def helper(folders: SimpleNamespace, set_options: Callable, monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    """A helper whose downloads fail as the test says, the sleeps before the retries are recorded."""
+    set_options(DownloadRetries='2')
+    helper = PleasureDomeHelper(folders)
+    state = SimpleNamespace(helper=helper, errors=[], calls=0, sleeps=[])
+
+    def download_file(*args: object, **kwargs: object) -> bool:
+        state.calls += 1
+        assert helper.scheduler.active == 1
+        if state.errors:
+            raise state.errors.pop(0)
+        return True
+
+    def sleep(seconds: float) -> None:
+        # The slot is not held while waiting to retry
+        state.sleeps.append((seconds, helper.scheduler.active))
+    monkeypatch.setattr(fetch, 'download_file', download_file)
+    monkeypatch.setattr(fetch, 'time', SimpleNamespace(sleep=sleep))
+    return state
+
+
+def test_retry_with_backoff(helper: SimpleNamespace) -> None:
+    """Failed downloads are retried with a doubled delay, without holding a slot."""
+    helper.errors = [DownloadError('bad CRC32'), ConnectionResetError()]
+    assert helper.helper.download_dat(HREF, 'MAME')
+    assert helper.calls == 3
+    assert helper.sleeps == [(fetch.RETRY_DELAY, 0), (fetch.RETRY_DELAY * 2, 0)]
+    assert helper.helper.scheduler.active == 0
+
+
+def test_retries_run_out(helper: SimpleNamespace) -> None:
+    """The error of the last retry is raised."""
+    helper.errors = [DownloadError('first'), DownloadError('second'), DownloadError('third')]
+    with pytest.raises(DownloadError, match='third'):
+        helper.helper.download_dat(HREF, 'MAME')
+    assert helper.calls == 3
+    assert helper.helper.scheduler.active == 0
+
+
+def test_client_errors_are_not_retried(helper: SimpleNamespace) -> None:
+    """A missing archive (4xx) fails at once."""
+    helper.errors = [HTTPError(HREF, 404, 'Not Found', None, None)]
+    with pytest.raises(HTTPError):
+        helper.helper.download_dat(HREF, 'MAME')
+    assert (helper.calls, helper.sleeps) == (1, [])
@@ -0,0 +1,55 @@
+"""Tests of the archive store."""
+import os
+from pathlib import Path
+
+from datoso_seed_pleasuredome.store import ArchiveStore
+
+
+def add(store: ArchiveStore, file: Path, content: bytes, sha1: str) -> Path:
+    """Write a file and add it to the store."""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_bytes(content)
+    store.add(file, sha1)
+    return file
+
+
+def test_add_and_restore(tmp_path: Path) -> None:
+    """Added files are kept once and linked back where they are needed."""
+    store = ArchiveStore(tmp_path / 'store')
+    first = add(store, tmp_path / 'dats' / 'a.zip', b'archive', 'aa11')
+    second = add(store, tmp_path / 'backup' / 'a.zip', b'archive', 'aa11')
+    assert store.has('aa11')
+    assert not store.has('bb22')
+    assert not store.has(None)
+    assert first.samefile(store.get_path('aa11'))
+    assert second.samefile(store.get_path('aa11'))
+    store.restore('aa11', tmp_path / 'restored' / 'a.zip')
+    assert (tmp_path / 'restored' / 'a.zip').read_bytes() == b'archive'
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    """The index of the store is kept between runs."""
+    store = ArchiveStore(tmp_path / 'store')
+    add(store, tmp_path / 'a.zip', b'archive', 'aa11')
+    store.save()
+    assert ArchiveStore(tmp_path / 'store').has('aa11')
+
+
+def test_evict_by_age_and_size(tmp_path: Path) -> None:
+    """Archives not used in max_age days go first, then the least recently used over max_size."""
+    store = ArchiveStore(tmp_path / 'store')
+    for index, sha1 in enumerate(('aa11', 'bb22', 'cc33', 'dd44')):
+        add(store, tmp_path / f'{sha1}.zip', bytes(100), sha1)
+        store.entries[sha1]['used'] = 1000 + index
+    store.entries['aa11']['used'] = 0
+    store.entries['dd44']['used'] = 2**40
+    assert store.evict(max_age=1) == ['aa11', 'bb22', 'cc33']
+    assert store.has('dd44')
+    assert (tmp_path / 'aa11.zip').read_bytes() == bytes(100)
+
+    for index, sha1 in enumerate(('ee55', 'ff66')):
+        add(store, tmp_path / f'{sha1}.zip', bytes(100), sha1)
+        store.entries[sha1]['used'] = 2**40 + 1 + index
+    assert store.evict(max_size=200) == ['dd44']
+    assert sorted(store.entries) == ['ee55', 'ff66']
+    assert not os.path.exists(store.get_path('dd44'))
@@ -0,0 +1,83 @@
+"""Tests of watch mode."""
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from conftest import Site
+from server import make_archive, make_dat, make_site
+
+from datoso_seed_pleasuredome.fetch import PDSET, PleasureDomeHelper
+from datoso_seed_pleasuredome.manifest import DownloadManifest
+from datoso_seed_pleasuredome.watch import Watcher
+
+
+@pytest.fixture
+def watcher(tmp_path: Path, http_site: Site, folders: SimpleNamespace, set_options: Callable,
+            monkeypatch: pytest.MonkeyPatch) -> Iterator[SimpleNamespace]:
+    """A watcher of MAME and HBMAME, the sets it downloads and processes are recorded."""
+    set_options(MirrorUrl=http_site.url(''), ExtractProcesses='0', ZeroExtraction='false',
+                IncrementalExtract='false', Compression='', Incremental='true', WatchProcess='true')
+    make_site(http_site.root, archives=1, members=1, size=2000)
+    # Old enough for the If-Modified-Since of the index cache to match
+    for index in http_site.root.rglob('index.html'):
+        os.utime(index, (1_700_000_000, 1_700_000_000))
+    helper = PleasureDomeHelper(folders, DownloadManifest(tmp_path / 'manifest.json'), incremental=True)
+    state = SimpleNamespace(downloaded=[], processed=[])
+    download_set = helper.download_set
+
+    def recorded(pdset: PDSET, links: list) -> list:
+        files = download_set(pdset, links)
+        state.downloaded.append((pdset.name, sorted(files)))
+        return files
+    monkeypatch.setattr(helper, 'download_set', recorded)
+    state.watcher = Watcher(helper, [PDSET.MAME, PDSET.HBMAME])
+    state.watcher.seed = SimpleNamespace(process_dats=lambda fltr: state.processed.append(fltr))
+    yield state
+    helper.close()
+
+
+def cycle(state: SimpleNamespace) -> None:
+    """Run a cycle with every set due, forgetting what the previous one did."""
+    state.watcher.next_poll = dict.fromkeys(state.watcher.pdsets, 0.0)
+    state.downloaded.clear()
+    state.processed.clear()
+    state.watcher.cycle()
+
+
+def test_only_changed_sets_are_synced(watcher: SimpleNamespace, http_site: Site) -> None:
+    """Every set is synced on the first cycle, then only the sets whose index changed."""
+    cycle(watcher)
+    assert [name for name, _ in watcher.downloaded] == ['MAME', 'HBMAME']
+    assert watcher.processed == [f'{os.sep}MAME{os.sep}', f'{os.sep}HBMAME{os.sep}']
+    cycle(watcher)
+    assert (watcher.downloaded, watcher.processed) == ([], [])
+    folder = http_site.root / 'nonmame' / 'hbmame'
+    archive = 'HBMAME 0.262 Software List 1 ROMs (merged).zip'
+    make_archive(folder / archive, {'list1.xml': make_dat('list1', 2000)})
+    index = folder / 'index.html'
+    index.write_text(index.read_text(encoding='utf-8').replace('</body>', f'<a href="{archive}">{archive}</a></body>'),
+                     encoding='utf-8')
+    cycle(watcher)
+    # Only the new archive of the set changed
+    assert watcher.downloaded == [('HBMAME', [archive])]
+    assert watcher.processed == [f'{os.sep}HBMAME{os.sep}']
+
+
+def test_failed_sync_is_retried(watcher: SimpleNamespace, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A set whose sync failed is synced again on the next cycle, even if its index did not change."""
+    helper = watcher.watcher.helper
+    download_set = helper.download_set
+
+    def failing(pdset: PDSET, links: list) -> list:
+        if pdset is PDSET.HBMAME:
+            msg = 'disk full'
+            raise OSError(msg)
+        return download_set(pdset, links)
+    monkeypatch.setattr(helper, 'download_set', failing)
+    cycle(watcher)
+    assert [name for name, _ in watcher.downloaded] == ['MAME']
+    monkeypatch.setattr(helper, 'download_set', download_set)
+    cycle(watcher)
+    assert [name for name, _ in watcher.downloaded] == ['HBMAME']